@@ -59,6 +59,7 @@ import time
 import warnings
 import logging
 import re
+import json
 from datetime import datetime
 
 # Suprimir warnings de librerías externas
@@ -70,6 +71,9 @@ warnings.filterwarnings("ignore")
 # Configuración CUDA para orden consistente de dispositivos
 os.environ['CUDA_DEVICE_ORDER'] = 'PCI_BUS_ID'
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'
+# Segmentos expandibles: el asignador crece en sitio en lugar de fragmentarse
+# (se respeta una configuración previa, p. ej. la de tts_generator)
+os.environ.setdefault('PYTORCH_CUDA_ALLOC_CONF', 'expandable_segments:True')
 
 # Inicializar CUDA correctamente
 if torch.cuda.is_available():
@@ -123,6 +127,8 @@ class EstructuraComplejaMejorada:
         self.script_dir = Path(__file__).parent.resolve()
         self.reference_dir = self.script_dir  # Referencias en el mismo directorio
         self.reference_file = None
+        # (ruta de referencia, archivo preprocesado, texto) para F5TTS.infer
+        self._engine_reference_cache = None
 
         # Directorio de sesión con timestamp
         self.session_dir = session_dir if session_dir else self.create_session_directory()
@@ -284,6 +290,25 @@ class EstructuraComplejaMejorada:
         self.output_dir = self.session_dir / ref_stem
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+    def _engine_reference(self):
+        """
+        Referencia preprocesada por F5 (recorte a ~12s y transcripción ASR) como
+        (archivo, texto). Se calcula una vez por referencia: con ref_text="" cada
+        infer volvería a recortar y transcribir el audio en todas las frases.
+        """
+        ref_path = str(self.reference_dir / self.reference_file)
+        cached = self._engine_reference_cache
+        if cached is None or cached[0] != ref_path:
+            try:
+                from f5_tts.infer.utils_infer import preprocess_ref_audio_text
+                ref_file, ref_text = preprocess_ref_audio_text(ref_path, "")
+            except Exception as e:
+                print(f"⚠️ No se pudo preprocesar la referencia ({e}); se usará tal cual")
+                ref_file, ref_text = ref_path, ""
+            cached = (ref_path, ref_file, ref_text)
+            self._engine_reference_cache = cached
+        return cached[1], cached[2]
+
     def detect_spanish_features(self, text):
         analysis = {
             'sinalefas': [],
@@ -405,16 +430,15 @@ class EstructuraComplejaMejorada:
             return False, f"Error en validación: {e}"
 
     def generate_single_phrase_with_validation(self, text, phrase_idx):
-        ref_path = self.reference_dir / self.reference_file
+        ref_file, ref_text = self._engine_reference()
 
         best_candidate = None  # (audio, score)
         attempt = 1
 
         # MICRO-AJUSTE PARA FRASES CORTAS NO FUSIONADAS
-        import re as _re_short
         # Limpieza simple de puntuación conflictiva antes de enviar al motor
         text = self._clean_text_simple(text)
-        num_words = len(_re_short.findall(r'\b\w+\b', text))
+        num_words = len(re.findall(r'\b\w+\b', text))
         short_phrase = (num_words < 7) or (len(text) < 35)
         # Guardar parámetros originales
         original_nfe = self.nfe_steps
@@ -436,8 +460,8 @@ class EstructuraComplejaMejorada:
                         print(f"  🎯 Generando frase {phrase_idx + 1}: '{text[:50]}...'")
 
                     wav, sr, spect = self.f5tts.infer(
-                        ref_file=str(ref_path),
-                        ref_text="",
+                        ref_file=ref_file,
+                        ref_text=ref_text,
                         gen_text=text,
                         nfe_step=self.nfe_steps,
                         sway_sampling_coef=self.sway_sampling_coef,
@@ -490,8 +514,8 @@ class EstructuraComplejaMejorada:
                         ext_text = self._extend_text_for_engine(text)
                         try:
                             wav_ext, sr, _ = self.f5tts.infer(
-                                ref_file=str(ref_path),
-                                ref_text="",
+                                ref_file=ref_file,
+                                ref_text=ref_text,
                                 gen_text=ext_text,
                                 nfe_step=28,
                                 sway_sampling_coef=-0.3,
@@ -519,8 +543,8 @@ class EstructuraComplejaMejorada:
                                 for pi, ptxt in enumerate(parts, 1):
                                     ptxt_clean = self._clean_text_simple(ptxt)
                                     wav_p, sr, _ = self.f5tts.infer(
-                                        ref_file=str(ref_path),
-                                        ref_text="",
+                                        ref_file=ref_file,
+                                        ref_text=ref_text,
                                         gen_text=ptxt_clean,
                                         nfe_step=28,
                                         sway_sampling_coef=-0.3,
@@ -551,8 +575,6 @@ class EstructuraComplejaMejorada:
                         print("    🛑 Error crítico del motor detectado: deteniendo y liberando GPU…")
                         # Guardar estado de reanudación
                         try:
-                            import json
-                            from pathlib import Path as _Path
                             resume_state = {
                                 'context': 'estructura_compleja_v3',
                                 'phrase_idx': phrase_idx,
@@ -560,7 +582,7 @@ class EstructuraComplejaMejorada:
                                 'session_dir': str(self.output_dir),
                                 'device': self.device,
                             }
-                            _Path('resume_state.json').write_text(json.dumps(resume_state, indent=2), encoding='utf-8')
+                            Path('resume_state.json').write_text(json.dumps(resume_state, indent=2), encoding='utf-8')
                         except Exception:
                             pass
                         self._shutdown_gpu()
@@ -689,10 +711,11 @@ class EstructuraComplejaMejorada:
     def _shutdown_gpu(self):
         """Libera memoria GPU (sin reset para no afectar GPU primaria)."""
         try:
+            # Sin synchronize/ipc_collect: bloquean la CPU y con expandable_segments
+            # basta devolver la caché cuando retiene más de 1 GB sin usar
             if self.device == 'cuda':
-                torch.cuda.empty_cache()
-                torch.cuda.synchronize()
-                torch.cuda.ipc_collect()
+                if torch.cuda.memory_reserved() - torch.cuda.memory_allocated() > 1 << 30:
+                    torch.cuda.empty_cache()
         except Exception as e:
             print(f"    ⚠️ No se pudo liberar memoria GPU: {e}")
 
@@ -875,12 +898,11 @@ class EstructuraComplejaMejorada:
 
     def _merge_minimum_phrases(self, min_words: int = 4, max_merged_chars: int = 160):
         """Une frases con menos de min_words con la anterior si el resultado no supera max_merged_chars."""
-        import re as _re_m
         if not self.frases:
             return
         merged = []
         for idx, frase in enumerate(self.frases):
-            words = len(_re_m.findall(r'\b\w+\b', frase))
+            words = len(re.findall(r'\b\w+\b', frase))
             if words < min_words and len(merged) > 0:
                 prev = merged[-1]
                 # Decidir separador adecuado
@@ -896,7 +918,6 @@ class EstructuraComplejaMejorada:
 
     def _clean_text_simple(self, text: str) -> str:
         """Limpieza mínima de puntuación conflictiva para el motor."""
-        import re
         s = (text or '').strip()
         # Colapsar puntos/espacios duplicados
         s = re.sub(r'\s*\.\s*\.', '.', s)
@@ -924,7 +945,6 @@ class EstructuraComplejaMejorada:
 
     def _split_text_for_engine_short(self, text: str) -> list:
         """Divide en 2 partes por coma/conector o por mitad de palabras."""
-        import re
         s = (text or '').strip()
         commas = [m.start() for m in re.finditer(r',', s)]
         if commas:
@@ -1050,9 +1070,7 @@ if __name__ == "__main__":
     if args.resume:
         # Modo reanudar (placeholder informativo)
         try:
-            import json
-            from pathlib import Path as _Path
-            state = json.loads(_Path('resume_state.json').read_text(encoding='utf-8'))
+            state = json.loads(Path('resume_state.json').read_text(encoding='utf-8'))
             print(f"🔄 Reanudar desde frase {state.get('phrase_idx','?')} con referencia {state.get('reference_file','?')}")
             # En una siguiente iteración se puede saltar directamente a esa frase con lógica adicional
         except Exception as e:
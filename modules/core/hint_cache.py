@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+====================================================================================================
+CACHÉ PERSISTENTE DE HINTS PROSÓDICOS
+====================================================================================================
+
+Descripción:
+    Guarda en disco los hints que ProsodyHintGenerator calcula para cada frase, de
+    modo que al relanzar una sesión interrumpida (OOM, SystemExit del motor) las
+    frases ya vistas no vuelvan a pasar por el orquestador prosódico.
+
+Funcionamiento:
+    - Clave: (huella del texto completo, frase, párrafo, total de frases, texto de la frase)
+      La huella es un hash del texto, así que la caché sobrevive a mover los archivos
+    - Entradas agrupadas por documento; solo se conservan los últimos
+      F5_HINT_CACHE_DOCS documentos usados (8 por defecto)
+    - Archivo: pickle en ./.prosody_hint_cache.pkl (o F5_HINT_CACHE)
+    - Se invalida automáticamente si cambian las reglas (huella del código fuente
+      de prosody_processor.py y prosody_orchestrator.py, más el Orquestador Maestro
+      activo: prosody_orchestrator_master, que vive fuera de este directorio)
+    - Se guarda al terminar la generación, al liberar la GPU y al salir del proceso
+      (carga, guardado e invalidación en persistent_cache.py)
+
+Autor: Sistema de generación prosódica F5-TTS
+Versión: 2.0
+====================================================================================================
+"""
+
+import hashlib
+import importlib.util
+import os
+import sys
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from core.persistent_cache import PersistentPickleCache
+
+DEFAULT_CACHE_PATH = Path(".prosody_hint_cache.pkl")
+DEFAULT_MAX_DOCUMENTS = 8
+ORCHESTRATOR_MODULE = "prosody_orchestrator_master"
+
+
+def orchestrator_fingerprint() -> str:
+    """
+    Módulo y hash del Orquestador Maestro que usará ProsodyHintGenerator, sin
+    importarlo (misma búsqueda que _import_orquestador_maestro: PYTHONPATH y
+    después este directorio). Sin orquestador, los hints salen del fallback.
+    """
+    module = sys.modules.get(ORCHESTRATOR_MODULE)
+    origin = getattr(module, '__file__', None)
+    if origin is None:
+        try:
+            spec = importlib.util.find_spec(ORCHESTRATOR_MODULE)
+            origin = spec.origin if spec is not None else None
+        except (ImportError, ValueError):
+            origin = None
+    if origin is None:
+        local = Path(__file__).resolve().parent / f"{ORCHESTRATOR_MODULE}.py"
+        origin = str(local) if local.exists() else None
+    if origin is None:
+        return "sin orquestador"
+    try:
+        return f"{ORCHESTRATOR_MODULE}:{hashlib.md5(Path(origin).read_bytes()).hexdigest()}"
+    except OSError:
+        return f"{ORCHESTRATOR_MODULE}:{origin}"
+
+
+def text_fingerprint(text: Optional[str]) -> str:
+    """Hash del texto completo (el orquestador ajusta los hints a todo el documento)"""
+    return hashlib.md5((text or "").encode("utf-8")).hexdigest()
+
+
+class ProsodyHintCache(PersistentPickleCache):
+    """
+    Hints por (documento, frase, párrafo, total, texto) persistidos entre ejecuciones.
+    entries: documento -> {(frase, párrafo, total, texto): hints}, del menos al más reciente
+    """
+
+    DEFAULT_PATH = DEFAULT_CACHE_PATH
+    ENV_VAR = 'F5_HINT_CACHE'
+    # Archivos cuyas reglas determinan los hints
+    RULE_SOURCES = ("prosody_processor.py", "prosody_orchestrator.py")
+    VERSION = 2  # entradas agrupadas por documento
+    LABEL = "caché de hints"
+
+    def __init__(self, path: Optional[str] = None, max_documents: Optional[int] = None):
+        super().__init__(path)
+        if max_documents is None:
+            max_documents = int(os.environ.get('F5_HINT_CACHE_DOCS', DEFAULT_MAX_DOCUMENTS))
+        self.max_documents = max(1, max_documents)
+
+    def _rules_extra(self) -> str:
+        """Los hints dependen sobre todo del orquestador externo"""
+        return orchestrator_fingerprint()
+
+    def _document(self, doc_key: str, create: bool) -> Optional[Dict[Tuple, Dict[str, Any]]]:
+        """
+        Hints de un documento, marcándolo como el más reciente. Se llama con
+        self._lock tomado (la frase siguiente se prepara desde otro hilo)
+        """
+        doc = self.entries.get(doc_key)
+        if doc is None and not create:
+            return None
+        if doc is None:
+            doc = {}
+        if next(reversed(self.entries), None) != doc_key:
+            self.entries.pop(doc_key, None)
+            self.entries[doc_key] = doc
+            self._dirty = True
+        return doc
+
+    def get(self, key: Tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            doc = self._document(key[0], create=False)
+            return doc.get(key[1:]) if doc is not None else None
+
+    def put(self, key: Tuple, value: Dict[str, Any]):
+        with self._lock:
+            self._document(key[0], create=True)[key[1:]] = value
+            self._dirty = True
+
+    def _evict(self):
+        """Olvida los documentos menos recientes por encima de max_documents"""
+        with self._lock:
+            for doc_key in list(self.entries)[:-self.max_documents]:
+                del self.entries[doc_key]
+
+    def __len__(self):
+        return sum(len(doc) for doc in self.entries.values())
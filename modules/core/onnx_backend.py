@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+====================================================================================================
+BACKEND ONNX (CPU) PARA F5-TTS
+====================================================================================================
+
+Descripción:
+    Ruta de respaldo para generar voz real cuando F5-TTS/CUDA no están disponibles.
+    Ejecuta el DiT exportado a ONNX con ONNX Runtime en CPU y reproduce en NumPy
+    el muestreador Euler del CFM de F5 (sway sampling + CFG fusionado en el grafo).
+
+Archivos necesarios (generados con tools/export_dit_onnx.py):
+    - dit.onnx (o dit.int8.onnx): transformer con CFG fusionado
+    - vocos_spec.onnx: vocoder Vocos hasta el espectro (magnitud y fase)
+    - vocab.txt: mapa de caracteres del modelo, uno por línea
+
+    La ISTFT final del vocoder se hace con librosa (no exporta bien a ONNX).
+    El texto de referencia se lee de un .txt junto al audio (segment_2955.txt)
+    o de la variable F5_REF_TEXT, ya que aquí no hay ASR para transcribirlo.
+
+Autor: Sistema de generación prosódica F5-TTS
+Versión: 2.0
+====================================================================================================
+"""
+
+import os
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+try:
+    import onnxruntime as ort
+    ONNX_AVAILABLE = True
+except ImportError:
+    ONNX_AVAILABLE = False
+
+try:
+    import librosa
+    LIBROSA_AVAILABLE = True
+except ImportError:
+    LIBROSA_AVAILABLE = False
+
+
+# Parámetros de mel de F5-TTS (vocos)
+TARGET_SAMPLE_RATE = 24000
+N_MEL_CHANNELS = 100
+HOP_LENGTH = 256
+WIN_LENGTH = 1024
+N_FFT = 1024
+TARGET_RMS = 0.1
+
+DEFAULT_ONNX_DIR = Path(__file__).resolve().parent.parent / "models" / "onnx"
+
+
+class OnnxF5Backend:
+    """
+    Genera audio con el DiT de F5 exportado a ONNX, solo con CPU
+    """
+
+    def __init__(self,
+                 reference_audio: str,
+                 model_dir: Optional[str] = None,
+                 ref_text: Optional[str] = None,
+                 precision: str = "fp32",
+                 num_threads: int = 0):
+        """
+        Args:
+            reference_audio: Audio de referencia para clonar la voz
+            model_dir: Directorio con dit.onnx, vocos_spec.onnx y vocab.txt
+            ref_text: Transcripción del audio de referencia
+            precision: "fp32" o "int8" (usa dit.int8.onnx)
+            num_threads: Hilos intra-op de ONNX Runtime (0 = automático)
+        """
+        if not ONNX_AVAILABLE:
+            raise ImportError("onnxruntime no está instalado")
+        if not LIBROSA_AVAILABLE:
+            raise ImportError("librosa no está instalado")
+
+        self.model_dir = Path(model_dir or os.environ.get('F5_ONNX_DIR', DEFAULT_ONNX_DIR))
+        dit_name = "dit.int8.onnx" if precision == "int8" else "dit.onnx"
+        dit_path = self.model_dir / dit_name
+        vocoder_path = self.model_dir / "vocos_spec.onnx"
+        vocab_path = self.model_dir / "vocab.txt"
+
+        for path in (dit_path, vocoder_path, vocab_path):
+            if not path.exists():
+                raise FileNotFoundError(f"❌ Falta {path.name} en {self.model_dir}")
+
+        # Texto de referencia: argumento, variable de entorno o .txt junto al audio
+        reference_audio = Path(reference_audio)
+        if ref_text is None:
+            ref_text = os.environ.get('F5_REF_TEXT')
+        if ref_text is None:
+            sidecar = reference_audio.with_suffix('.txt')
+            if not sidecar.exists():
+                raise FileNotFoundError(f"❌ Falta la transcripción de referencia: {sidecar}")
+            ref_text = sidecar.read_text(encoding='utf-8')
+        self.ref_text = self._normalize_ref_text(ref_text)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        providers = ['CPUExecutionProvider']
+        self.dit = ort.InferenceSession(str(dit_path), options, providers=providers)
+        self.vocoder = ort.InferenceSession(str(vocoder_path), options, providers=providers)
+
+        with open(vocab_path, 'r', encoding='utf-8') as f:
+            self.vocab = {line[:-1] if line.endswith('\n') else line: i for i, line in enumerate(f)}
+
+        # Mel de referencia (se calcula una sola vez)
+        audio, _ = librosa.load(str(reference_audio), sr=TARGET_SAMPLE_RATE, mono=True)
+        self.ref_rms = float(np.sqrt(np.mean(np.square(audio)))) if len(audio) else TARGET_RMS
+        if self.ref_rms < TARGET_RMS:
+            audio = audio * (TARGET_RMS / max(self.ref_rms, 1e-8))
+        self.ref_mel = self._log_mel(audio)  # (frames, n_mels)
+
+        print(f"✅ Backend ONNX (CPU) cargado desde {self.model_dir} [{precision}]")
+
+    @staticmethod
+    def _normalize_ref_text(ref_text: str) -> str:
+        """Misma normalización que aplica F5 al texto de referencia"""
+        ref_text = ref_text.strip()
+        if not ref_text.endswith(". ") and not ref_text.endswith("。"):
+            ref_text += " " if ref_text.endswith(".") else ". "
+        return ref_text
+
+    @staticmethod
+    def _log_mel(audio: np.ndarray) -> np.ndarray:
+        """Log-mel equivalente al extractor vocos de F5 (power=1, htk, sin norma)"""
+        mel = librosa.feature.melspectrogram(
+            y=audio,
+            sr=TARGET_SAMPLE_RATE,
+            n_fft=N_FFT,
+            hop_length=HOP_LENGTH,
+            win_length=WIN_LENGTH,
+            n_mels=N_MEL_CHANNELS,
+            power=1.0,
+            center=True,
+            htk=True,
+            norm=None
+        )
+        return np.log(np.maximum(mel, 1e-5)).T.astype(np.float32)
+
+    def _text_to_ids(self, text: str, length: int) -> np.ndarray:
+        """Caracteres -> índices del vocabulario, rellenando con -1 como F5"""
+        ids = np.full((1, length), -1, dtype=np.int64)
+        chars = [self.vocab.get(c, 0) for c in text][:length]
+        ids[0, :len(chars)] = chars
+        return ids
+
+    def generate(self,
+                 gen_text: str,
+                 nfe_step: int = 32,
+                 cfg_strength: float = 2.0,
+                 sway_sampling_coef: float = -1.0,
+                 speed: float = 1.0,
+                 seed: Optional[int] = None,
+                 sample_rate: int = TARGET_SAMPLE_RATE) -> np.ndarray:
+        """
+        Genera audio para gen_text con el muestreador Euler del CFM,
+        remuestreado a sample_rate si difiere de los 24 kHz del modelo
+        """
+        ref_frames = self.ref_mel.shape[0]
+        ref_bytes = max(len(self.ref_text.encode('utf-8')), 1)
+        gen_frames = int(ref_frames / ref_bytes * len(gen_text.encode('utf-8')) / speed)
+        duration = ref_frames + max(gen_frames, 1)
+
+        # Condición: mel de referencia y ceros en la parte a generar
+        cond = np.zeros((1, duration, N_MEL_CHANNELS), dtype=np.float32)
+        cond[0, :ref_frames] = self.ref_mel
+        text_ids = self._text_to_ids(self.ref_text + gen_text, duration)
+
+        rng = np.random.default_rng(None if seed is None or seed < 0 else seed)
+        x = rng.standard_normal((1, duration, N_MEL_CHANNELS)).astype(np.float32)
+
+        # Pasos temporales con sway sampling
+        t = np.linspace(0.0, 1.0, nfe_step + 1, dtype=np.float32)
+        if sway_sampling_coef is not None:
+            t = t + sway_sampling_coef * (np.cos(np.pi / 2 * t) - 1 + t)
+
+        cfg = np.array([cfg_strength], dtype=np.float32)
+        for i in range(nfe_step):
+            velocity = self.dit.run(None, {
+                'x': x,
+                'cond': cond,
+                'text': text_ids,
+                'time': np.array([t[i]], dtype=np.float32),
+                'cfg_strength': cfg
+            })[0]
+            x += (t[i + 1] - t[i]) * velocity
+
+        mel = x[:, ref_frames:, :].transpose(0, 2, 1)  # (1, n_mels, frames)
+
+        # Vocoder: espectro desde ONNX + ISTFT en librosa
+        magnitude, phase = self.vocoder.run(None, {'mel': mel})
+        spectrum = magnitude[0] * np.exp(1j * phase[0])
+        wav = librosa.istft(
+            spectrum,
+            hop_length=HOP_LENGTH,
+            win_length=WIN_LENGTH,
+            n_fft=N_FFT,
+            window='hann',
+            center=True
+        ).astype(np.float32)
+
+        if self.ref_rms < TARGET_RMS:
+            wav *= self.ref_rms / TARGET_RMS
+
+        if sample_rate != TARGET_SAMPLE_RATE:
+            wav = librosa.resample(wav, orig_sr=TARGET_SAMPLE_RATE, target_sr=sample_rate)
+
+        return wav
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+====================================================================================================
+BASE DE LAS CACHÉS PERSISTENTES EN PICKLE
+====================================================================================================
+
+Descripción:
+    Diccionario persistido en disco entre ejecuciones, invalidado cuando cambian
+    las reglas que producen sus valores. Lo comparten la caché fonética
+    (phoneme_cache.py) y la de hints prosódicos (hint_cache.py).
+
+Funcionamiento:
+    - Archivo: pickle en DEFAULT_PATH (o la variable de entorno ENV_VAR)
+    - Se invalida automáticamente si cambia la huella de RULE_SOURCES (archivos
+      de este directorio) o la VERSION del formato de la subclase
+    - Escritura atómica (archivo temporal + os.replace)
+    - Un solo guardado al salir por archivo: al crear otra instancia sobre la misma
+      ruta se vuelca la anterior, que deja de estar referenciada desde aquí
+
+Autor: Sistema de generación prosódica F5-TTS
+Versión: 2.0
+====================================================================================================
+"""
+
+import atexit
+import hashlib
+import os
+import pickle
+import threading
+from pathlib import Path
+from typing import Any, Dict, Hashable, Optional
+
+# Instancia vigente por archivo (la que se guarda al salir)
+_ACTIVE: Dict[Path, "PersistentPickleCache"] = {}
+_ACTIVE_LOCK = threading.Lock()
+
+
+def _save_active_caches():
+    with _ACTIVE_LOCK:
+        caches = list(_ACTIVE.values())
+    for cache in caches:
+        cache.save()
+
+
+atexit.register(_save_active_caches)
+
+
+def rules_fingerprint(sources, version: int = 1, extra: str = "") -> str:
+    """Huella de las reglas: cambia si se edita cualquiera de sus fuentes o el formato"""
+    digest = hashlib.md5(f"{version}:{extra}".encode())
+    module_dir = Path(__file__).resolve().parent
+    for name in sources:
+        try:
+            digest.update((module_dir / name).read_bytes())
+        except OSError:
+            pass
+    return digest.hexdigest()
+
+
+class PersistentPickleCache:
+    """
+    Diccionario clave -> valor persistido entre ejecuciones
+    """
+
+    DEFAULT_PATH: Path = Path(".cache.pkl")
+    ENV_VAR: Optional[str] = None
+    RULE_SOURCES = ()
+    VERSION = 1
+    LABEL = "caché"
+
+    def __init__(self, path: Optional[str] = None):
+        env_path = os.environ.get(self.ENV_VAR) if self.ENV_VAR else None
+        self.path = Path(path or env_path or self.DEFAULT_PATH)
+        self.fingerprint = rules_fingerprint(self.RULE_SOURCES, self.VERSION, self._rules_extra())
+        self.entries: Dict[Hashable, Any] = {}
+        self._dirty = False
+        # Reentrante: save() llama a _evict() con el cerrojo tomado
+        self._lock = threading.RLock()
+
+        # Volcar la instancia anterior sobre este archivo antes de leerlo: así
+        # no se pierden sus entradas y deja de quedar retenida hasta el final
+        key = self.path.resolve()
+        with _ACTIVE_LOCK:
+            previous = _ACTIVE.get(key)
+            _ACTIVE[key] = self
+        if previous is not None:
+            previous.save()
+
+        try:
+            with open(self.path, 'rb') as f:
+                data = pickle.load(f)
+            if data.get('fingerprint') == self.fingerprint:
+                self.entries = data['entries']
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, KeyError, TypeError):
+            # Sin caché previa o caché de otra versión de las reglas
+            pass
+
+    def _rules_extra(self) -> str:
+        """Punto de extensión: reglas que no están en RULE_SOURCES (p. ej. módulos externos)"""
+        return ""
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self.entries[key] = value
+            self._dirty = True
+
+    def _evict(self):
+        """Punto de extensión: recortar entradas antes de escribir"""
+
+    def save(self):
+        """Escribe la caché a disco si hay entradas nuevas (escritura atómica)"""
+        with self._lock:
+            if not self._dirty:
+                return
+            self._evict()
+            tmp_path = self.path.with_name(self.path.name + '.tmp')
+            try:
+                with open(tmp_path, 'wb') as f:
+                    pickle.dump({'fingerprint': self.fingerprint, 'entries': self.entries}, f,
+                                protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(tmp_path, self.path)
+                self._dirty = False
+            except (OSError, pickle.PicklingError, AttributeError, TypeError) as e:
+                print(f"⚠️ No se pudo guardar la {self.LABEL}: {e}")
+
+    def __len__(self):
+        return len(self.entries)
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+====================================================================================================
+CACHÉ PERSISTENTE DE TRANSFORMACIONES FONÉTICAS
+====================================================================================================
+
+Descripción:
+    Guarda en disco las palabras ya fonetizadas por SpanishPhoneticTransformer para
+    que las siguientes ejecuciones (o la reanudación de una sesión) no vuelvan a
+    aplicar las reglas fonéticas y de anglicismos a palabras ya conocidas.
+
+Funcionamiento:
+    - Clave: (dialecto, adaptar_anglicismos, palabra en minúsculas)
+    - Archivo: pickle en ./.phoneme_cache.pkl (o F5_PHONEME_CACHE)
+    - Se invalida automáticamente si cambian las reglas (huella del código fuente
+      de phonetic_processor.py y spanish_dialects.py)
+    - Se guarda al terminar la transformación y al salir del proceso
+      (carga, guardado e invalidación en persistent_cache.py)
+
+Autor: Sistema de transformación fonética
+Versión: 2.0
+====================================================================================================
+"""
+
+from pathlib import Path
+
+from core.persistent_cache import PersistentPickleCache
+
+DEFAULT_CACHE_PATH = Path(".phoneme_cache.pkl")
+
+
+class PhonemeCache(PersistentPickleCache):
+    """
+    Diccionario (dialecto, anglicismos, palabra) -> forma fonética persistido entre ejecuciones.
+    El vocabulario está acotado, así que no se expulsan entradas.
+    """
+
+    DEFAULT_PATH = DEFAULT_CACHE_PATH
+    ENV_VAR = 'F5_PHONEME_CACHE'
+    # Archivos cuyas reglas determinan el resultado de la transformación
+    RULE_SOURCES = ("phonetic_processor.py", "spanish_dialects.py")
+    LABEL = "caché fonética"
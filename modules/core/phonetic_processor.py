@@ -94,7 +94,7 @@ class SpanishPhoneticTransformer:
         phonetic_rules (list): Conjunto de reglas fonéticas a aplicar
     """
 
-    def __init__(self, dialect: str = "castilla"):
+    def __init__(self, dialect: str = "castilla", persistent_cache=None):
         """
         Inicializa el transformador con reglas fonéticas predefinidas.
 
@@ -110,11 +110,14 @@ class SpanishPhoneticTransformer:
                 - "mexicano": Mexicano
                 - "canario": Canario
                 - "chileno": Chileno
+            persistent_cache (PhonemeCache, optional): Caché en disco compartida
+                entre ejecuciones (ver core/phoneme_cache.py)
         """
         # Sistema de caché multicapa
         self.word_cache = {}  # Caché de palabras individuales
         self.phrase_cache = {}  # Caché de frases comunes
         self.transformation_history = defaultdict(list)  # Historial para consistencia
+        self.persistent_cache = persistent_cache  # Caché en disco (opcional)
 
         # Guardar dialecto seleccionado
         self.dialect = dialect
@@ -1814,23 +1817,31 @@ class SpanishPhoneticTransformer:
                 transformed_words.append(transformed)
                 continue
 
-            # Primero verificar si es un anglicismo conocido
-            if adapt_english and word_lower in self.anglicisms_dictionary:
-                # Aplicar pronunciación castellana al anglicismo
-                transformed = self.anglicisms_dictionary[word_lower]
+            # Consultar la caché en disco antes de aplicar las reglas
+            persistent_key = (self.dialect, adapt_english, word_lower)
+            transformed = self.persistent_cache.get(persistent_key) if self.persistent_cache is not None else None
 
-                # También aplicar reglas fonéticas españolas al resultado
-                transformed = self._apply_phonetic_rules(transformed)
-            else:
-                # Intentar detectar patrones ingleses no registrados
-                english_transformed = self._detect_unknown_english_patterns(word_lower) if adapt_english else None
+            if transformed is None:
+                # Primero verificar si es un anglicismo conocido
+                if adapt_english and word_lower in self.anglicisms_dictionary:
+                    # Aplicar pronunciación castellana al anglicismo
+                    transformed = self.anglicisms_dictionary[word_lower]
 
-                if english_transformed:
-                    # Usar la transformación inglesa y aplicar reglas españolas
-                    transformed = self._apply_phonetic_rules(english_transformed)
+                    # También aplicar reglas fonéticas españolas al resultado
+                    transformed = self._apply_phonetic_rules(transformed)
                 else:
-                    # Aplicar transformación normal con reglas españolas
-                    transformed = self._apply_phonetic_rules(word_lower)
+                    # Intentar detectar patrones ingleses no registrados
+                    english_transformed = self._detect_unknown_english_patterns(word_lower) if adapt_english else None
+
+                    if english_transformed:
+                        # Usar la transformación inglesa y aplicar reglas españolas
+                        transformed = self._apply_phonetic_rules(english_transformed)
+                    else:
+                        # Aplicar transformación normal con reglas españolas
+                        transformed = self._apply_phonetic_rules(word_lower)
+
+                if self.persistent_cache is not None:
+                    self.persistent_cache.put(persistent_key, transformed)
 
             # Guardar en caché
             self.word_cache[word_lower] = transformed
@@ -48,13 +48,30 @@ Versión: 2.0
 import numpy as np
 import librosa
 import soundfile as sf
-from typing import List, Dict, Tuple, Optional, Any
+from typing import List, Dict, Tuple, Optional, Any, Callable
 import re
 import time
 from dataclasses import dataclass
 from pathlib import Path
 import logging
 import sys
+import json
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# numba viene con librosa; sin él, el crossfade usa NumPy
+try:
+    import numba
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
 
 # ====================================================================================================
 # CONFIGURACIÓN DE LOGGING
@@ -92,6 +109,38 @@ def _import_orquestador_maestro():
                 return None
 
 
+_REFERENCE_CACHE: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+
+def severity_nfe_schedule(severity: float) -> Optional[int]:
+    """
+    Tope de pasos NFE para regenerar según severidad: problemas leves con 16 pasos;
+    los graves sin tope (None), con los 36-58 de _adjust_generation_params
+    """
+    return 16 if severity < 0.5 else None
+
+
+def preprocess_reference(ref_file: str, ref_text: str = "") -> Tuple[str, str]:
+    """
+    Preprocesa el audio de referencia UNA vez por sesión (recorte a ~12s y
+    transcripción ASR si no hay texto) y devuelve (archivo procesado, texto).
+
+    Pasar el texto ya transcrito a F5TTS.infer evita que cada frase vuelva a
+    pasar por el recorte/transcripción de la referencia. Si F5-TTS no está
+    disponible o falla, devuelve la referencia original sin cambios.
+    """
+    key = (str(ref_file), ref_text)
+    if key not in _REFERENCE_CACHE:
+        try:
+            from f5_tts.infer.utils_infer import preprocess_ref_audio_text
+            _REFERENCE_CACHE[key] = tuple(preprocess_ref_audio_text(str(ref_file), ref_text))
+            logger.info(f"🎙️ Referencia preprocesada y cacheada: {Path(ref_file).name}")
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudo preprocesar la referencia ({e}); se usará tal cual")
+            _REFERENCE_CACHE[key] = (str(ref_file), ref_text)
+    return _REFERENCE_CACHE[key]
+
+
 # ============================================
 # PARTE 1: GENERACIÓN MEJORADA (LIGERA)
 # ============================================
@@ -434,57 +483,75 @@ class ProsodyAnalyzer:
 
     def analyze_complete_audio(self,
                               audio_segments: List[np.ndarray],
-                              texts: List[str]) -> List[Dict]:
+                              texts: List[str],
+                              max_workers: Optional[int] = None) -> List[Dict]:
         """
         Analiza todos los segmentos divididos en ventanas
         Evalúa cumplimiento del Arco Prosódico
+
+        Los segmentos son independientes: se reparten entre hilos (las FFT de
+        librosa/NumPy liberan el GIL) y el resultado conserva el orden.
         """
-        analysis_map = []
-
-        for i, (audio, text) in enumerate(zip(audio_segments, texts)):
-            # Dividir en ventanas de 250ms con 50% overlap
-            windows = self._split_into_windows(audio)
-
-            segment_analysis = {
-                'segment_id': i,
-                'text': text,
-                'text_length': len(text),
-                'windows': [],
-                'is_paragraph_end': self._is_paragraph_end(text),
-                'is_question': '?' in text,
-                'is_exclamation': '!' in text,
-                'sentence_type': self._detect_sentence_type(text)
-            }
+        if max_workers is None:
+            max_workers = min(8, os.cpu_count() or 1)
+        n = min(len(audio_segments), len(texts))
+
+        if max_workers <= 1 or n < 2:
+            return [
+                self.analyze_segment(i, audio, text)
+                for i, (audio, text) in enumerate(zip(audio_segments, texts))
+            ]
 
-            # Analizar cada ventana
-            for w_idx, window in enumerate(windows):
-                position = w_idx / max(len(windows) - 1, 1)  # 0.0 a 1.0
+        with ThreadPoolExecutor(max_workers=max_workers) as ex:
+            return list(ex.map(self.analyze_segment, range(n), audio_segments[:n], texts[:n]))
 
-                window_data = {
-                    'window_id': w_idx,
-                    'position': position,
-                    'position_type': self._classify_position(position),
-                    'pitch_mean': self._extract_pitch(window),
-                    'energy': np.sqrt(np.mean(window**2)),
-                    'spectral_centroid': self._extract_spectral_centroid(window)
-                }
-                segment_analysis['windows'].append(window_data)
+    def analyze_segment(self, segment_id: int, audio: np.ndarray, text: str) -> Dict:
+        """
+        Analiza un solo segmento (ventanas + métricas del Arco Prosódico).
+        No modifica estado: puede llamarse desde varios hilos mientras se genera.
+        """
+        # Dividir en ventanas de 250ms con 50% overlap
+        windows = self._split_into_windows(audio)
+        window_pitches, window_centroids = self._extract_window_features(windows)
 
-            # Calcular métricas del Arco Prosódico
-            if segment_analysis['windows']:
-                all_pitches = [w['pitch_mean'] for w in segment_analysis['windows'] if w['pitch_mean'] > 0]
-                if all_pitches:
-                    # Inicio, medio y final según Arco Prosódico
-                    segment_analysis['pitch_start'] = np.mean(all_pitches[:max(2, len(all_pitches)//5)])
-                    segment_analysis['pitch_middle'] = np.mean(all_pitches[len(all_pitches)//3:2*len(all_pitches)//3])
-                    segment_analysis['pitch_end'] = np.mean(all_pitches[-max(2, len(all_pitches)//5):])
+        segment_analysis = {
+            'segment_id': segment_id,
+            'text': text,
+            'text_length': len(text),
+            'windows': [],
+            'is_paragraph_end': self._is_paragraph_end(text),
+            'is_question': '?' in text,
+            'is_exclamation': '!' in text,
+            'sentence_type': self._detect_sentence_type(text)
+        }
 
-                    # Calcular pendiente del arco
-                    segment_analysis['arc_slope'] = (segment_analysis['pitch_end'] - segment_analysis['pitch_start']) / segment_analysis['pitch_start']
+        # Analizar cada ventana
+        for w_idx, window in enumerate(windows):
+            position = w_idx / max(len(windows) - 1, 1)  # 0.0 a 1.0
+
+            window_data = {
+                'window_id': w_idx,
+                'position': position,
+                'position_type': self._classify_position(position),
+                'pitch_mean': window_pitches[w_idx],
+                'energy': np.sqrt(np.mean(window**2)),
+                'spectral_centroid': window_centroids[w_idx]
+            }
+            segment_analysis['windows'].append(window_data)
+
+        # Calcular métricas del Arco Prosódico
+        if segment_analysis['windows']:
+            all_pitches = [w['pitch_mean'] for w in segment_analysis['windows'] if w['pitch_mean'] > 0]
+            if all_pitches:
+                # Inicio, medio y final según Arco Prosódico
+                segment_analysis['pitch_start'] = np.mean(all_pitches[:max(2, len(all_pitches)//5)])
+                segment_analysis['pitch_middle'] = np.mean(all_pitches[len(all_pitches)//3:2*len(all_pitches)//3])
+                segment_analysis['pitch_end'] = np.mean(all_pitches[-max(2, len(all_pitches)//5):])
 
-            analysis_map.append(segment_analysis)
+                # Calcular pendiente del arco
+                segment_analysis['arc_slope'] = (segment_analysis['pitch_end'] - segment_analysis['pitch_start']) / segment_analysis['pitch_start']
 
-        return analysis_map
+        return segment_analysis
 
     def _split_into_windows(self, audio: np.ndarray) -> List[np.ndarray]:
         """Divide audio en ventanas con 50% overlap"""
@@ -496,6 +563,45 @@ class ProsodyAnalyzer:
 
         return windows
 
+    def _extract_window_features(self, windows: List[np.ndarray]) -> Tuple[List[float], List[float]]:
+        """
+        Pitch medio y centroide espectral de todas las ventanas de un segmento
+        con una sola STFT multicanal (una fila por ventana), compartida entre
+        piptrack y spectral_centroid. Mismos parámetros que _extract_pitch y
+        _extract_spectral_centroid, a los que se recurre si algo falla.
+        """
+        if not windows:
+            return [], []
+
+        try:
+            frames = np.stack(windows).astype(float)  # (ventanas, muestras)
+            S = np.abs(librosa.stft(y=frames, n_fft=2048, hop_length=512))
+
+            pitches, magnitudes = librosa.piptrack(
+                S=S,
+                sr=self.sample_rate,
+                fmin=50,   # Mínimo para voz humana
+                fmax=500,  # Máximo para voz hablada
+                threshold=0.1
+            )
+
+            # Pitch con mayor magnitud en cada frame; media de los frames con pitch
+            best = magnitudes.argmax(axis=-2)[..., np.newaxis, :]
+            frame_pitch = np.take_along_axis(pitches, best, axis=-2)[..., 0, :]
+            voiced = frame_pitch > 0
+            counts = voiced.sum(axis=-1)
+            sums = np.where(voiced, frame_pitch, 0.0).sum(axis=-1)
+            pitch_means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+
+            centroids = librosa.feature.spectral_centroid(S=S, sr=self.sample_rate).mean(axis=(-2, -1))
+
+            return [float(p) for p in pitch_means], [float(c) for c in centroids]
+
+        except Exception as e:
+            logger.warning(f"Error en análisis por lotes, analizando ventana a ventana: {e}")
+            return ([self._extract_pitch(w) for w in windows],
+                    [self._extract_spectral_centroid(w) for w in windows])
+
     def _extract_pitch(self, window: np.ndarray) -> float:
         """Extrae pitch fundamental usando librosa piptrack"""
         try:
@@ -840,18 +946,28 @@ class SelectiveRegenerator:
     Máximo 8 regeneraciones con estrategias más específicas
     """
 
-    def __init__(self, f5_generator, max_attempts: int = 25, max_fixes: int = 8):
+    def __init__(self, f5_generator, max_attempts: int = 25, max_fixes: int = 8,
+                 nfe_schedule: Optional[Callable[[float], Optional[int]]] = None):
         self.generator = f5_generator
         self.max_attempts = max_attempts
         self.max_fixes = max_fixes  # Aumentado de 5 a 8 para ser más agresivo
         self.hint_generator = ProsodyHintGenerator()
 
+        # Pasos NFE máximos según la severidad del problema (None = sin límite).
+        # Si el intento barato no corrige lo suficiente, se sigue con NFE completo.
+        self.nfe_schedule = nfe_schedule
+
         # Contexto de referencia para F5-TTS
         self.reference_file = None
         self.reference_text = ""
 
     def set_reference_context(self, ref_file: str, ref_text: str = ""):
-        """Configura el contexto de referencia para regeneraciones"""
+        """
+        Configura el contexto de referencia para regeneraciones.
+        La referencia se preprocesa una sola vez y se reutiliza en cada intento.
+        """
+        if self.generator is not None and ref_file:
+            ref_file, ref_text = preprocess_reference(ref_file, ref_text)
         self.reference_file = ref_file
         self.reference_text = ref_text
 
@@ -872,7 +988,8 @@ class SelectiveRegenerator:
             'attempted': 0,
             'successful': 0,
             'failed': 0,
-            'fixes': []
+            'fixes': [],
+            'fixed_indices': []  # segmentos sustituidos (para reescribir solo esos)
         }
 
         # Filtrar y limitar problemas a corregir
@@ -901,10 +1018,15 @@ class SelectiveRegenerator:
             max_safe_attempts = min(self.max_attempts, 5)  # Máximo 5 intentos por problema
             consecutive_failures = 0
 
+            # NFE reducido para problemas leves mientras los intentos baratos basten
+            reduced_nfe = self.nfe_schedule(problem['severity']) if self.nfe_schedule else None
+
             for attempt in range(max_safe_attempts):
                 try:
                     # Ajustar parámetros F5-TTS según el intento
                     generation_params = self._adjust_generation_params(problem, attempt)
+                    if reduced_nfe is not None:
+                        generation_params['nfe_step'] = min(generation_params['nfe_step'], reduced_nfe)
 
                     # Validar parámetros antes de usar
                     if not self._validate_generation_params(generation_params):
@@ -943,6 +1065,10 @@ class SelectiveRegenerator:
                         best_score = score
                         best_candidate = new_audio
 
+                    # El intento con NFE reducido no bastó: volver a NFE completo
+                    if reduced_nfe is not None and score <= 0.5:
+                        reduced_nfe = None
+
                     # Si es suficientemente bueno, parar
                     if score > 0.8:
                         logger.info(f"    ✅ Corregido en intento {attempt + 1} (score: {score:.2f})")
@@ -998,11 +1124,14 @@ Intento: {attempt + 1}
                     'problem_type': problem['type'],
                     'improvement_score': best_score
                 })
+                if seg_id not in fix_report['fixed_indices']:
+                    fix_report['fixed_indices'].append(seg_id)
                 logger.info(f"    ✅ Aplicado fix con score {best_score:.2f}")
             else:
                 fix_report['failed'] += 1
                 logger.warning(f"    ❌ No se pudo mejorar suficientemente")
 
+        fix_report['fixed_indices'].sort()
         return fixed_segments, fix_report
 
     def _prepare_correction_hints(self, problem: Dict, text: str) -> Dict:
@@ -1637,44 +1766,162 @@ def smart_concatenate(segments: List[np.ndarray], crossfade_ms: int = 50, sr: in
     if len(segments) == 1:
         return segments[0]
 
-    result = segments[0]
     crossfade_samples = int(crossfade_ms * sr / 1000)
+    starts, crossfaded, total = _smart_concatenate_layout(segments, crossfade_samples)
+
+    # Un único buffer de salida en lugar de re-concatenar el resultado por segmento
+    result = np.zeros(total, dtype=np.result_type(np.float32, *segments))
+    _smart_concatenate_into(result, segments, starts, crossfaded, crossfade_samples)
+    return result
+
+
+def smart_concatenate_to_wav(segments: List[np.ndarray], path, crossfade_ms: int = 50, sr: int = 44100):
+    """
+    Igual que smart_concatenate + write_pcm16_wav, pero el buffer de salida es un
+    np.memmap en un archivo temporal junto al destino: para libros de horas el
+    audio concatenado no se duplica en RAM (solo se escriben páginas a disco)
+    """
+    crossfade_samples = int(crossfade_ms * sr / 1000)
+    starts, crossfaded, total = _smart_concatenate_layout(segments, crossfade_samples)
 
+    if total == 0:
+        write_pcm16_wav(path, np.zeros(0, dtype=np.float32), sr)
+        return
+
+    with tempfile.TemporaryFile(dir=Path(path).parent) as scratch:
+        result = np.memmap(scratch, dtype=np.float32, mode='w+', shape=(total,))
+        _smart_concatenate_into(result, segments, starts, crossfaded, crossfade_samples)
+        write_pcm16_wav(path, result, sr)
+        del result
+
+
+def _smart_concatenate_layout(segments: List[np.ndarray], crossfade_samples: int) -> Tuple[List[int], List[bool], int]:
+    """Posición de cada segmento en la salida y longitud total"""
+    if not segments:
+        return [], [], 0
+
+    # Se solapa crossfade_samples con lo anterior solo si ambos lados son más
+    # largos que el crossfade
+    starts = [0]
+    crossfaded = [False]
+    cursor = len(segments[0])
     for next_seg in segments[1:]:
-        if len(result) > crossfade_samples and len(next_seg) > crossfade_samples:
-            # Aplicar crossfade tipo coseno (más natural)
-            t = np.linspace(0, np.pi/2, crossfade_samples)
-            fade_out = np.cos(t)
-            fade_in = np.sin(t)
-
-            # Aplicar fades
-            result[-crossfade_samples:] *= fade_out
-            overlap = result[-crossfade_samples:] + next_seg[:crossfade_samples] * fade_in
-
-            # Concatenar
-            result = np.concatenate([
-                result[:-crossfade_samples],
-                overlap,
-                next_seg[crossfade_samples:]
-            ])
-        else:
-            # Sin crossfade si los segmentos son muy cortos
-            result = np.concatenate([result, next_seg])
+        use_crossfade = cursor > crossfade_samples and len(next_seg) > crossfade_samples
+        start = cursor - crossfade_samples if use_crossfade else cursor
+        starts.append(start)
+        crossfaded.append(use_crossfade)
+        cursor = start + len(next_seg)
 
-    return result
+    return starts, crossfaded, cursor
+
+
+def _smart_concatenate_into(result: np.ndarray, segments: List[np.ndarray], starts: List[int],
+                            crossfaded: List[bool], crossfade_samples: int):
+    """Escribe los segmentos en result (a ceros) aplicando el crossfade"""
+    # Crossfade tipo coseno (más natural), calculado una sola vez
+    t = np.linspace(0, np.pi/2, crossfade_samples)
+    fade_out = np.cos(t)
+    fade_in = np.sin(t)
+
+    out = np.asarray(result)
+    for seg, start, use_crossfade in zip(segments, starts, crossfaded):
+        # Sin crossfade si los segmentos son muy cortos
+        crossfade_into(out, seg, start, fade_out, fade_in,
+                       crossfade_samples if use_crossfade else 0)
+
+
+def crossfade_into(out: np.ndarray, seg: np.ndarray, offset: int,
+                   fade_out: np.ndarray, fade_in: np.ndarray, n: int):
+    """
+    Escribe seg en out[offset:], mezclando sus n primeras muestras con lo ya
+    escrito (out * fade_out + seg * fade_in). Con numba es una sola pasada
+    fusionada por muestra, sin arrays intermedios.
+    """
+    if NUMBA_AVAILABLE:
+        _crossfade_kernel(out, seg, offset, fade_out, fade_in, n)
+        return
+    if n:
+        overlap = out[offset:offset + n]
+        overlap *= fade_out
+        overlap += seg[:n] * fade_in
+    out[offset + n:offset + len(seg)] = seg[n:]
+
+
+def warm_up_crossfade():
+    """
+    Compila el kernel de crossfade para float32 y float64 antes de generar, para
+    que el JIT (o la carga desde la caché de numba) no caiga en la concatenación
+    """
+    if not NUMBA_AVAILABLE:
+        return
+    for dtype in (np.float32, np.float64):
+        ramp = np.zeros(1, dtype=dtype)
+        crossfade_into(np.zeros(2, dtype=dtype), np.zeros(2, dtype=dtype), 0, ramp, ramp, 1)
+
+
+if NUMBA_AVAILABLE:
+    @numba.njit(cache=True, fastmath=True, boundscheck=False)
+    def _crossfade_kernel(out, seg, offset, fade_out, fade_in, n):
+        """Mezcla las n primeras muestras de seg con out[offset:] y copia el resto"""
+        for i in range(n):
+            out[offset + i] = out[offset + i] * fade_out[i] + seg[i] * fade_in[i]
+        for i in range(n, seg.shape[0]):
+            out[offset + i] = seg[i]
+
+
+def write_pcm16_wav(path, audio: np.ndarray, sr: int, block_samples: int = 1 << 19):
+    """
+    Guarda audio float como WAV PCM_16 convirtiendo a int16 por bloques (~1 MB)
+    Evita la copia temporal completa que hace libsndfile al convertir un audio largo
+    """
+    audio = np.asarray(audio)
+    with sf.SoundFile(str(path), 'w', samplerate=sr, channels=1, subtype='PCM_16') as f:
+        for start in range(0, len(audio), block_samples):
+            block = audio[start:start + block_samples]
+            # Misma escala y redondeo que libsndfile, pero recortando en vez de desbordar
+            pcm = np.clip(np.rint(block * 32767.0), -32768, 32767).astype(np.int16)
+            f.buffer_write(pcm, dtype='int16')
+
+
+def _json_default(obj):
+    """Convierte tipos numpy (y cualquier otro objeto) a algo serializable"""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+
+def dump_json(obj: Any, path):
+    """
+    Escribe un reporte JSON indentado (UTF-8, sin escapar acentos)
+    Usa orjson si está instalado; si no, json estándar con conversión de numpy.
+    Escritura atómica: un corte a mitad deja el reporte anterior intacto
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    if ORJSON_AVAILABLE:
+        data = orjson.dumps(
+            obj,
+            default=_json_default,
+            option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+        tmp_path.write_bytes(data)
+    else:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, indent=2, ensure_ascii=False, default=_json_default)
+    os.replace(tmp_path, path)
 
 
 def export_prosody_report(report: Dict, output_path: str):
     """Exporta reporte de procesamiento prosódico"""
 
-    import json
     from datetime import datetime
 
     report['timestamp'] = datetime.now().isoformat()
     report['version'] = '1.0.0'
 
-    with open(output_path, 'w', encoding='utf-8') as f:
-        json.dump(report, f, indent=2, ensure_ascii=False)
+    dump_json(report, output_path)
 
     print(f"📊 Reporte exportado a: {output_path}")
 
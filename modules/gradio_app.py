@@ -36,6 +36,7 @@ from datetime import datetime
 import json
 import gradio as gr
 import threading
+import queue
 
 # ====================================================================================================
 # IMPORTACIÓN DE MÓDULOS DE PROCESAMIENTO PROSÓDICO
@@ -47,8 +48,10 @@ from core.prosody_processor import (
     ProsodyAnalyzer,          # Analizador de características prosódicas del audio
     ProsodyProblemDetector,   # Detector de problemas prosódicos en el audio generado
     SelectiveRegenerator,     # Regenerador selectivo de segmentos problemáticos
-    smart_concatenate,        # Concatenación inteligente con crossfade
-    export_prosody_report     # Exportador de reportes de análisis prosódico
+    smart_concatenate_to_wav, # Concatenación inteligente con crossfade, directa a WAV
+    export_prosody_report,    # Exportador de reportes de análisis prosódico
+    severity_nfe_schedule,    # Pasos NFE de regeneración según severidad
+    dump_json                 # Escritura de reportes JSON (orjson si está disponible)
 )
 
 # Transformador fonético para variaciones dialectales del español
@@ -468,7 +471,7 @@ class ProsodyGeneratorGradio:
                 # Crear transformador con el dialecto seleccionado
                 self.phonetic_transformer = SpanishPhoneticTransformer(dialect=dialect_id)
 
-                original_text = "\n\n".join([p['text'] for p in paragraphs])
+                original_text = "\n\n".join(p['text'] for p in paragraphs)
 
                 # Guardar texto original
                 original_path = output_dir / "texto_original.txt"
@@ -536,6 +539,9 @@ class ProsodyGeneratorGradio:
                 gr.update(visible=False)
             )
 
+            # Escritor de WAV en segundo plano (solapa la E/S con la inferencia)
+            self._start_wav_writer()
+
             # Procesar en modo completo
             for update in self.process_full_mode(all_sentences, output_dir, progress):
                 yield update
@@ -574,8 +580,37 @@ class ProsodyGeneratorGradio:
             )
 
         finally:
+            self._stop_wav_writer()
             self.is_processing = False
 
+    def _start_wav_writer(self):
+        """Arranca el hilo que escribe los WAV encolados con (ruta, audio, sr)"""
+        self._write_q = queue.Queue(maxsize=8)
+
+        def _writer():
+            while True:
+                item = self._write_q.get()
+                try:
+                    if item is None:
+                        break
+                    path, audio, sr = item
+                    sf.write(path, np.ascontiguousarray(audio), sr)
+                except Exception as e:
+                    self.log(f"⚠️ Error escribiendo {item[0]}: {e}")
+                finally:
+                    self._write_q.task_done()
+
+        self._write_thread = threading.Thread(target=_writer, daemon=True)
+        self._write_thread.start()
+
+    def _stop_wav_writer(self):
+        """Vacía la cola de escritura y termina el hilo escritor"""
+        if getattr(self, '_write_thread', None) is None:
+            return
+        self._write_q.put(None)
+        self._write_thread.join()
+        self._write_thread = None
+
     def process_full_mode(self, sentences: List[Dict], output_dir: Path, progress):
         """Procesa en modo completo con generador de actualizaciones"""
         self.log("\n🔍 MODO COMPLETO - Fase 1 (Sistema Híbrido) + Fase 2 (Post-procesamiento)")
@@ -591,7 +626,7 @@ class ProsodyGeneratorGradio:
         self.log("\n📝 FASE 1: Generación con hints prosódicos (Sistema Híbrido)")
 
         # Preparar texto completo
-        full_text = " ".join([s['text'] for s in sentences])
+        full_text = " ".join(s['text'] for s in sentences)
 
         self.log("🎵 Inicializando generador híbrido...")
 
@@ -628,6 +663,9 @@ class ProsodyGeneratorGradio:
         audio_segments = []
         total = len(generator.frases)
 
+        # Ruta de cada frase, formateada una sola vez para Fase 1 y Fase 2
+        frase_paths = [frases_dir / f"frase_{i + 1:03d}.wav" for i in range(total)]
+
         self.log(f"📝 Ejecutando Fase 1 completa: {total} frases con mejoras prosódicas...")
 
         yield (
@@ -661,9 +699,8 @@ class ProsodyGeneratorGradio:
 
             audio_segments.append(audio)
 
-            # Guardar frase individual
-            frase_path = frases_dir / f"frase_{idx + 1:03d}.wav"
-            sf.write(frase_path, audio, generator.sample_rate)
+            # Guardar frase individual (en el hilo escritor)
+            self._write_q.put((frase_paths[idx], audio, generator.sample_rate))
 
             # Actualizar UI cada 5 frases
             if idx % 5 == 0:
@@ -677,6 +714,9 @@ class ProsodyGeneratorGradio:
                     gr.update(visible=False)
                 )
 
+        # Esperar a que todas las frases de Fase 1 estén en disco
+        self._write_q.join()
+
         # Guardar resultado Fase 1
         if audio_segments:
             self.log(f"\n🔗 Guardando resultado de Fase 1...")
@@ -707,7 +747,7 @@ class ProsodyGeneratorGradio:
             return
 
         # Analizar audio
-        texts = [frase for frase in generator.frases]
+        texts = generator.frases
         analyzer = ProsodyAnalyzer()
         analysis = analyzer.analyze_complete_audio(audio_segments, texts)
 
@@ -734,7 +774,7 @@ class ProsodyGeneratorGradio:
                 self.log(f"🔧 Corrigiendo {len(critical)} problemas críticos...")
                 progress(0.75, desc=f"Fase 2: Corrigiendo {len(critical)} problemas...")
 
-                regenerator = SelectiveRegenerator(generator.f5tts, max_fixes=5)
+                regenerator = SelectiveRegenerator(generator.f5tts, max_fixes=5, nfe_schedule=severity_nfe_schedule)
                 regenerator.set_reference_context(str(generator.reference_file), "")
 
                 corrected_segments, fix_report = regenerator.fix_critical_problems(
@@ -743,14 +783,13 @@ class ProsodyGeneratorGradio:
 
                 audio_segments = corrected_segments
 
-                # Sobreescribir frases corregidas
-                try:
-                    for idx_corr, audio_corr in enumerate(audio_segments):
-                        frase_path = frases_dir / f"frase_{idx_corr + 1:03d}.wav"
-                        sf.write(frase_path, audio_corr, generator.sample_rate)
-                    self.log("💾 Frases corregidas sobreescritas en disco")
-                except Exception as e:
-                    self.log(f"⚠️ No se pudo sobreescribir frases: {e}")
+                # Sobreescribir solo las frases corregidas (en el hilo escritor)
+                fixed_ids = fix_report['fixed_indices']
+                for idx_corr in fixed_ids:
+                    self._write_q.put((frase_paths[idx_corr], audio_segments[idx_corr], generator.sample_rate))
+                self._write_q.join()
+                if fixed_ids:
+                    self.log(f"💾 {len(fixed_ids)} frases corregidas sobreescritas en disco")
 
                 self.log(f"✅ Correcciones aplicadas: {fix_report['successful']}/{fix_report['attempted']}")
 
@@ -762,8 +801,7 @@ class ProsodyGeneratorGradio:
                     'phase2_fix_details': fix_report
                 }
 
-                with open(output_dir / "reporte_correcciones_fase2.json", 'w', encoding='utf-8') as f:
-                    json.dump(corrections_report, f, indent=2, ensure_ascii=False)
+                dump_json(corrections_report, output_dir / "reporte_correcciones_fase2.json")
             else:
                 self.log("✅ No se encontraron problemas críticos en Fase 1")
 
@@ -781,9 +819,8 @@ class ProsodyGeneratorGradio:
         progress(0.95, desc="Generando audio final...")
 
         if audio_segments:
-            final_audio = smart_concatenate(audio_segments, crossfade_ms=50, sr=generator.sample_rate)
             final_path = output_dir / "audio_final_completo.wav"
-            sf.write(final_path, final_audio, generator.sample_rate)
+            smart_concatenate_to_wav(audio_segments, final_path, crossfade_ms=50, sr=generator.sample_rate)
 
             self.log(f"\n✅ Audio final guardado: {final_path.name}")
 
@@ -851,8 +888,7 @@ class ProsodyGeneratorGradio:
             **data
         }
 
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        dump_json(report, path)
 
         self.log(f"📊 Reporte guardado: {path}")
 
@@ -1096,9 +1132,11 @@ class ProsodyGeneratorGradio:
                 frases_dir = last_dir / 'frases'
 
                 if frases_dir.exists():
-                    # Contar frases existentes
+                    # Contar frases existentes (un solo listado del directorio)
+                    with os.scandir(frases_dir) as it:
+                        existing = {e.name for e in it}
                     idx = 0
-                    while (frases_dir / f"frase_{idx + 1:03d}.wav").exists():
+                    while f"frase_{idx + 1:03d}.wav" in existing:
                         idx += 1
 
                     if idx > 0:
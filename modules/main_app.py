@@ -7,7 +7,12 @@ GUI para seleccionar modo de procesamiento
 """
 
 import os
+import re
+import math
 import sys
+import shutil
+import subprocess
+import platform
 from pathlib import Path
 import numpy as np
 import soundfile as sf
@@ -17,7 +22,13 @@ from datetime import datetime
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
+import queue
 import json
+import atexit
+from collections import deque
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from array import array
 
 # Importar módulos necesarios
 from core.prosody_processor import (
@@ -26,16 +37,26 @@ from core.prosody_processor import (
     ProsodyAnalyzer,
     ProsodyProblemDetector,
     SelectiveRegenerator,
-    smart_concatenate,
-    export_prosody_report
+    smart_concatenate_to_wav,
+    export_prosody_report,
+    preprocess_reference,
+    severity_nfe_schedule,
+    dump_json
 )
 
 # Importar transformador fonético
 from core.phonetic_processor import SpanishPhoneticTransformer
+from core.phoneme_cache import PhonemeCache
 
 # Importar sistema híbrido
 try:
-    from tts_generator import ProsodyEnhancedGenerator
+    from tts_generator import (
+        ProsodyEnhancedGenerator,
+        get_shared_f5tts,
+        load_reference_conditioning,
+        f5_batch_max_chars,
+        infer_f5_batch
+    )
     HYBRID_AVAILABLE = True
     print("✅ Sistema híbrido cargado")
 except ImportError as e:
@@ -51,11 +72,118 @@ except ImportError:
     F5_AVAILABLE = False
 
 
+# Patrones precompilados para la segmentación de frases (split_into_sentences)
+_RE_PROTECT_ABBR = re.compile(r'\b(Sr|Sra|Dr|Dra|St|Sto|Sta)\.\s*')
+
+# Tokenizador de una sola pasada: cada coincidencia es un punto de ruptura potencial.
+# Sustituye a la antigua cadena de ~15 re.sub con marcadores <FRASE_BREAK>.
+_RE_SPLITTER = re.compile(
+    r'(?P<ellipsis>\.\.\.\s*)'          # puntos suspensivos
+    r'|(?P<dot>\.(?=\s))'                # punto (solo sin otros marcadores)
+    r'|(?P<closer>[!?])'                  # cierre de exclamación/pregunta
+    r'|(?P<opener>[¡¿])'                  # apertura española
+    r'|(?P<semicolon>;\s*)'              # punto y coma (se elimina)
+    r'|(?P<colon>:\s*(?!"))'             # dos puntos (no antes de comillas)
+    r'|(?P<dash>(?<=\s)[–—-](?=\s))'     # guion/raya con espacios (se elimina)
+    r'|(?P<quote>")'                     # comillas (se emparejan después)
+)
+_RE_HAS_WORD_CHAR = re.compile(r'[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9]')
+
+# Puntos de división dentro de un tramo (_separate_exclamations_questions):
+# cierre seguido de apertura española, o cierre + espacio + mayúscula
+_RE_SPLIT_POINTS = re.compile(r'[.!?](?:\s*[¡¿]|\s+[A-ZÁÉÍÓÚÑ])')
+_RE_TRAILING_PUNCT_DOT = re.compile(r'([:;\-–—,"])\.+$')
+_RE_TRAILING_PUNCT = re.compile(r'[:;\-–—,"]+$')
+
+# Conectores para dividir frases largas (_split_long_sentence), por prioridad
+_RE_LONG_CONNECTORS = [
+    re.compile(p, re.IGNORECASE) for p in [
+        r',\s+(y|pero|sin embargo|además|también|cuando|donde|que|como si|mientras)',
+        r',\s+(después|antes|luego|entonces|así que|por eso)',
+        r',\s+(aunque|a pesar de|excepto|salvo)',
+    ]
+]
+
+# Vista previa de una línea para el log (saltos y tabuladores -> espacio)
+_PREVIEW_TABLE = str.maketrans({'\n': ' ', '\r': ' ', '\t': ' '})
+
+# Fusión de frases cortas (_merge_short_sentences)
+_INTERJECTIONS = frozenset(("oye", "eh", "ey", "hey"))
+_RE_TRAILING_STOP = re.compile(r'[.!?]+$')
+
+# Archivos de frase generados (detección de reanudación)
+_RE_FRASE_WAV = re.compile(r'frase_(\d+)\.wav')
+# Última detección automática de la sesión (índice y mtime de frases/), dentro de la sesión
+SCAN_CACHE_NAME = '.resume_scan.json'
+
+
+def _append_to_previous_with_comma(prev: str, addon: str) -> str:
+    """Une addon a la frase anterior con coma, quitando su puntuación final"""
+    prev_core = _RE_TRAILING_STOP.sub('', prev).strip()
+    return f"{prev_core}, {addon}".strip()
+
+
+# Plantilla del log de error crítico (se rellena con .format en _handle_critical_error)
+_CRITICAL_LOG_TEMPLATE = """
+╔═══════════════════════════════════════════════════════════════════════════════╗
+║                           🚨 ERROR CRÍTICO DETECTADO 🚨                        ║
+╠═══════════════════════════════════════════════════════════════════════════════╣
+║ Timestamp: {timestamp}                                              ║
+║ Contexto:  {context:<60} ║
+║ Error:     {error:<60} ║
+║                                                                               ║
+║ 📋 INFORMACIÓN DEL ERROR:                                                     ║
+║ • Problemas de interpolación temporal en F5-TTS                               ║
+║ • Generalmente causado por parámetros extremos o texto problemático          ║
+║ • {action}                     ║
+╚═══════════════════════════════════════════════════════════════════════════════╝
+"""
+
+
 class F5ProsodyAdapter:
     """
     Adaptador que conecta el sistema de mejora prosódica con F5-TTS
     """
 
+    # Parámetros cada vez más conservadores por reintento (índice = reintento - 1).
+    # Compartidos entre llamadas: copiar antes de modificar.
+    _RETRY_PARAMS = (
+        {
+            'nfe_step': 28,
+            'sway_sampling_coef': -0.3,
+            'cfg_strength': 1.8,
+            'speed': 1.0,
+            'remove_silence': False,
+            'seed': 42  # Seed fijo para reproducibilidad
+        },
+        {
+            'nfe_step': 24,
+            'sway_sampling_coef': -0.2,
+            'cfg_strength': 1.5,
+            'speed': 1.0,
+            'remove_silence': False,
+            'seed': 123
+        },
+        {
+            'nfe_step': 20,  # Mínimo absoluto
+            'sway_sampling_coef': -0.1,
+            'cfg_strength': 1.2,
+            'speed': 1.0,
+            'remove_silence': False,
+            'seed': 456
+        },
+    )
+
+    # Parámetros de _generate_safe_audio
+    _SAFE_PARAMS = {
+        'nfe_step': 24,
+        'sway_sampling_coef': -0.2,
+        'cfg_strength': 1.5,
+        'speed': 1.0,
+        'remove_silence': False,
+        'seed': 42
+    }
+
     def __init__(self,
                  reference_audio: str = "segment_2955.wav",
                  model_type: str = "F5-TTS",
@@ -77,15 +205,31 @@ class F5ProsodyAdapter:
         if not self.reference_audio.exists():
             raise FileNotFoundError(f"❌ Audio de referencia no encontrado: {self.reference_audio}")
 
+        # Cachear ruta y nombre de la referencia (se usan en cada llamada a infer)
+        self._reference_audio_str = str(self.reference_audio)
+        self._reference_audio_name = self.reference_audio.name
+
+        # Sin F5/CUDA: intentar el backend ONNX en CPU antes que el generador demo
+        self.onnx_backend = None
+        if not F5_AVAILABLE or device == 'cpu':
+            self.onnx_backend = self._load_onnx_backend()
+
         # Inicializar F5-TTS si está disponible
-        if F5_AVAILABLE:
-            print(f"🎤 Inicializando F5-TTS con referencia: {self.reference_audio.name}")
-            self.f5tts = F5TTS(
-                model_type=model_type,
-                device=device
-            )
+        if F5_AVAILABLE and self.onnx_backend is None:
+            print(f"🎤 Inicializando F5-TTS con referencia: {self._reference_audio_name}")
+            if HYBRID_AVAILABLE:
+                # Mismo modelo en memoria para todos los modos y sesiones
+                self.f5tts = get_shared_f5tts(model_type, device)
+            else:
+                self.f5tts = F5TTS(
+                    model_type=model_type,
+                    device=device
+                )
+            if os.environ.get('F5_BF16', '1') == '1':
+                self._enable_bf16_transformer()
         else:
-            print("⚠️ Usando generador demo")
+            if self.onnx_backend is None:
+                print("⚠️ Usando generador demo")
             self.f5tts = None
 
         # Inicializar generador de hints prosódicos
@@ -111,29 +255,139 @@ class F5ProsodyAdapter:
             'seed': -1
         }
 
+        # Estadísticas
+        self.stats = {
+            'generation_times': [],
+            'hints_applied': 0,
+            'total_phrases': 0
+        }
+
+        # Log de errores críticos (se abre bajo demanda y se mantiene abierto)
+        self._error_log_path = Path(
+            os.environ.get('F5_ERROR_LOG', Path(__file__).resolve().parent / 'error_critico.log')
+        )
+        self._error_log_fh = None
+
+        # Validación estricta de muestras (array booleano completo) solo en depuración
+        self.strict_checks = os.environ.get('F5_DEBUG', '0') == '1'
+
+        # Buckets de longitud mel (frames) para que el DiT vea pocas formas distintas
+        # y torch.compile no recompile por cada frase. Desactivado por defecto porque
+        # fijar la duración altera ligeramente el ritmo de habla (F5_LENGTH_BUCKETS=1).
+        self.use_length_buckets = os.environ.get('F5_LENGTH_BUCKETS', '0') == '1'
+        self._length_buckets = [128, 256, 384, 512, 768, 1024, 1536, 2048]
+        self._mel_hop_length = 256
+        self._mel_sample_rate = 24000
+        self._chars_per_second = 15.0
+        try:
+            # F5 recorta la referencia a ~12s durante el preprocesado
+            self._reference_duration = min(sf.info(self._reference_audio_str).duration, 12.0)
+        except Exception:
+            self._reference_duration = 0.0
+
+        # Inferencia por lotes (generate_batch_with_prosody): frases por pasada del CFM
+        self.batch_size = max(1, int(os.environ.get('F5_BATCH_SIZE', '4')))
+        self._ref_cond = None  # (audio 24 kHz en el dispositivo, texto de referencia, rms)
+
+        # Referencia preprocesada (recorte + transcripción) que se pasa a infer;
+        # se calcula con la primera frase para no repetir el ASR en cada una
+        self._ref_context = None
+
+    def _bucketed_duration(self, text: str, speed: float = 1.0) -> float:
+        """
+        Estima la duración total (referencia + texto) y la redondea al bucket mel
+        más pequeño que la contenga. Devuelve segundos para `fix_duration`.
+        """
+        gen_seconds = len(text.encode('utf-8')) / self._chars_per_second / max(speed, 0.1)
+        frames = int((self._reference_duration + gen_seconds) * self._mel_sample_rate / self._mel_hop_length) + 1
+
+        bucket = next((b for b in self._length_buckets if b >= frames), None)
+        if bucket is None:
+            # Fuera de rango: redondear al siguiente múltiplo de 32 frames
+            bucket = -(-frames // 32) * 32
+
+        return bucket * self._mel_hop_length / self._mel_sample_rate
+
+    def _has_invalid_samples(self, wav: np.ndarray) -> bool:
+        """
+        True si el audio contiene NaN/Inf. La suma propaga NaN/Inf en una sola
+        reducción sin materializar un array booleano; la comprobación completa
+        queda para el modo depuración (F5_DEBUG=1).
+        """
+        if self.strict_checks:
+            return not np.isfinite(wav).all()
+        return not np.isfinite(wav.sum())
+
+    @staticmethod
+    def _trim_trailing_silence(wav: np.ndarray, threshold: float = 1e-3) -> np.ndarray:
+        """Recorta el relleno final que deja una duración fijada por bucket"""
+        voiced = np.flatnonzero(np.abs(wav) > threshold)
+        if voiced.size == 0:
+            return wav
+        return wav[:voiced[-1] + 1]
+
+    def _enable_bf16_transformer(self):
+        """
+        Ejecuta el DiT bajo autocast BF16 en CUDA (matmuls/atención en tensor cores).
+        Solo con pesos FP32: si F5 ya cargó el modelo en FP16, CFM.sample integra en
+        ese dtype y el autocast solo añadiría conversiones. Con pesos FP32 la
+        integración del ODE y el vocoder siguen en FP32. Se desactiva con F5_BF16=0.
+        """
+        try:
+            import torch
+            if not (str(self.device).startswith('cuda') and torch.cuda.is_available()
+                    and torch.cuda.is_bf16_supported()):
+                return
+
+            transformer = self.f5tts.ema_model.transformer
+            if getattr(transformer, '_autocast_dtype', None) is not None:
+                return  # Modelo compartido ya envuelto por otro adaptador/generador
+            if next(transformer.parameters()).dtype != torch.float32:
+                return  # F5 ya cargó los pesos en media precisión
+            forward = transformer.forward
+
+            def _forward_bf16(*args, **kwargs):
+                with torch.autocast(device_type='cuda', dtype=torch.bfloat16):
+                    return forward(*args, **kwargs).float()
+
+            transformer.forward = _forward_bf16
+            transformer._autocast_dtype = torch.bfloat16
+            print("⚡ DiT en BF16 (autocast CUDA)")
+        except Exception as e:
+            print(f"⚠️ No se pudo activar BF16: {e}")
+
+    def _load_onnx_backend(self):
+        """Carga el DiT exportado a ONNX (tools/export_dit_onnx.py) si es posible"""
+        try:
+            from core.onnx_backend import OnnxF5Backend
+            return OnnxF5Backend(
+                self._reference_audio_str,
+                precision=os.environ.get('F5_ONNX_PRECISION', 'fp32')
+            )
+        except Exception as e:
+            print(f"⚠️ Backend ONNX no disponible: {e}")
+            return None
+
+    def _write_error_log(self, text: str):
+        """Añade texto al log de errores críticos reutilizando un único handle"""
+        if self._error_log_fh is None:
+            self._error_log_fh = open(self._error_log_path, 'a', encoding='utf-8', buffering=1)
+            atexit.register(self._error_log_fh.close)
+        self._error_log_fh.write(text)
+
     def _handle_critical_error(self, error_msg: str, context: str = "", log_callback=None, allow_continue: bool = False):
         """
         Maneja el error crítico 't must be strictly increasing'.
         Si allow_continue=True, solo registra y devuelve sin terminar el proceso para permitir fallbacks.
         """
-        import datetime
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        critical_log = f"""
-╔═══════════════════════════════════════════════════════════════════════════════╗
-║                           🚨 ERROR CRÍTICO DETECTADO 🚨                        ║
-╠═══════════════════════════════════════════════════════════════════════════════╣
-║ Timestamp: {timestamp}                                              ║
-║ Contexto:  {context:<60} ║
-║ Error:     {error_msg[:60]:<60} ║
-║                                                                               ║
-║ 📋 INFORMACIÓN DEL ERROR:                                                     ║
-║ • Problemas de interpolación temporal en F5-TTS                               ║
-║ • Generalmente causado por parámetros extremos o texto problemático          ║
-║ • {'Se permite continuar con fallbacks' if allow_continue else 'Se recomienda terminar'}                     ║
-╚═══════════════════════════════════════════════════════════════════════════════╝
-"""
+        critical_log = _CRITICAL_LOG_TEMPLATE.format(
+            timestamp=timestamp,
+            context=context,
+            error=error_msg[:60],
+            action='Se permite continuar con fallbacks' if allow_continue else 'Se recomienda terminar'
+        )
 
         print(critical_log)
 
@@ -148,26 +402,16 @@ class F5ProsodyAdapter:
 
         # Guardar log en archivo
         try:
-            log_file = "/home/lorty/m2/ROYERBIN/Spanish-F5/generador_estructura_v3_previo/error_critico.log"
-            with open(log_file, "a", encoding="utf-8") as f:
-                f.write(critical_log + "\n\n")
-            print(f"📄 Log guardado en: {log_file}")
+            self._write_error_log(critical_log + "\n\n")
+            print(f"📄 Log guardado en: {self._error_log_path}")
             if log_callback:
-                log_callback(f"📄 Log guardado en: {log_file}")
+                log_callback(f"📄 Log guardado en: {self._error_log_path}")
         except:
             pass
 
         if not allow_continue:
-            import sys
             sys.exit(1)
 
-        # Estadísticas
-        self.stats = {
-            'generation_times': [],
-            'hints_applied': 0,
-            'total_phrases': 0
-        }
-
     def generate_single_with_prosody(self,
                                     text: str,
                                     phrase_idx: int,
@@ -189,12 +433,8 @@ class F5ProsodyAdapter:
         # Detectar y corregir texto problemático ANTES de procesar
         original_text = text
 
-        # Corregir "bibienda" -> "vivienda" si existe
-        text = text.replace("bibienda", "vivienda")
-
-        # Asegurar signos de interrogación españoles
-        if text.endswith('?') and '¿' not in text:
-            text = '¿' + text
+        # Correcciones previas (bibienda, signo de apertura de pregunta)
+        text = self._normalize_input_text(text)
 
         # Si es una pregunta larga sin comas, dividirla preventivamente
         if '?' in text and len(text) > 80 and ',' not in text:
@@ -219,43 +459,10 @@ class F5ProsodyAdapter:
                 pausa = np.zeros(int(0.2 * self.sample_rate))
                 return np.concatenate([audio1, pausa, audio2])
 
-        # Obtener hints prosódicos
-        hints = self.hint_generator.prepare_text_for_generation(
-            text,
-            phrase_idx,
-            total_phrases,
-            paragraph_id
+        text_to_generate, generation_params = self._apply_prosody_hints(
+            text, phrase_idx, total_phrases, paragraph_id, log_callback
         )
 
-        # Preparar parámetros de generación
-        generation_params = self.base_params.copy()
-
-        # Aplicar modificaciones si es posición crítica
-        if hints['apply_modifications']:
-            self.stats['hints_applied'] += 1
-            text_to_generate = hints['text']
-
-            # Aplicar ajustes de parámetros PERO con límites seguros
-            if 'extra_params' in hints:
-                if 'nfe_adjustment' in hints['extra_params']:
-                    # Limitar ajuste para evitar valores problemáticos
-                    adjustment = max(-8, min(8, hints['extra_params']['nfe_adjustment']))
-                    generation_params['nfe_step'] = max(24, min(40, generation_params['nfe_step'] + adjustment))
-
-                if 'sway_adjustment' in hints['extra_params']:
-                    adjustment = max(-0.2, min(0.2, hints['extra_params']['sway_adjustment']))
-                    generation_params['sway_sampling_coef'] = max(-0.6, min(-0.2, generation_params['sway_sampling_coef'] + adjustment))
-
-                if 'cfg_adjustment' in hints['extra_params']:
-                    adjustment = max(-0.3, min(0.3, hints['extra_params']['cfg_adjustment']))
-                    generation_params['cfg_strength'] = max(1.5, min(2.2, generation_params['cfg_strength'] + adjustment))
-
-            msg = f"🎯 Frase {phrase_idx + 1}: Aplicando hints prosódicos (Párrafo {paragraph_id + 1})"
-            if log_callback:
-                log_callback(msg)
-        else:
-            text_to_generate = text
-
         # Intentar generar con reintentos limitados
         while retry_count < MAX_RETRIES:
             try:
@@ -273,14 +480,24 @@ class F5ProsodyAdapter:
                 else:
                     params_to_use = generation_params
 
+                if self.use_length_buckets:
+                    params_to_use = dict(params_to_use)
+                    params_to_use['fix_duration'] = self._bucketed_duration(
+                        text_to_generate, params_to_use.get('speed', 1.0)
+                    )
+
+                ref_file, ref_text = self._reference_context()
                 wav, sr, _ = self.f5tts.infer(
-                    ref_file=str(self.reference_audio),
-                    ref_text="",
+                    ref_file=ref_file,
+                    ref_text=ref_text,
                     gen_text=text_to_generate,
                     **params_to_use
                 )
 
                 if wav is not None and len(wav) > 0:
+                    if self.use_length_buckets:
+                        wav = self._trim_trailing_silence(wav)
+
                     if np.max(np.abs(wav)) > 0:
                         wav = wav / np.max(np.abs(wav)) * 0.9
 
@@ -322,6 +539,187 @@ class F5ProsodyAdapter:
         # Si llegamos aquí, usar fallback
         return self._generate_fallback(text_to_generate)
 
+    def generate_batch_with_prosody(self,
+                                    texts: List[str],
+                                    phrase_indices: List[int],
+                                    total_phrases: int,
+                                    paragraph_ids: Optional[List[int]] = None,
+                                    log_callback=None) -> List[np.ndarray]:
+        """
+        Genera varias frases con hints prosódicos en pasadas por lotes del CFM.
+
+        Las frases con los mismos parámetros de muestreo (nfe, sway, cfg) se agrupan
+        y se generan juntas con infer_f5_batch de tts_generator; F5 enmascara cada
+        muestra por su duración. Cualquier frase que necesite el tratamiento especial
+        de generate_single_with_prosody (pregunta larga a dividir, sin F5, más larga
+        que el max_chars con el que F5TTS.infer trocearía, referencia sin
+        transcripción, error del lote) pasa por la ruta individual. Los hints de una
+        frase se cuentan una sola vez: al aceptar su audio del lote o en la ruta individual.
+        """
+        if paragraph_ids is None:
+            paragraph_ids = [None] * len(texts)
+
+        results: List[Optional[np.ndarray]] = [None] * len(texts)
+        single = []    # posiciones que van por la ruta individual
+        groups = {}    # (nfe_step, sway, cfg) -> [(posición, texto, params, aplica hints)]
+
+        # Sin sistema híbrido, sin F5 o sin transcripción de la referencia: todo individual
+        use_batches = HYBRID_AVAILABLE and self.f5tts is not None and not self.use_length_buckets
+        ref_cond = None
+        if use_batches:
+            try:
+                ref_cond = self._reference_conditioning()
+                use_batches = bool(ref_cond[1].strip())
+            except Exception as e:
+                if log_callback:
+                    log_callback(f"⚠️ Referencia no disponible para lotes ({e}); generando individualmente")
+                use_batches = False
+
+        for pos, (text, phrase_idx, paragraph_id) in enumerate(zip(texts, phrase_indices, paragraph_ids)):
+            # Misma normalización que la ruta individual antes de decidir la división
+            text = self._normalize_input_text(text)
+            if not use_batches or self._needs_preventive_split(text):
+                single.append(pos)
+                continue
+
+            text_to_generate, params, hinted = self._prosody_hints_for(
+                text, phrase_idx, total_phrases, paragraph_id, log_callback
+            )
+            gen_text = self._clean_text_for_engine(text_to_generate)
+
+            # F5TTS.infer trocearía esta frase: que lo haga la ruta individual
+            if len(gen_text.encode('utf-8')) > f5_batch_max_chars(self.f5tts, ref_cond, params['speed']):
+                single.append(pos)
+                continue
+
+            key = (params['nfe_step'], params['sway_sampling_coef'], params['cfg_strength'])
+            groups.setdefault(key, []).append((pos, gen_text, params, hinted))
+
+        for items in groups.values():
+            # Ordenar por longitud para minimizar el relleno dentro de cada lote
+            items.sort(key=lambda item: len(item[1]))
+            for b in range(0, len(items), self.batch_size):
+                batch = items[b:b + self.batch_size]
+                start_time = time.time()
+                params = batch[0][2]
+                try:
+                    wavs = infer_f5_batch(
+                        self.f5tts, ref_cond,
+                        [item[1] for item in batch], [item[2]['speed'] for item in batch],
+                        params['nfe_step'], params['sway_sampling_coef'], params['cfg_strength'],
+                        seed=params.get('seed', -1)
+                    )
+                except Exception as e:
+                    if log_callback:
+                        log_callback(f"⚠️ Lote de {len(batch)} frases falló ({e}); generando individualmente")
+                    single.extend(item[0] for item in batch)
+                    continue
+
+                elapsed = (time.time() - start_time) / len(batch)
+                for (pos, gen_text, _, hinted), wav in zip(batch, wavs):
+                    if wav is None or len(wav) == 0 or self._has_invalid_samples(wav):
+                        single.append(pos)
+                        continue
+                    peak = np.max(np.abs(wav))
+                    if peak > 0:
+                        wav = wav / peak * 0.9
+                    results[pos] = wav
+                    self.stats['total_phrases'] += 1
+                    self.stats['generation_times'].append(elapsed)
+                    if hinted:
+                        self.stats['hints_applied'] += 1
+
+        for pos in sorted(single):
+            results[pos] = self.generate_single_with_prosody(
+                text=texts[pos],
+                phrase_idx=phrase_indices[pos],
+                total_phrases=total_phrases,
+                paragraph_id=paragraph_ids[pos],
+                log_callback=log_callback
+            )
+
+        return results
+
+    @staticmethod
+    def _normalize_input_text(text: str) -> str:
+        """Corrige "bibienda" -> "vivienda" y asegura el signo de apertura '¿'"""
+        text = text.replace("bibienda", "vivienda")
+        if text.endswith('?') and '¿' not in text:
+            text = '¿' + text
+        return text
+
+    @staticmethod
+    def _needs_preventive_split(text: str) -> bool:
+        """Preguntas largas sin comas que generate_single_with_prosody divide en dos"""
+        return '?' in text and len(text) > 80 and ',' not in text and len(text.split()) > 8
+
+    def _reference_context(self) -> Tuple[str, str]:
+        """(archivo, texto) de referencia preprocesados una sola vez por adaptador"""
+        if self._ref_context is None:
+            self._ref_context = preprocess_reference(self._reference_audio_str, "")
+        return self._ref_context
+
+    def _reference_conditioning(self):
+        """
+        Referencia preprocesada en el dispositivo para las pasadas por lotes
+        (load_reference_conditioning de tts_generator). Una sola vez por adaptador.
+        """
+        if self._ref_cond is None:
+            ref_file, ref_text = self._reference_context()
+            self._ref_cond = load_reference_conditioning(self.f5tts, ref_file, ref_text)
+        return self._ref_cond
+
+    def _apply_prosody_hints(self, text: str, phrase_idx: int, total_phrases: int,
+                             paragraph_id: Optional[int], log_callback=None) -> Tuple[str, dict]:
+        """Devuelve el texto a generar y los parámetros F5 ajustados por los hints"""
+        text_to_generate, generation_params, hinted = self._prosody_hints_for(
+            text, phrase_idx, total_phrases, paragraph_id, log_callback
+        )
+        if hinted:
+            self.stats['hints_applied'] += 1
+        return text_to_generate, generation_params
+
+    def _prosody_hints_for(self, text: str, phrase_idx: int, total_phrases: int,
+                           paragraph_id: Optional[int], log_callback=None) -> Tuple[str, dict, bool]:
+        """Como _apply_prosody_hints, sin contar el hint: (texto, parámetros, aplica hints)"""
+        # Obtener hints prosódicos
+        hints = self.hint_generator.prepare_text_for_generation(
+            text,
+            phrase_idx,
+            total_phrases,
+            paragraph_id
+        )
+
+        # Preparar parámetros de generación
+        generation_params = self.base_params.copy()
+
+        # Aplicar modificaciones si es posición crítica
+        if hints['apply_modifications']:
+            text_to_generate = hints['text']
+
+            # Aplicar ajustes de parámetros PERO con límites seguros
+            if 'extra_params' in hints:
+                if 'nfe_adjustment' in hints['extra_params']:
+                    # Limitar ajuste para evitar valores problemáticos
+                    adjustment = max(-8, min(8, hints['extra_params']['nfe_adjustment']))
+                    generation_params['nfe_step'] = max(24, min(40, generation_params['nfe_step'] + adjustment))
+
+                if 'sway_adjustment' in hints['extra_params']:
+                    adjustment = max(-0.2, min(0.2, hints['extra_params']['sway_adjustment']))
+                    generation_params['sway_sampling_coef'] = max(-0.6, min(-0.2, generation_params['sway_sampling_coef'] + adjustment))
+
+                if 'cfg_adjustment' in hints['extra_params']:
+                    adjustment = max(-0.3, min(0.3, hints['extra_params']['cfg_adjustment']))
+                    generation_params['cfg_strength'] = max(1.5, min(2.2, generation_params['cfg_strength'] + adjustment))
+
+            msg = f"🎯 Frase {phrase_idx + 1}: Aplicando hints prosódicos (Párrafo {paragraph_id + 1})"
+            if log_callback:
+                log_callback(msg)
+        else:
+            text_to_generate = text
+
+        return text_to_generate, generation_params, hints['apply_modifications']
+
     def _make_safe_params(self, params: dict) -> dict:
         """Limita los parámetros a valores seguros para evitar error 't must be strictly increasing'"""
         safe = params.copy()
@@ -343,7 +741,6 @@ class F5ProsodyAdapter:
 
     def _clean_text_for_engine(self, text: str) -> str:
         """Limpia el texto para evitar problemas con el motor"""
-        import re
 
         # Normalizar puntos suspensivos (… o ... -> .)
         text = text.replace('\u2026', '...')
@@ -380,52 +777,20 @@ class F5ProsodyAdapter:
         return text.strip()
 
     def _get_retry_params(self, retry_count: int) -> dict:
-        """Obtiene parámetros cada vez más conservadores para reintentos"""
-        if retry_count == 1:
-            return {
-                'nfe_step': 28,
-                'sway_sampling_coef': -0.3,
-                'cfg_strength': 1.8,
-                'speed': 1.0,
-                'remove_silence': False,
-                'seed': 42  # Seed fijo para reproducibilidad
-            }
-        elif retry_count == 2:
-            return {
-                'nfe_step': 24,
-                'sway_sampling_coef': -0.2,
-                'cfg_strength': 1.5,
-                'speed': 1.0,
-                'remove_silence': False,
-                'seed': 123
-            }
-        else:  # retry_count >= 3
-            return {
-                'nfe_step': 20,  # Mínimo absoluto
-                'sway_sampling_coef': -0.1,
-                'cfg_strength': 1.2,
-                'speed': 1.0,
-                'remove_silence': False,
-                'seed': 456
-            }
+        """Obtiene parámetros cada vez más conservadores para reintentos (solo lectura)"""
+        return self._RETRY_PARAMS[min(retry_count, len(self._RETRY_PARAMS)) - 1]
 
     def _generate_safe_audio(self, text: str, phrase_idx: int, log_callback, retry_count: int) -> np.ndarray:
         """Genera audio de forma segura con parámetros conservadores"""
-        safe_params = {
-            'nfe_step': 24,
-            'sway_sampling_coef': -0.2,
-            'cfg_strength': 1.5,
-            'speed': 1.0,
-            'remove_silence': False,
-            'seed': 42
-        }
+        safe_params = self._SAFE_PARAMS
 
         try:
             text_clean = self._clean_text_for_engine(text)
 
+            ref_file, ref_text = self._reference_context()
             wav, sr, _ = self.f5tts.infer(
-                ref_file=str(self.reference_audio),
-                ref_text="",
+                ref_file=ref_file,
+                ref_text=ref_text,
                 gen_text=text_clean,
                 **safe_params
             )
@@ -445,7 +810,24 @@ class F5ProsodyAdapter:
         return self._generate_fallback(text)
 
     def _generate_fallback(self, text: str) -> np.ndarray:
-        """Genera audio de fallback para testing"""
+        """Genera audio de fallback: DiT en ONNX Runtime (CPU) o tono de prueba"""
+        if self.onnx_backend is not None:
+            try:
+                wav = self.onnx_backend.generate(
+                    text,
+                    nfe_step=self.fallback_params['nfe_step'],
+                    cfg_strength=self.fallback_params['cfg_strength'],
+                    sway_sampling_coef=self.fallback_params['sway_sampling_coef'],
+                    speed=self.fallback_params['speed'],
+                    seed=self.fallback_params['seed'],
+                    sample_rate=self.sample_rate
+                )
+                peak = np.max(np.abs(wav)) if len(wav) else 0
+                if peak > 0:
+                    return wav / peak * 0.9
+            except Exception as e:
+                print(f"⚠️ Error en backend ONNX: {e}")
+
         duration = len(text) * 0.05
         samples = int(duration * self.sample_rate)
         t = np.linspace(0, duration, samples)
@@ -455,7 +837,6 @@ class F5ProsodyAdapter:
 
     # === Salvaguardas adicionales para estabilidad del motor en modo legacy ===
     def _prepare_text_for_engine(self, text: str, aggressive: bool = False) -> str:
-        import re
         s = (text or '').strip()
         # Quitar signos invertidos al inicio; mantener ?/! finales
         s = re.sub(r'^[¡¿]+', '', s)
@@ -484,41 +865,64 @@ class F5ProsodyAdapter:
             return True
         return False
 
-    def _split_text_for_engine(self, text: str, max_words: int = 12) -> list:
-        import re
-        s = (text or '').strip()
-        if len(s.split()) <= max_words:
-            return [s]
-        commas = [m.start() for m in re.finditer(r',', s)]
-        target = len(s) // 2
+    # Conectores donde se puede partir una frase sin comas (en orden de aparición)
+    _ENGINE_CONNECTORS = ('y ', 'pero ', 'porque ', 'aunque ', 'entonces ', 'así que ', 'o ')
+
+    def _two_way_split(self, s: str) -> list:
+        """
+        Divide una frase en dos con un único recorrido lineal: registra comas,
+        inicios de palabra y el primer conector, y elige el punto de corte.
+        """
+        commas = []
+        word_starts = []
+        connector_pos = -1
+        prev_space = True
+        for i, ch in enumerate(s):
+            if ch.isspace():
+                prev_space = True
+                continue
+            if prev_space:
+                word_starts.append(i)
+                if connector_pos < 0 and i > 0 and s.startswith(self._ENGINE_CONNECTORS, i):
+                    connector_pos = i
+                prev_space = False
+            if ch == ',':
+                commas.append(i)
+
         if commas:
-            split_pos = min(commas, key=lambda x: abs(x - target))
+            target = len(s) // 2
+            split_pos = commas[int(np.argmin(np.abs(np.asarray(commas) - target)))]
             left = s[:split_pos+1].strip()
             right = s[split_pos+1:].strip()
             if not left.endswith(('.', '!', '?')):
                 left = left.rstrip(',') + '.'
-            result = [left, right]
+            return [left, right]
+
+        if connector_pos >= 0:
+            pos = connector_pos
         else:
-            connector = re.search(r'\s(y|pero|porque|aunque|entonces|así que|o)\s', s)
-            if connector:
-                pos = connector.start(0) + 1
-                left = s[:pos].strip()
-                right = s[pos:].strip()
-                if not left.endswith(('.', '!', '?')):
-                    left += '.'
-                result = [left, right]
-            else:
-                words = s.split()
-                mid = len(words) // 2
-                left = ' '.join(words[:mid]).strip()
-                right = ' '.join(words[mid:]).strip()
-                if not left.endswith(('.', '!', '?')):
-                    left += '.'
-                result = [left, right]
+            pos = word_starts[len(word_starts) // 2]
+        left = s[:pos].strip()
+        right = s[pos:].strip()
+        if not left.endswith(('.', '!', '?')):
+            left += '.'
+        return [left, right]
+
+    def _split_text_for_engine(self, text: str, max_words: int = 12) -> list:
+        s = (text or '').strip()
+        if len(s.split()) <= max_words:
+            return [s]
+
+        # Pila explícita en lugar de recursión; se apila la derecha primero
+        # para conservar el orden original de las partes
         final = []
-        for part in result:
+        stack = [s]
+        while stack:
+            part = stack.pop()
             if len(part.split()) > max_words:
-                final.extend(self._split_text_for_engine(part, max_words))
+                left, right = self._two_way_split(part)
+                stack.append(right)
+                stack.append(left)
             else:
                 final.append(part)
         return final
@@ -526,22 +930,23 @@ class F5ProsodyAdapter:
     def _engine_generate_in_parts(self, text: str, generation_params: dict, log_callback=None):
         parts = self._split_text_for_engine(text)
         audio_segments = []
+        ref_file, ref_text = self._reference_context()
         for i, p in enumerate(parts):
             try:
                 p_prepared = self._prepare_text_for_engine(p)
                 # Intentar con parámetros normales primero
                 wav, sr, _ = self.f5tts.infer(
-                    ref_file=str(self.reference_audio),
-                    ref_text="",
+                    ref_file=ref_file,
+                    ref_text=ref_text,
                     gen_text=p_prepared,
                     **generation_params
                 )
-                if wav is None or len(wav) == 0 or not np.isfinite(wav).all():
+                if wav is None or len(wav) == 0 or self._has_invalid_samples(wav):
                     # Reintento agresivo
                     p_safe = self._prepare_text_for_engine(p_prepared, aggressive=True)
                     wav, sr, _ = self.f5tts.infer(
-                        ref_file=str(self.reference_audio),
-                        ref_text="",
+                        ref_file=ref_file,
+                        ref_text=ref_text,
                         gen_text=p_safe,
                         **generation_params
                     )
@@ -594,10 +999,17 @@ class ProsodyGeneratorGUI:
         self.reference_audio = Path("segment_2955.wav")
 
         # Transformador fonético
-        self.phonetic_transformer = SpanishPhoneticTransformer()
+        self.phonetic_transformer = SpanishPhoneticTransformer(persistent_cache=PhonemeCache())
+
+        # Cola de mensajes de log (se vuelca al widget cada 100 ms desde el hilo de Tk)
+        self._log_queue = deque()
+
+        # Último refresco de la barra de progreso desde los bucles de generación
+        self._last_ui_update = 0.0
 
         self.setup_ui()
         self.check_files()
+        self.root.after(100, self._drain_log_queue)
 
     def setup_ui(self):
         """Configura la interfaz gráfica"""
@@ -739,12 +1151,27 @@ class ProsodyGeneratorGUI:
             self.audio_label.config(foreground="green")
 
     def log(self, message):
-        """Añade un mensaje al log"""
+        """Añade un mensaje al log (se muestra en el siguiente volcado)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        full_message = f"[{timestamp}] {message}\n"
-        self.log_text.insert(tk.END, full_message)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self._log_queue.append(f"[{timestamp}] {message}\n")
+
+    def _drain_log_queue(self):
+        """Vuelca los mensajes pendientes en un único insert y se reprograma"""
+        if self._log_queue:
+            lines = []
+            while self._log_queue:
+                lines.append(self._log_queue.popleft())
+            self.log_text.insert(tk.END, ''.join(lines))
+            self.log_text.see(tk.END)
+        self.root.after(100, self._drain_log_queue)
+
+    def _update_progress(self, pct, text):
+        """Actualiza la barra de progreso como máximo a ~10 Hz, desde el hilo de Tk"""
+        now = time.monotonic()
+        if now - self._last_ui_update < 0.1:
+            return
+        self._last_ui_update = now
+        self.root.after(0, lambda: (self.progress_var.set(pct), self.progress_label.config(text=text)))
 
     def start_generation(self):
         """Inicia el proceso de generación"""
@@ -795,36 +1222,64 @@ class ProsodyGeneratorGUI:
 
             self.log(f"📚 Párrafos detectados: {len(paragraphs)}")
 
-            # Aplicar transformación fonética si está habilitada
-            if self.use_phonetic.get():
+            # Aplicar transformación fonética si está habilitada: párrafo a párrafo,
+            # escribiendo ambos textos con buffer y segmentando en la misma pasada
+            use_phonetic = self.use_phonetic.get()
+            if use_phonetic:
                 self.log("\n🔤 Aplicando transformación fonética al texto...")
-                original_text = "\n\n".join([p['text'] for p in paragraphs])
-
-                # Guardar texto original
                 original_path = output_dir / "texto_original.txt"
-                with open(original_path, 'w', encoding='utf-8') as f:
-                    f.write(original_text)
-
-                # Transformar texto
-                transformed_text = self.phonetic_transformer.transform_text(original_text)
+                transformed_path = output_dir / "texto_fonetico.txt"
+                orig_f = open(original_path, 'w', encoding='utf-8', buffering=1 << 20)
+                trans_f = open(transformed_path, 'w', encoding='utf-8', buffering=1 << 20)
+                orig_preview = trans_preview = ''
+
+            # Convertir párrafos a frases (listas paralelas en lugar de un dict por frase)
+            sentence_texts = []
+            sentence_paragraph_ids = array('I')
+            sentence_paragraph_types = []
+            paragraph_boundaries = [0]
 
+            try:
+                for p_idx, paragraph in enumerate(paragraphs):
+                    if use_phonetic:
+                        original = paragraph['text']
+                        # Transformar texto (los párrafos no comparten palabras,
+                        # así que equivale a transformar el texto completo)
+                        transformed = self.phonetic_transformer.transform_text(original)
+                        if p_idx:
+                            orig_f.write('\n\n')
+                            trans_f.write('\n\n')
+                        orig_f.write(original)
+                        trans_f.write(transformed)
+                        if len(orig_preview) < 100:
+                            orig_preview += ('\n\n' if p_idx else '') + original[:100]
+                        if len(trans_preview) < 100:
+                            trans_preview += ('\n\n' if p_idx else '') + transformed[:100]
+                        paragraph['text'] = transformed
+
+                    sentences = self.split_into_sentences(paragraph['text'])
+                    self.log(f"  Párrafo {p_idx + 1}: {len(sentences)} frases")
+
+                    paragraph_type = sys.intern(paragraph.get('type', 'normal'))
+                    sentence_texts.extend(sentences)
+                    sentence_paragraph_ids.extend([p_idx] * len(sentences))
+                    sentence_paragraph_types.extend([paragraph_type] * len(sentences))
+
+                    if p_idx < len(paragraphs) - 1:
+                        paragraph_boundaries.append(len(sentence_texts))
+            finally:
+                if use_phonetic:
+                    orig_f.close()
+                    trans_f.close()
+                    self.phonetic_transformer.persistent_cache.save()
+
+            if use_phonetic:
                 # Log de ejemplo de transformación
-                orig_preview = original_text[:100].replace('\n', ' ')
-                trans_preview = transformed_text[:100].replace('\n', ' ')
+                orig_preview = orig_preview[:100].translate(_PREVIEW_TABLE)
+                trans_preview = trans_preview[:100].translate(_PREVIEW_TABLE)
                 self.log(f"📄 ANTES: {orig_preview}...")
                 self.log(f"🔊 DESPUÉS: {trans_preview}...")
 
-                # Guardar texto transformado
-                transformed_path = output_dir / "texto_fonetico.txt"
-                with open(transformed_path, 'w', encoding='utf-8') as f:
-                    f.write(transformed_text)
-
-                # Actualizar los párrafos con el texto transformado
-                transformed_paragraphs = transformed_text.split('\n\n')
-                for i, para in enumerate(paragraphs):
-                    if i < len(transformed_paragraphs):
-                        para['text'] = transformed_paragraphs[i]
-
                 # Mostrar estadísticas de transformación
                 stats = self.phonetic_transformer.get_transformation_stats()
                 self.log(f"✅ Transformación completada:")
@@ -840,28 +1295,17 @@ class ProsodyGeneratorGUI:
                 self.log(f"   - Texto original guardado en: {original_path.name}")
                 self.log(f"   - Texto fonético guardado en: {transformed_path.name}")
 
-            # Convertir párrafos a lista de frases
-            all_sentences = []
-            paragraph_boundaries = [0]
-
-            for p_idx, paragraph in enumerate(paragraphs):
-                sentences = self.split_into_sentences(paragraph['text'])
-                self.log(f"  Párrafo {p_idx + 1}: {len(sentences)} frases")
+            self.log(f"📝 Total de frases: {len(sentence_texts)}")
 
-                for sentence in sentences:
-                    all_sentences.append({
-                        'text': sentence,
-                        'paragraph_id': p_idx,
-                        'paragraph_type': paragraph.get('type', 'normal')
-                    })
+            # Inicio de cada párrafo en la lista de frases (para bisect en Fase 1)
+            self._para_boundaries = paragraph_boundaries
 
-                if p_idx < len(paragraphs) - 1:
-                    paragraph_boundaries.append(len(all_sentences))
-
-            self.log(f"📝 Total de frases: {len(all_sentences)}")
+            # Escritor de WAV en segundo plano (solapa la E/S con la inferencia)
+            self._start_wav_writer()
 
             # Procesar siempre en modo completo (Fases 1 y 2)
-            self.process_full_mode(all_sentences, output_dir, start_idx=start_idx_resume)
+            self.process_full_mode(sentence_texts, sentence_paragraph_ids, sentence_paragraph_types,
+                                   output_dir, start_idx=start_idx_resume)
 
             self.log(f"\n✅ Generación completada exitosamente")
             self.log(f"📁 Resultados guardados en: {output_dir}")
@@ -880,31 +1324,51 @@ class ProsodyGeneratorGUI:
                 messagebox.showerror("Error", error_msg)
 
         finally:
+            self._stop_wav_writer()
             self.is_processing = False
             self.generate_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
             self.progress_label.config(text="Generación completada")
 
+    def _start_wav_writer(self):
+        """Arranca el hilo que escribe los WAV encolados con (ruta, audio, sr)"""
+        self._write_q = queue.Queue(maxsize=8)
+
+        def _writer():
+            while True:
+                item = self._write_q.get()
+                try:
+                    if item is None:
+                        break
+                    path, audio, sr = item
+                    sf.write(path, np.ascontiguousarray(audio), sr)
+                except Exception as e:
+                    self.log(f"⚠️ Error escribiendo {item[0]}: {e}")
+                finally:
+                    self._write_q.task_done()
+
+        self._write_thread = threading.Thread(target=_writer, daemon=True)
+        self._write_thread.start()
+
+    def _stop_wav_writer(self):
+        """Vacía la cola de escritura y termina el hilo escritor"""
+        if getattr(self, '_write_thread', None) is None:
+            return
+        self._write_q.put(None)
+        self._write_thread.join()
+        self._write_thread = None
+
     def _split_long_sentence(self, sentence: str) -> List[str]:
         """
         Divide frases largas (>120 chars) por comas seguidas de conectores naturales
         para evitar errores de interpolación en F5-TTS
         """
-        import re
-
         if len(sentence) <= 120:
             return [sentence]
 
-        # Conectores y palabras que indican buen lugar para dividir
-        connectors = [
-            r',\s+(y|pero|sin embargo|además|también|cuando|donde|que|como si|mientras)',
-            r',\s+(después|antes|luego|entonces|así que|por eso)',
-            r',\s+(aunque|a pesar de|excepto|salvo)',
-        ]
-
         # Intentar dividir por conectores
-        for connector_pattern in connectors:
-            matches = list(re.finditer(connector_pattern, sentence, re.IGNORECASE))
+        for connector_pattern in _RE_LONG_CONNECTORS:
+            matches = list(connector_pattern.finditer(sentence))
 
             # Buscar el mejor punto de división (cerca del centro)
             target_position = len(sentence) // 2
@@ -934,7 +1398,11 @@ class ProsodyGeneratorGUI:
                     return result
 
         # Si no se encontraron conectores, dividir por comas simples cerca del centro
-        comma_positions = [m.start() for m in re.finditer(r',', sentence)]
+        comma_positions = []
+        pos = sentence.find(',')
+        while pos != -1:
+            comma_positions.append(pos)
+            pos = sentence.find(',', pos + 1)
         if comma_positions:
             target_pos = len(sentence) // 2
             best_comma = min(comma_positions, key=lambda x: abs(x - target_pos))
@@ -952,12 +1420,17 @@ class ProsodyGeneratorGUI:
                         result.append(part)
                 return result
 
-        # Último recurso: dividir por espacios cerca del centro
-        words = sentence.split()
-        if len(words) > 6:  # Solo si hay suficientes palabras
-            mid_point = len(words) // 2
-            part1 = ' '.join(words[:mid_point])
-            part2 = ' '.join(words[mid_point:])
+        # Último recurso: dividir por el espacio más cercano al centro
+        if sentence.count(' ') >= 6:  # Solo si hay suficientes palabras
+            mid_point = len(sentence) // 2
+            right = sentence.find(' ', mid_point)
+            left = sentence.rfind(' ', 0, mid_point)
+            if right == -1 or (left != -1 and mid_point - left <= right - mid_point):
+                split_pos = left
+            else:
+                split_pos = right
+            part1 = sentence[:split_pos].strip()
+            part2 = sentence[split_pos:].strip()
             return [part1, part2]
 
         # Si nada funciona, devolver la frase original
@@ -967,22 +1440,35 @@ class ProsodyGeneratorGUI:
         """
         Lee y parsea el archivo de texto, identificando párrafos
         """
-        with open(self.text_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-
-        # Dividir por párrafos (doble salto de línea)
-        raw_paragraphs = content.split('\n\n')
+        # Leer por bloques y dividir por párrafos (doble salto de línea) sobre la
+        # marcha, sin cargar el archivo completo en memoria
+        stripped = []  # (índice bruto, texto) de los párrafos no vacíos
+        total_raw = 0
+        carry = ''
+        with open(self.text_file, 'r', encoding='utf-8', buffering=1 << 20) as f:
+            for chunk in iter(lambda: f.read(1 << 20), ''):
+                pieces = (carry + chunk).split('\n\n')
+                carry = pieces.pop()
+                for para in pieces:
+                    para = para.strip()
+                    if para:
+                        stripped.append((total_raw, para))
+                    total_raw += 1
+        carry = carry.strip()
+        if carry:
+            stripped.append((total_raw, carry))
+        total_raw += 1
+
+        # Umbrales enteros de tercio (idx < x  <=>  idx < ceil(x) para idx entero)
+        t1 = math.ceil(total_raw * 0.33)
+        t2 = math.ceil(total_raw * 0.66)
 
         paragraphs = []
-        for idx, para in enumerate(raw_paragraphs):
-            para = para.strip()
-            if not para:
-                continue
-
+        for idx, para in stripped:
             # Determinar tipo de párrafo según posición (arquitectura 3 párrafos)
-            if idx == 0 or (idx < len(raw_paragraphs) * 0.33):
+            if idx < t1:
                 para_type = "introduction"  # Párrafo 1: establecer
-            elif idx < len(raw_paragraphs) * 0.66:
+            elif idx < t2:
                 para_type = "development"   # Párrafo 2: tensión
             else:
                 para_type = "conclusion"    # Párrafo 3: resolución
@@ -1000,92 +1486,104 @@ class ProsodyGeneratorGUI:
         Divide un párrafo en frases considerando signos de apertura españoles
         Separa correctamente "¡-!" y "¿-?" como frases independientes
         """
-        import re
-
         # Proteger abreviaciones comunes
-        text = re.sub(r'\b(Sr|Sra|Dr|Dra|St|Sto|Sta)\.\s*', r'\1<DOT> ', text)
-
-        # NUEVO: Pre-procesamiento para signos de apertura españoles
-        # Insertar marcadores antes de signos de apertura cuando no están al inicio
-        text = re.sub(r'([.!?])\s*([¡¿])', r'\1<FRASE_BREAK>\2', text)
-
-        # También manejar casos donde hay espacios múltiples
-        text = re.sub(r'([.!?])\s{2,}([¡¿])', r'\1<FRASE_BREAK>\2', text)
-
-        # NUEVO: Aislar explícitamente bloques exclamativos e interrogativos como frases
-        # Inserta ruptura ANTES y DESPUÉS de cualquier "¡...!" y "¿...?"
-        text = re.sub(r'¡([^!]+)!', r'<FRASE_BREAK>¡\1!<FRASE_BREAK>', text)
-        text = re.sub(r'¿([^?]+)\?', r'<FRASE_BREAK>¿\1?<FRASE_BREAK>', text)
-
-        # NUEVO: Aislar bloques entre comillas dobles como frases independientes
-        text = re.sub(r'"([^"\n]+)"', r'<FRASE_BREAK>"\1"<FRASE_BREAK>', text)
-
-        # NUEVO: Insertar ruptura antes de cualquier '¡' o '¿' que no esté al inicio
-        text = re.sub(r'(?<!^)¡', r'<FRASE_BREAK>¡', text)
-        text = re.sub(r'(?<!^)¿', r'<FRASE_BREAK>¿', text)
-
-        # NUEVO: Insertar ruptura tras '!' y '?'
-        text = re.sub(r'!\s*', r'!<FRASE_BREAK>', text)
-        text = re.sub(r'\?\s*', r'?<FRASE_BREAK>', text)
-
-        # Normalizar posibles duplicados de marcadores
-        text = re.sub(r'(?:<FRASE_BREAK>){2,}', '<FRASE_BREAK>', text)
-
-        # NUEVO: Manejar puntos suspensivos como separadores de frase
-        # Dividir después de cualquier "..." (independientemente de lo que siga)
-        text = re.sub(r'\.\.\.\s*', '...<FRASE_BREAK>', text)
+        text = _RE_PROTECT_ABBR.sub(r'\1<DOT> ', text)
+
+        tokens = list(_RE_SPLITTER.finditer(text))
+
+        # Emparejar comillas como hacía '"([^"\n]+)"': de izquierda a derecha,
+        # sin saltos de línea dentro y con al menos un carácter
+        quote_starts = [m.start() for m in tokens if m.lastgroup == 'quote']
+        paired_quotes = {}
+        q = 0
+        while q + 1 < len(quote_starts):
+            open_pos, close_pos = quote_starts[q], quote_starts[q + 1]
+            if close_pos > open_pos + 1 and not self._has_hard_newline(text, open_pos, close_pos):
+                paired_quotes[open_pos] = 'open'
+                paired_quotes[close_pos] = 'close'
+                q += 2
+            else:
+                q += 1
+
+        # Cierres que terminan un bloque "¡...!" / "¿...?" (no se comen el espacio
+        # siguiente, así que un guion con espacios tras ellos sigue siendo ruptura)
+        block_ends = set()
+        pending_open = {'!': None, '?': None}
+        for m in tokens:
+            if m.lastgroup == 'opener':
+                closer = '!' if m.group() == '¡' else '?'
+                if pending_open[closer] is None:
+                    pending_open[closer] = m.start()
+            elif m.lastgroup == 'closer':
+                closer = m.group()
+                if pending_open[closer] is not None and m.start() > pending_open[closer] + 1:
+                    block_ends.add(m.start())
+                pending_open[closer] = None
+
+        # Con cualquier marcador fuerte se divide por ellos; si no, por punto + espacio
+        # (un signo de apertura al inicio del párrafo no cuenta como marcador)
+        has_markers = bool(paired_quotes) or any(
+            m.lastgroup not in ('dot', 'quote') and not (m.lastgroup == 'opener' and m.start() == 0)
+            for m in tokens
+        )
 
-        # NUEVO: Dividir por punto y coma como separador de frase
-        text = re.sub(r';\s*', '<FRASE_BREAK>', text)
+        # Recorrer los tokens una vez, cortando el texto por rodajas
+        parts_raw = []
+        current = []
+        prev = 0
+        consumed = 0  # fin del último texto consumido por un token (espacios incluidos)
+        for m in tokens:
+            kind = m.lastgroup
+            start, end = m.span()
+
+            if not has_markers:
+                if kind == 'dot':
+                    current.append(text[prev:end])
+                    parts_raw.append(''.join(current))
+                    current = []
+                    prev = end
+                continue
 
-        # NUEVO: Dividir por dos puntos como separador de frase (no si va seguido de ")
-        text = re.sub(r':\s*(?!\")', ':<FRASE_BREAK>', text)
+            if kind in ('dot', 'quote') and start not in paired_quotes:
+                continue
 
-        # NUEVO: Separar por guion/raya en medio de la oración (con espacios alrededor)
-        # Cubre '-', '–' (en dash), '—' (em dash) con espacios a ambos lados
-        text = re.sub(r'\s[–—-]\s', '<FRASE_BREAK>', text)
+            if kind == 'dash':
+                # " - " solo rompe si su espacio previo no lo consumió otro token
+                # (o un cierre "!"/"?" suelto, que se come los espacios siguientes)
+                if start - 1 < consumed:
+                    continue
+                ws_start = start - 1
+                while ws_start > 0 and text[ws_start - 1].isspace():
+                    ws_start -= 1
+                if ws_start > 0 and text[ws_start - 1] in '!?' and (ws_start - 1) not in block_ends:
+                    continue
+                current.append(text[prev:start - 1])
+                prev = consumed = end + 1
+            elif kind in ('opener', 'semicolon') or paired_quotes.get(start) == 'open':
+                current.append(text[prev:start])
+                prev = start if kind in ('opener', 'quote') else end
+                consumed = end
+            elif kind == 'quote':
+                current.append(text[prev:end])
+                prev = consumed = end
+            else:
+                # closer, ellipsis, colon: el signo se queda en la frase actual
+                current.append(text[prev:start])
+                current.append(m.group(kind).rstrip())
+                prev = consumed = end
 
-        # Normalizar posibles duplicados de marcadores tras todas las inserciones
-        text = re.sub(r'(?:<FRASE_BREAK>){2,}', '<FRASE_BREAK>', text)
+            parts_raw.append(''.join(current))
+            current = []
 
-        # Dividir por marcadores de ruptura de frase
-        if '<FRASE_BREAK>' in text:
-            parts_raw = text.split('<FRASE_BREAK>')
-        else:
-            # Fallback al método original si no hay marcadores
-            # Incluir puntos suspensivos, punto y coma y dos puntos como finales de frase
-            sentence_endings = re.compile(r'([.!?;:]|\.\.\.)\s+')
-            parts_raw = sentence_endings.split(text)
+        current.append(text[prev:])
+        parts_raw.append(''.join(current))
 
         sentences = []
-
-        if '<FRASE_BREAK>' in text:
-            # Procesamiento con marcadores
-            for part in parts_raw:
-                part_clean = part.replace('<DOT>', '.').strip()
-                if part_clean:
-                    # Procesar cada parte para separar exclamaciones/interrogaciones múltiples
-                    sub_sentences = self._separate_exclamations_questions(part_clean)
-                    sentences.extend(sub_sentences)
-        else:
-            # Procesamiento original
-            current = ""
-            for i, part in enumerate(parts_raw):
-                if part in '.!?;:' or part == '...':
-                    current += part
-                    current = current.replace('<DOT>', '.')
-                    if current.strip():
-                        # Procesar para separar exclamaciones/interrogaciones
-                        sub_sentences = self._separate_exclamations_questions(current.strip())
-                        sentences.extend(sub_sentences)
-                    current = ""
-                else:
-                    current += part
-
-            if current.strip():
-                current = current.replace('<DOT>', '.')
-                sub_sentences = self._separate_exclamations_questions(current.strip())
-                sentences.extend(sub_sentences)
+        for part in parts_raw:
+            part_clean = part.replace('<DOT>', '.').strip()
+            if part_clean:
+                # Procesar cada parte para separar exclamaciones/interrogaciones múltiples
+                sentences.extend(self._separate_exclamations_questions(part_clean))
 
         # Filtrar frases vacías o que sean sólo puntuación/comillas
         cleaned_sentences = []
@@ -1094,8 +1592,7 @@ class ProsodyGeneratorGUI:
             if not s_clean:
                 continue
             # Rechazar si no contiene letras o dígitos (evita ":" "." etc.)
-            import re as _re
-            if not _re.search(r'[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9]', s_clean):
+            if not _RE_HAS_WORD_CHAR.search(s_clean):
                 continue
             cleaned_sentences.append(s_clean)
         sentences = cleaned_sentences
@@ -1118,28 +1615,100 @@ class ProsodyGeneratorGUI:
 
         return final_sentences
 
-    def _separate_exclamations_questions(self, text: str) -> List[str]:
+    @staticmethod
+    def _has_hard_newline(text: str, start: int, end: int) -> bool:
         """
-        Separa exclamaciones e interrogaciones que están juntas recursivamente
-        Ejemplo: "¡Hola! ¿Cómo estás?" → ["¡Hola!", "¿Cómo estás?"]
+        True si hay un salto de línea en text[start:end] que sobreviva a la
+        segmentación (los espacios entre un cierre y un "¡"/"¿" se eliminan)
         """
-        import re
-
-        # Aplicar separación recursiva hasta que no haya más cambios
-        current_sentences = [text]
-        changes = True
+        pos = text.find('\n', start, end)
+        while pos != -1:
+            ws_start = pos
+            while ws_start > 0 and text[ws_start - 1].isspace():
+                ws_start -= 1
+            ws_end = pos
+            while ws_end < len(text) and text[ws_end].isspace():
+                ws_end += 1
+            if not (ws_start > 0 and text[ws_start - 1] in '.!?'
+                    and ws_end < len(text) and text[ws_end] in '¡¿'):
+                return True
+            pos = text.find('\n', ws_end, end)
+        return False
 
-        while changes:
-            changes = False
-            new_sentences = []
+    def _separate_exclamations_questions(self, text: str) -> List[str]:
+        """
+        Separa exclamaciones e interrogaciones que están juntas
+        Ejemplo: "¡Hola! ¿Cómo estás?" → ["¡Hola!", "¿Cómo estás?"]
 
-            for sentence in current_sentences:
-                divided_sentences = self._divide_simple_sentence(sentence)
-                if len(divided_sentences) > 1:
-                    changes = True
-                new_sentences.extend(divided_sentences)
+        Un único finditer localiza todos los puntos de división; después cada
+        tramo se divide en su primer punto según la prioridad:
+          1. "!"/"?" seguido de apertura "¡"/"¿"
+          2. ".", "!" o "?" seguido de apertura (no al inicio del tramo)
+          3. "!"/"?" + espacio + mayúscula
+          4. "." + espacio + mayúscula (solo si la primera parte supera 3 caracteres)
+        """
+        # Puntos de división: posición del cierre y del inicio de la nueva frase
+        opener_closers, opener_targets = [], []       # prioridad 2
+        excl_opener_closers, excl_opener_targets = [], []  # prioridad 1
+        excl_cap_closers, excl_cap_targets = [], []   # prioridad 3
+        dot_cap_closers, dot_cap_targets = [], []     # prioridad 4
+        for m in _RE_SPLIT_POINTS.finditer(text):
+            closer_pos, target = m.start(), m.end() - 1
+            is_excl = text[closer_pos] != '.'
+            if text[target] in '¡¿':
+                opener_closers.append(closer_pos)
+                opener_targets.append(target)
+                if is_excl:
+                    excl_opener_closers.append(closer_pos)
+                    excl_opener_targets.append(target)
+            elif is_excl:
+                excl_cap_closers.append(closer_pos)
+                excl_cap_targets.append(target)
+            else:
+                dot_cap_closers.append(closer_pos)
+                dot_cap_targets.append(target)
+
+        def _first_in(closers, targets, start, end):
+            i = bisect_left(closers, start)
+            if i < len(closers) and targets[i] < end:
+                return closers[i], targets[i]
+            return None
+
+        def _trim(start, end):
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            return start, end
+
+        # Dividir tramos con una pila (se apila la derecha primero para conservar el orden)
+        current_sentences = []
+        stack = [_trim(0, len(text))]
+        while stack:
+            start, end = stack.pop()
+
+            split_at = None
+            hit = _first_in(excl_opener_closers, excl_opener_targets, start, end)
+            if hit:
+                split_at = hit[1]
+            else:
+                hit = _first_in(opener_closers, opener_targets, start, end)
+                if hit and hit[0] > start:
+                    split_at = hit[1]
+                else:
+                    hit = _first_in(excl_cap_closers, excl_cap_targets, start, end)
+                    if hit:
+                        split_at = hit[1]
+                    else:
+                        hit = _first_in(dot_cap_closers, dot_cap_targets, start, end)
+                        if hit and hit[0] + 1 - start > 3:  # Evitar divisiones muy cortas
+                            split_at = hit[1]
 
-            current_sentences = new_sentences
+            if split_at is None:
+                current_sentences.append(text[start:end])
+            else:
+                stack.append(_trim(split_at, end))
+                stack.append(_trim(start, split_at))
 
         # Limpiar y finalizar frases
         final_sentences = []
@@ -1147,9 +1716,8 @@ class ProsodyGeneratorGUI:
             clean_sentence = sentence.strip()
             if clean_sentence:
                 # Eliminar combinaciones de puntuación redundante al final (:. ;. -- etc.)
-                import re as _re2
-                clean_sentence = _re2.sub(r'([:;\-–—,"])\.+$', '.', clean_sentence)
-                clean_sentence = _re2.sub(r'[:;\-–—,"]+$', '', clean_sentence).strip()
+                clean_sentence = _RE_TRAILING_PUNCT_DOT.sub('.', clean_sentence)
+                clean_sentence = _RE_TRAILING_PUNCT.sub('', clean_sentence).strip()
             if clean_sentence:
                 # Asegurar puntuación final
                 if not clean_sentence[-1] in '.!?':
@@ -1164,57 +1732,6 @@ class ProsodyGeneratorGUI:
 
         return final_sentences
 
-    def _divide_simple_sentence(self, text: str) -> List[str]:
-        """
-        Divide una frase simple en el primer punto de separación encontrado
-        """
-        import re
-
-        # Buscar patrones de separación en orden de prioridad
-
-        # 1. Separación por exclamación/interrogación seguida de apertura
-        pattern1 = r'([!?])\s*([¡¿])'
-        match1 = re.search(pattern1, text)
-        if match1:
-            pos = match1.start(2)  # Posición del signo de apertura
-            part1 = text[:pos].strip()
-            part2 = text[pos:].strip()
-            if part1 and part2:
-                return [part1, part2]
-
-        # 2. Separación por final de oración seguida de apertura (sin espacio requerido)
-        pattern2 = r'([.!?])\s*([¡¿])'
-        match2 = re.search(pattern2, text)
-        if match2 and match2.start() > 0:  # No dividir si está al inicio
-            pos = match2.start(2)
-            part1 = text[:pos].strip()
-            part2 = text[pos:].strip()
-            if part1 and part2:
-                return [part1, part2]
-
-        # 3. Separación por exclamación/interrogación seguida de oración normal
-        pattern3 = r'([!?])\s+([A-ZÁÉÍÓÚÑ])'
-        match3 = re.search(pattern3, text)
-        if match3:
-            pos = match3.start(2)
-            part1 = text[:pos].strip()
-            part2 = text[pos:].strip()
-            if part1 and part2:
-                return [part1, part2]
-
-        # 4. Separación por punto seguido de mayúscula (frases declarativas)
-        pattern4 = r'(\.\s+)([A-ZÁÉÍÓÚÑ])'
-        match4 = re.search(pattern4, text)
-        if match4:
-            pos = match4.start(2)
-            part1 = text[:pos].strip()
-            part2 = text[pos:].strip()
-            if part1 and part2 and len(part1) > 3:  # Evitar divisiones muy cortas
-                return [part1, part2]
-
-        # Si no se puede dividir, devolver como está
-        return [text]
-
     def _merge_short_sentences(self, sentences: List[str], min_words: int = 3) -> List[str]:
         """
         Fusiona frases con menos de min_words palabras con la siguiente frase.
@@ -1225,53 +1742,44 @@ class ProsodyGeneratorGUI:
           no unir hacia delante; unir a la anterior si existe.
         - El resto de cortas se unen a la siguiente.
         """
-        import re as _re
+        # Normalizar una sola vez: textos sin espacios, nº de palabras (acotado a
+        # min_words, basta para comparar) y si cada frase es pregunta
+        stripped = [s.strip() for s in sentences]
+        word_counts = [len(s.split(None, min_words)) for s in stripped]
+        is_question = [s.startswith('¿') or s.endswith('?') for s in stripped]
+        n = len(stripped)
 
         merged = []
         i = 0
-        while i < len(sentences):
-            current = sentences[i].strip()
-            current_words = len(current.split())
-
-            # Helper para unir a anterior con coma y respetar puntuación
-            def _append_to_previous_with_comma(prev: str, addon: str) -> str:
-                prev_core = _re.sub(r'[.!?]+$', '', prev).strip()
-                return f"{prev_core}, {addon}".strip()
-
-            if current_words < min_words:
-                interjections = {"oye", "eh", "ey", "hey"}
-                is_interj = current.lower().strip('¡!').strip().strip(',') in interjections
+        while i < n:
+            current = stripped[i]
 
-                next_sentence = sentences[i + 1].strip() if i + 1 < len(sentences) else ""
-                next_is_question = next_sentence.startswith('¿') or next_sentence.endswith('?')
+            if word_counts[i] < min_words:
+                interj = current.strip('¡!').strip().strip(',')
+                is_interj = interj.lower() in _INTERJECTIONS
+                has_next = i + 1 < n
 
-                if is_interj and len(merged) > 0:
+                if is_interj and merged:
                     # Formatear interjección con exclamación
-                    interj = current.strip('¡!').strip().strip(',')
-                    interj_formatted = f"¡{interj}!"
-                    combined = _append_to_previous_with_comma(merged[-1], interj_formatted)
-                    merged[-1] = combined
+                    merged[-1] = _append_to_previous_with_comma(merged[-1], f"¡{interj}!")
                     i += 1
                     continue
 
-                if next_is_question and len(merged) > 0:
+                if has_next and is_question[i + 1] and merged:
                     # Evitar unir a la pregunta; unir a la anterior
-                    combined = _append_to_previous_with_comma(merged[-1], current)
-                    merged[-1] = combined
+                    merged[-1] = _append_to_previous_with_comma(merged[-1], current)
                     i += 1
                     continue
 
-                if i + 1 < len(sentences):
+                if has_next:
                     # Unir hacia delante (por defecto)
-                    combined = f"{current} {next_sentence}".strip()
-                    merged.append(combined)
+                    merged.append(f"{current} {stripped[i + 1]}".strip())
                     i += 2
                     continue
 
                 # Si no hay siguiente, unir a anterior si existe
-                if len(merged) > 0:
-                    combined = _append_to_previous_with_comma(merged[-1], current)
-                    merged[-1] = combined
+                if merged:
+                    merged[-1] = _append_to_previous_with_comma(merged[-1], current)
                 else:
                     merged.append(current)
                 i += 1
@@ -1304,20 +1812,30 @@ class ProsodyGeneratorGUI:
         else:
             return 2
 
-    def process_full_mode(self, sentences: List[Dict], output_dir: Path, start_idx: int = 0):
-        """Procesa en modo completo (Fases 1 y 2): Fase 1 COMPLETA + Post-procesamiento"""
+    def process_full_mode(self, sentence_texts: List[str], sentence_paragraph_ids, sentence_paragraph_types: List[str],
+                          output_dir: Path, start_idx: int = 0, intermediate_snapshot_dir: Optional[Path] = None):
+        """
+        Procesa en modo completo (Fases 1 y 2): Fase 1 COMPLETA + Post-procesamiento
+
+        Args:
+            sentence_texts: Texto de cada frase
+            sentence_paragraph_ids: array('I') con el párrafo de cada frase
+            sentence_paragraph_types: Tipo de párrafo de cada frase (cadenas internadas)
+            intermediate_snapshot_dir: Si se indica, guarda ahí la versión solo Fase 1
+                                       (modo dual) antes de empezar la Fase 2
+        """
         self.log("\n🔍 MODO COMPLETO - Fase 1 (Sistema Híbrido) + Fase 2 (Post-procesamiento)")
         self.log("="*80)
 
         if not HYBRID_AVAILABLE:
             self.log("❌ Sistema híbrido no disponible, usando modo legacy")
-            return self.process_full_mode_legacy(sentences, output_dir)
+            return self.process_full_mode_legacy(sentence_texts, sentence_paragraph_ids, output_dir)
 
         # FASE 1: Usar exactamente la misma lógica que el modo rápido
         self.log("\n📝 FASE 1: Generación con hints prosódicos (Sistema Híbrido)")
 
         # Preparar texto completo para el generador híbrido
-        full_text = " ".join([s['text'] for s in sentences])
+        full_text = " ".join(sentence_texts)
 
         # Crear instancia del generador híbrido (igual que modo rápido)
         self.log("🎵 Inicializando generador híbrido...")
@@ -1344,75 +1862,129 @@ class ProsodyGeneratorGUI:
         generator.enable_prosody_hints = True
         generator.enable_postprocessing = False  # Fase 2 se maneja por separado
 
-        # USAR nuestra segmentación ya calculada en 'sentences'
-        custom_frases = [s['text'] for s in sentences]
-        if custom_frases:
-            generator.frases = custom_frases
-            self.log(f"🧩 Usando segmentación personalizada: {len(custom_frases)} frases")
+        # USAR nuestra segmentación ya calculada en 'sentence_texts'
+        if sentence_texts:
+            generator.frases = sentence_texts
+            self.log(f"🧩 Usando segmentación personalizada: {len(sentence_texts)} frases")
 
         # Crear directorio para frases individuales
         frases_dir = output_dir / "frases"
         frases_dir.mkdir(exist_ok=True)
+        # Plantilla de ruta como str: evita crear un Path por frase en los bucles
+        frases_str = str(frases_dir) + os.sep + "frase_%03d.wav"
 
         audio_segments = []
         total = len(generator.frases)
 
+        # Ruta de cada frase, formateada una sola vez para Fase 1, Fase 2 y reanudación
+        frase_paths = [frases_str % (i + 1) for i in range(total)]
+
         self.log(f"📝 Ejecutando Fase 1 completa: {total} frases con mejoras prosódicas...")
 
         # Reanudación: precargar segmentos existentes
         if start_idx > 0:
             self.log(f"🔄 Reanudación: saltando {start_idx} frases ya generadas")
-            for i in range(start_idx):
-                pre_path = frases_dir / f"frase_{i + 1:03d}.wav"
-                if pre_path.exists():
-                    try:
-                        seg, sr = sf.read(pre_path)
-                        audio_segments.append(seg)
-                    except Exception:
-                        audio_segments.append(np.zeros(int(0.1 * generator.sample_rate)))
+            silence = np.zeros(int(0.1 * generator.sample_rate))
+
+            # Un solo listado del directorio en lugar de un stat por frase
+            with os.scandir(frases_dir) as it:
+                existing = {e.name for e in it if e.name.endswith('.wav') and e.is_file()}
+
+            def _safe_read(path):
+                # Las frases que faltan se sustituyen por silencio para no
+                # desalinear los segmentos con sus textos en la Fase 2
+                if os.path.basename(path) not in existing:
+                    return silence
+                try:
+                    return sf.read(path)[0]
+                except Exception:
+                    return silence
+
+            # Lectura en paralelo: libsndfile libera el GIL mientras decodifica
+            with ThreadPoolExecutor(max_workers=8) as ex:
+                audio_segments.extend(ex.map(_safe_read, frase_paths[:start_idx]))
             self.progress_var.set((start_idx / total) * 60)
             self.progress_label.config(text=f"Fase 1: Reanudación {start_idx}/{total}")
 
-        # Ejecutar EXACTAMENTE la misma Fase 1 que el modo rápido
-        for idx, frase in enumerate(generator.frases):
-            if idx < start_idx:
-                continue
-            if not self.is_processing:
-                self.log("⏹️ Generación detenida por el usuario")
-                break
-
-            # Actualizar progreso (0-60% para Fase 1 completa)
-            progress = (idx / total) * 60
-            self.progress_var.set(progress)
-            self.progress_label.config(text=f"Fase 1: Procesando frase {idx + 1} de {total}")
-
-            # Usar generación híbrida con prosodia (IGUAL que modo rápido)
-            audio = generator.generate_single_phrase_with_prosody(
-                text=frase,
-                phrase_idx=idx,
-                total_phrases=total,
-                paragraph_id=self._estimate_paragraph_id(idx, total),
-                log_callback=self.log
-            )
+        # Análisis prosódico de la Fase 2 en segundo plano, segmento a segmento,
+        # solapado con la inferencia de la Fase 1
+        analyzer = ProsodyAnalyzer()
+        analysis_futures = []
+
+        # Párrafo de cada frase: límites reales si el texto tiene varios párrafos,
+        # si no, tercios (arquitectura de 3 párrafos)
+        boundaries = getattr(self, '_para_boundaries', [0])
+        use_boundaries = len(boundaries) > 1
+        third = total // 3
+        two_third = 2 * third
+
+        # Resultado de Fase 1 escrito a disco según se genera (mismo crossfade
+        # que apply_crossfade_and_concatenate, sin concatenar todo al final);
+        # el WAV se cierra (cola y cabecera) y el pool de análisis se libera
+        # aunque la generación falle a mitad
+        fase1_path = output_dir / "audio_fase1_completa.wav"
+        with ThreadPoolExecutor(max_workers=2) as analyzer_pool, \
+                generator.open_crossfade_stream(fase1_path, total) as fase1_stream:
+            for i, segment in enumerate(audio_segments):
+                fase1_stream.write(segment)
+                analysis_futures.append(
+                    analyzer_pool.submit(analyzer.analyze_segment, i, segment, generator.frases[i])
+                )
 
-            audio_segments.append(audio)
+            # Ejecutar EXACTAMENTE la misma Fase 1 que el modo rápido
+            for idx, frase in enumerate(generator.frases):
+                if idx < start_idx:
+                    continue
+                if not self.is_processing:
+                    self.log("⏹️ Generación detenida por el usuario")
+                    break
 
-            # Guardar frase individual
-            frase_path = frases_dir / f"frase_{idx + 1:03d}.wav"
-            sf.write(frase_path, audio, generator.sample_rate)
+                # Actualizar progreso (0-60% para Fase 1 completa)
+                self._update_progress((idx / total) * 60, f"Fase 1: Procesando frase {idx + 1} de {total}")
 
-        # Guardar resultado de Fase 1 (para comparación)
-        if audio_segments:
-            self.log(f"\n🔗 Guardando resultado de Fase 1...")
+                if use_boundaries:
+                    paragraph_id = bisect_right(boundaries, idx) - 1
+                else:
+                    paragraph_id = 0 if idx < third else 1 if idx < two_third else 2
+
+                # Usar generación híbrida con prosodia (IGUAL que modo rápido)
+                audio = generator.generate_single_phrase_with_prosody(
+                    text=frase,
+                    phrase_idx=idx,
+                    total_phrases=total,
+                    paragraph_id=paragraph_id,
+                    log_callback=self.log
+                )
+
+                audio_segments.append(audio)
+                fase1_stream.write(audio)
+                analysis_futures.append(
+                    analyzer_pool.submit(analyzer.analyze_segment, idx, audio, frase)
+                )
 
-            # Usar la concatenación del generador original
-            fase1_audio = generator.apply_crossfade_and_concatenate(audio_segments)
-            fase1_path = output_dir / "audio_fase1_completa.wav"
-            sf.write(fase1_path, fase1_audio, generator.sample_rate)
+                # Guardar frase individual (en el hilo escritor)
+                self._write_q.put((frase_paths[idx], audio, generator.sample_rate))
 
+        # Esperar a que todas las frases de Fase 1 estén en disco
+        self._write_q.join()
+
+        # Guardar resultado de Fase 1 (para comparación)
+        if audio_segments:
             self.log(f"✅ Fase 1 guardada: {fase1_path.name}")
             self.log(f"📊 Hints prosódicos aplicados: {generator.prosody_stats['hints_applied']}/{total}")
 
+            # Modo dual: la versión rápida es exactamente el audio de Fase 1
+            if intermediate_snapshot_dir is not None:
+                intermediate_snapshot_dir.mkdir(exist_ok=True)
+                snapshot_path = intermediate_snapshot_dir / "audio_final_rapido.wav"
+                shutil.copyfile(fase1_path, snapshot_path)
+                self.save_report({
+                    'mode': 'fast_hybrid',
+                    'phase1_hints_applied': generator.prosody_stats['hints_applied'],
+                    'phase1_total_phrases': total
+                }, intermediate_snapshot_dir / "reporte_rapido.json", "fast")
+                self.log(f"✅ Versión rápida (solo Fase 1) guardada: {snapshot_path}")
+
         # FASE 2: Post-procesamiento SOBRE los resultados de Fase 1
         self.log(f"\n🔧 FASE 2: Post-procesamiento sobre resultados de Fase 1")
         self.progress_label.config(text="Fase 2: Analizando prosodia de Fase 1...")
@@ -1422,11 +1994,10 @@ class ProsodyGeneratorGUI:
             return
 
         # Extraer textos para análisis
-        texts = [frase for frase in generator.frases]
+        texts = generator.frases
 
-        # Analizar el audio generado en Fase 1
-        analyzer = ProsodyAnalyzer()
-        analysis = analyzer.analyze_complete_audio(audio_segments, texts)
+        # Recoger el análisis del audio de Fase 1 (calculado durante la generación)
+        analysis = [f.result() for f in analysis_futures]
 
         # Detectar problemas en el audio de Fase 1
         detector = ProsodyProblemDetector()
@@ -1445,7 +2016,7 @@ class ProsodyGeneratorGUI:
                 self.progress_label.config(text=f"Fase 2: Corrigiendo {len(critical)} problemas...")
 
                 # Configurar regenerador con el mismo contexto que Fase 1
-                regenerator = SelectiveRegenerator(generator.f5tts, max_fixes=5)
+                regenerator = SelectiveRegenerator(generator.f5tts, max_fixes=5, nfe_schedule=severity_nfe_schedule)
                 regenerator.set_reference_context(str(generator.reference_file), "")
 
                 # Corregir problemas detectados
@@ -1456,14 +2027,14 @@ class ProsodyGeneratorGUI:
                 # Actualizar audio_segments con las correcciones
                 audio_segments = corrected_segments
 
-                # SOBREESCRIBIR archivos de frases con las versiones corregidas
-                try:
-                    for idx_corr, audio_corr in enumerate(audio_segments):
-                        frase_path = frases_dir / f"frase_{idx_corr + 1:03d}.wav"
-                        sf.write(frase_path, audio_corr, generator.sample_rate)
-                    self.log("💾 Frases corregidas sobreescritas en disco")
-                except Exception as e:
-                    self.log(f"⚠️ No se pudo sobreescribir frases corregidas: {e}")
+                # SOBREESCRIBIR solo los archivos de las frases corregidas (el resto
+                # ya está en disco desde la Fase 1), en el hilo escritor
+                fixed_ids = fix_report['fixed_indices']
+                for idx_corr in fixed_ids:
+                    self._write_q.put((frase_paths[idx_corr], audio_segments[idx_corr], generator.sample_rate))
+                self._write_q.join()
+                if fixed_ids:
+                    self.log(f"💾 {len(fixed_ids)} frases corregidas sobreescritas en disco")
 
                 self.log(f"✅ Correcciones aplicadas: {fix_report['successful']}/{fix_report['attempted']}")
 
@@ -1475,9 +2046,7 @@ class ProsodyGeneratorGUI:
                     'phase2_fix_details': fix_report
                 }
 
-                with open(output_dir / "reporte_correcciones_fase2.json", 'w', encoding='utf-8') as f:
-                    import json
-                    json.dump(corrections_report, f, indent=2, ensure_ascii=False)
+                dump_json(corrections_report, output_dir / "reporte_correcciones_fase2.json")
 
             else:
                 self.log("✅ No se encontraron problemas críticos en Fase 1")
@@ -1488,9 +2057,8 @@ class ProsodyGeneratorGUI:
 
         if audio_segments:
             # Usar concatenación inteligente para el resultado final
-            final_audio = smart_concatenate(audio_segments, crossfade_ms=50, sr=generator.sample_rate)
             final_path = output_dir / "audio_final_completo.wav"
-            sf.write(final_path, final_audio, generator.sample_rate)
+            smart_concatenate_to_wav(audio_segments, final_path, crossfade_ms=50, sr=generator.sample_rate)
 
             self.log(f"\n✅ Audio final guardado: {final_path.name}")
 
@@ -1510,7 +2078,7 @@ class ProsodyGeneratorGUI:
         self.progress_var.set(100)
         self.log("\n🎉 Modo completo finalizado: Fase 1 (Híbrida) + Fase 2 (Post-procesamiento)")
 
-    def process_full_mode_legacy(self, sentences: List[Dict], output_dir: Path):
+    def process_full_mode_legacy(self, sentence_texts: List[str], sentence_paragraph_ids, output_dir: Path):
         """Modo completo legacy cuando el sistema híbrido no está disponible"""
         self.log("\n⚠️ MODO COMPLETO LEGACY - Sin sistema híbrido")
         self.log("="*50)
@@ -1525,37 +2093,50 @@ class ProsodyGeneratorGUI:
 
         audio_segments = []
         texts = []
-        total = len(sentences)
-
-        for idx, sentence_data in enumerate(sentences):
-            if not self.is_processing:
-                self.log("⏹️ Generación detenida por el usuario")
-                break
-
-            # Actualizar progreso (0-60% para Fase 1)
-            progress = (idx / total) * 60
-            self.progress_var.set(progress)
-            self.progress_label.config(text=f"Fase 1 Legacy: Procesando frase {idx + 1} de {total}")
-
-            # Generar
-            audio = adapter.generate_single_with_prosody(
-                text=sentence_data['text'],
-                phrase_idx=idx,
-                total_phrases=total,
-                paragraph_id=sentence_data['paragraph_id'],
-                log_callback=self.log
-            )
+        total = len(sentence_texts)
+        batch_size = adapter.batch_size
+
+        # Análisis prosódico en segundo plano, solapado con la generación
+        analyzer = ProsodyAnalyzer()
+        analysis_futures = []
+
+        # Generar por lotes de frases consecutivas (mismo párrafo casi siempre)
+        with ThreadPoolExecutor(max_workers=2) as analyzer_pool:
+            for start in range(0, total, batch_size):
+                if not self.is_processing:
+                    self.log("⏹️ Generación detenida por el usuario")
+                    break
+
+                end = min(start + batch_size, total)
+
+                # Actualizar progreso (0-60% para Fase 1)
+                self._update_progress((start / total) * 60,
+                                      f"Fase 1 Legacy: Procesando frases {start + 1}-{end} de {total}")
+
+                # Generar
+                batch_texts = sentence_texts[start:end]
+                audios = adapter.generate_batch_with_prosody(
+                    texts=batch_texts,
+                    phrase_indices=list(range(start, end)),
+                    total_phrases=total,
+                    paragraph_ids=sentence_paragraph_ids[start:end].tolist(),
+                    log_callback=self.log
+                )
+
+                for offset, (audio, text) in enumerate(zip(audios, batch_texts)):
+                    analysis_futures.append(
+                        analyzer_pool.submit(analyzer.analyze_segment, start + offset, audio, text)
+                    )
 
-            audio_segments.append(audio)
-            texts.append(sentence_data['text'])
+                audio_segments.extend(audios)
+                texts.extend(batch_texts)
 
         # Fase 2: Post-procesamiento
         self.log("\n🔧 FASE 2: Análisis y corrección prosódica")
         self.progress_label.config(text="Fase 2: Analizando prosodia...")
 
-        # Analizar
-        analyzer = ProsodyAnalyzer()
-        analysis = analyzer.analyze_complete_audio(audio_segments, texts)
+        # Recoger el análisis (calculado durante la generación)
+        analysis = [f.result() for f in analysis_futures]
 
         # Detectar problemas
         detector = ProsodyProblemDetector()
@@ -1569,7 +2150,8 @@ class ProsodyGeneratorGUI:
             if critical:
                 self.log(f"🔧 Corrigiendo {len(critical)} problemas críticos...")
 
-                regenerator = SelectiveRegenerator(adapter.f5tts, max_fixes=5)
+                regenerator = SelectiveRegenerator(adapter.f5tts, max_fixes=5, nfe_schedule=severity_nfe_schedule)
+                regenerator.set_reference_context(*adapter._reference_context())
                 audio_segments, fix_report = regenerator.fix_critical_problems(
                     problems, audio_segments, texts, severity_threshold=0.3
                 )
@@ -1578,9 +2160,8 @@ class ProsodyGeneratorGUI:
 
         # Concatenar y guardar
         if audio_segments:
-            final_audio = smart_concatenate(audio_segments, crossfade_ms=50, sr=adapter.sample_rate)
             final_path = output_dir / "audio_final_completo_legacy.wav"
-            sf.write(final_path, final_audio, adapter.sample_rate)
+            smart_concatenate_to_wav(audio_segments, final_path, crossfade_ms=50, sr=adapter.sample_rate)
 
             self.log(f"\n✅ Audio final guardado: {final_path}")
 
@@ -1594,23 +2175,19 @@ class ProsodyGeneratorGUI:
 
         self.progress_var.set(100)
 
-    def process_both_modes(self, sentences: List[Dict], output_dir: Path):
+    def process_both_modes(self, sentence_texts: List[str], sentence_paragraph_ids, sentence_paragraph_types: List[str],
+                           output_dir: Path):
         """Procesa ambos modos para comparación"""
         self.log("\n🎯 MODO DUAL - Generando ambas versiones")
         self.log("="*50)
 
-        # Primero modo rápido
-        self.log("\n--- Versión 1: Solo Fase 1 ---")
-        fast_dir = output_dir / "version_rapida"
-        fast_dir.mkdir(exist_ok=True)
-        self.process_fast_mode(sentences, fast_dir)
-
-        if self.is_processing:
-            # Luego modo completo
-            self.log("\n--- Versión 2: Completa con Fase 2 ---")
-            full_dir = output_dir / "version_completa"
-            full_dir.mkdir(exist_ok=True)
-            self.process_full_mode(sentences, full_dir)
+        # Una sola pasada: la versión rápida (solo Fase 1) se guarda al terminar
+        # la Fase 1 del modo completo, sin volver a generar las frases
+        self.log("\n--- Versión 1: Solo Fase 1 / Versión 2: Completa con Fase 2 ---")
+        full_dir = output_dir / "version_completa"
+        full_dir.mkdir(exist_ok=True)
+        self.process_full_mode(sentence_texts, sentence_paragraph_ids, sentence_paragraph_types, full_dir,
+                               intermediate_snapshot_dir=output_dir / "version_rapida")
 
         self.log("\n📊 Ambas versiones generadas para comparación")
 
@@ -1624,8 +2201,7 @@ class ProsodyGeneratorGUI:
             **data
         }
 
-        with open(path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        dump_json(report, path)
 
         self.log(f"📊 Reporte guardado: {path}")
 
@@ -1638,15 +2214,11 @@ class ProsodyGeneratorGUI:
 
     def open_results_folder(self):
         """Abre la carpeta de resultados más reciente"""
-        import subprocess
-        import platform
 
         # Buscar la carpeta más reciente
-        output_dirs = sorted([d for d in Path('.').glob('output_*') if d.is_dir()],
-                            key=lambda x: x.stat().st_mtime, reverse=True)
+        folder = self._latest_output_dir()
 
-        if output_dirs:
-            folder = output_dirs[0]
+        if folder is not None:
 
             if platform.system() == "Windows":
                 os.startfile(folder)
@@ -1659,11 +2231,18 @@ class ProsodyGeneratorGUI:
         else:
             messagebox.showinfo("Sin resultados", "No hay carpetas de resultados generadas aún")
 
+    @staticmethod
+    def _latest_output_dir() -> Optional[Path]:
+        """Carpeta output_* modificada más recientemente (una sola lectura del directorio)"""
+        with os.scandir('.') as it:
+            dirs = [e for e in it if e.name.startswith('output_') and e.is_dir()]
+        if not dirs:
+            return None
+        return Path(max(dirs, key=lambda e: e.stat().st_mtime).path)
+
     def resume_last_session(self):
         """Reanuda la ejecución desde el último estado guardado (si existe)."""
-        import json
-        from pathlib import Path as _Path
-        state_path = _Path('resume_state.json')
+        state_path = Path('resume_state.json')
         if not state_path.exists():
             messagebox.showinfo("Reanudar", "No hay estado de reanudación disponible")
             return
@@ -1677,36 +2256,57 @@ class ProsodyGeneratorGUI:
 
     def load_and_resume_session(self):
         """Carga automáticamente la última sesión output_* o resume_state.json y prepara reanudación."""
-        from pathlib import Path as _Path
-        import json as _json
         # 1) Intentar resume_state.json
-        state_path = _Path('resume_state.json')
+        state_path = Path('resume_state.json')
         if state_path.exists():
             try:
-                self.resume_state = _json.loads(state_path.read_text(encoding='utf-8'))
-                self.log(f"🔄 Cargado estado de reanudación: frase {self.resume_state.get('phrase_idx','?')}")
-                messagebox.showinfo("Reanudar", "Estado de reanudación cargado. Inicie 'Generar Audio' para continuar.")
-                return
+                state = json.loads(state_path.read_text(encoding='utf-8'))
+                # Con frases_mtime es una detección automática de una versión anterior,
+                # no un punto de control del motor: se ignora y se vuelve a detectar
+                if 'frases_mtime' not in state:
+                    self.resume_state = state
+                    self.log(f"🔄 Cargado estado de reanudación: frase {self.resume_state.get('phrase_idx','?')}")
+                    messagebox.showinfo("Reanudar", "Estado de reanudación cargado. Inicie 'Generar Audio' para continuar.")
+                    return
             except Exception as e:
                 self.log(f"⚠️ No se pudo leer resume_state.json: {e}")
         # 2) Buscar última carpeta output_*
-        output_dirs = sorted([d for d in _Path('.').glob('output_*') if d.is_dir()], key=lambda x: x.stat().st_mtime, reverse=True)
-        if not output_dirs:
+        last_dir = self._latest_output_dir()
+        if last_dir is None:
             messagebox.showinfo("Reanudar", "No hay sesiones previas para reanudar")
             return
-        last_dir = output_dirs[0]
         frases_dir = last_dir / 'frases'
         if not frases_dir.exists():
             messagebox.showinfo("Reanudar", f"La última sesión no contiene 'frases': {last_dir}")
             return
-        # Calcular índice de reanudación por número de wav existentes consecutivos
-        idx = 0
-        while True:
-            path = frases_dir / f"frase_{idx + 1:03d}.wav"
-            if path.exists():
+        # Calcular índice de reanudación por número de wav existentes consecutivos;
+        # si 'frases' no ha cambiado desde la última detección, reutilizarla. La
+        # detección se guarda en la propia sesión: resume_state.json es solo para
+        # los puntos de control que escriben los abortos del motor
+        scan_path = last_dir / SCAN_CACHE_NAME
+        frases_mtime = frases_dir.stat().st_mtime
+        cached_scan = None
+        try:
+            cached_scan = json.loads(scan_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            pass
+        if (isinstance(cached_scan, dict) and cached_scan.get('session_dir') == str(last_dir)
+                and cached_scan.get('frases_mtime') == frases_mtime):
+            idx = int(cached_scan.get('phrase_idx', 0))
+        else:
+            with os.scandir(frases_dir) as it:
+                existing = {int(m.group(1)) for m in (_RE_FRASE_WAV.fullmatch(e.name) for e in it) if m}
+            idx = 0
+            while idx + 1 in existing:
                 idx += 1
-            else:
-                break
+            try:
+                scan_path.write_text(json.dumps({
+                    'session_dir': str(last_dir),
+                    'phrase_idx': idx,
+                    'frases_mtime': frases_mtime
+                }, indent=2), encoding='utf-8')
+            except OSError as e:
+                self.log(f"⚠️ No se pudo guardar {SCAN_CACHE_NAME}: {e}")
         if idx == 0:
             messagebox.showinfo("Reanudar", f"No se encontraron frases previas en {last_dir}")
             return
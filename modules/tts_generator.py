@@ -36,8 +36,10 @@ import sys
 # ====================================================================================================
 # Configuración optimizada de memoria CUDA para prevenir errores Out-Of-Memory (OOM)
 # - expandable_segments: Permite expansión dinámica de segmentos de memoria
-# - max_split_size_mb: Limita el tamaño de división de bloques a 64MB
-os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True,max_split_size_mb:64'
+# No se combina con max_split_size_mb: ese límite impide reutilizar bloques grandes
+# de los segmentos expandibles y fuerza cudaMalloc extra en cada frase. Si vuelven
+# los OOM, añadir 'garbage_collection_threshold:0.8' en lugar de un límite de división.
+os.environ['PYTORCH_CUDA_ALLOC_CONF'] = 'expandable_segments:True'
 os.environ['CUDA_DEVICE_ORDER'] = 'PCI_BUS_ID'          # Orden consistente de dispositivos
 os.environ['CUDA_VISIBLE_DEVICES'] = '0'                # Usar solo GPU 0
 import shutil
@@ -58,6 +60,14 @@ import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
 import threading
 import json
+import gc
+import importlib
+import bisect
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
 
 # Importar tu generador original
 try:
@@ -76,12 +86,410 @@ from core.prosody_processor import (
     ProsodyProblemDetector,
     SelectiveRegenerator,
     smart_concatenate,
-    export_prosody_report
+    export_prosody_report,
+    severity_nfe_schedule,
+    write_pcm16_wav,
+    crossfade_into,
+    warm_up_crossfade,
+    dump_json
 )
+from core.hint_cache import ProsodyHintCache, text_fingerprint
 
 warnings.filterwarnings("ignore")
 
 
+# Modelos F5-TTS ya cargados, compartidos por todos los generadores y modos
+# del proceso (la carga del checkpoint e inicialización CUDA cuestan segundos)
+_F5TTS_INSTANCES = {}
+_F5TTS_LOCK = threading.Lock()
+
+
+def get_shared_f5tts(model_type: str = "F5-TTS", device: str = "cuda", ckpt_file: str = ""):
+    """Devuelve el F5TTS de (modelo, dispositivo, checkpoint), cargándolo solo la primera vez"""
+    key = (model_type, str(device), str(ckpt_file or ""))
+    with _F5TTS_LOCK:
+        instance = _F5TTS_INSTANCES.get(key)
+        if instance is None:
+            instance = F5TTS(model_type=model_type, device=device, ckpt_file=key[2])
+            _F5TTS_INSTANCES[key] = instance
+        return instance
+
+
+def has_shared_f5tts(model_type: str = "F5-TTS", device: str = "cuda", ckpt_file: str = "") -> bool:
+    """True si el modelo de (modelo, dispositivo, checkpoint) ya está cargado"""
+    with _F5TTS_LOCK:
+        return (model_type, str(device), str(ckpt_file or "")) in _F5TTS_INSTANCES
+
+
+def release_shared_f5tts(model_type: str = "F5-TTS", device: str = "cuda", ckpt_file: str = ""):
+    """Olvida un modelo compartido (p. ej. tras un OOM) para que se vuelva a cargar"""
+    with _F5TTS_LOCK:
+        _F5TTS_INSTANCES.pop((model_type, str(device), str(ckpt_file or "")), None)
+
+
+def load_reference_conditioning(f5tts, ref_file: str, ref_text: str):
+    """
+    Referencia ya preprocesada (recorte + transcripción) como la prepara F5 para
+    una pasada del CFM: mono, RMS mínimo 0.1, frecuencia del modelo y en su dispositivo.
+    Devuelve (audio, texto de referencia, rms original).
+    """
+    import torchaudio
+
+    audio, sr = torchaudio.load(ref_file)
+    if audio.shape[0] > 1:
+        audio = torch.mean(audio, dim=0, keepdim=True)
+    rms = torch.sqrt(torch.mean(torch.square(audio))).item()
+    if rms < 0.1:
+        audio = audio * 0.1 / rms
+    target_sr = f5tts.target_sample_rate
+    if sr != target_sr:
+        audio = torchaudio.transforms.Resample(sr, target_sr)(audio)
+    return audio.to(f5tts.device), ref_text, rms
+
+
+def f5_batch_max_chars(f5tts, ref_cond, speed: float) -> int:
+    """
+    Bytes de texto que F5 genera de una pasada (misma fórmula que infer_process:
+    referencia + generación dentro de ~22 s). ema_model.sample no trocea, así que
+    los textos más largos deben ir por F5TTS.infer. 0 si no hay transcripción.
+    """
+    ref_audio, ref_text, _ = ref_cond
+    ref_seconds = ref_audio.shape[-1] / f5tts.target_sample_rate
+    if not ref_text.strip() or ref_seconds <= 0:
+        return 0
+    return int(len(ref_text.encode('utf-8')) / ref_seconds * (22 - ref_seconds) * speed)
+
+
+def infer_f5_batch(f5tts, ref_cond, gen_texts, speeds, nfe_step, sway_sampling_coef,
+                   cfg_strength, seed=None):
+    """
+    Una pasada del CFM de F5 para varias frases (como f5_tts/eval/eval_infer_batch.py):
+    el texto se rellena con -1 y la duración de cada muestra define su máscara, así
+    que el audio de cada frase se recorta con su propia duración.
+    """
+    from f5_tts.infer.utils_infer import convert_char_to_pinyin
+
+    ref_audio, ref_text, ref_rms = ref_cond
+    if not ref_text.strip():
+        raise ValueError("referencia sin transcripción: la duración de la pasada no es estimable")
+    model = f5tts.ema_model
+    hop_length = model.mel_spec.hop_length
+
+    ref_frames = ref_audio.shape[-1] // hop_length
+    ref_bytes = len(ref_text.encode('utf-8'))
+    durations = [
+        ref_frames + int(ref_frames / ref_bytes * len(t.encode('utf-8')) / speed)
+        for t, speed in zip(gen_texts, speeds)
+    ]
+
+    with torch.inference_mode():
+        generated, _ = model.sample(
+            cond=ref_audio.expand(len(gen_texts), -1),
+            text=convert_char_to_pinyin([ref_text + t for t in gen_texts]),
+            duration=torch.tensor(durations, dtype=torch.long, device=ref_audio.device),
+            steps=nfe_step,
+            cfg_strength=cfg_strength,
+            sway_sampling_coef=sway_sampling_coef,
+            seed=seed if seed is not None and seed >= 0 else None
+        )
+        generated = generated.to(torch.float32)
+
+        # Los audios se quedan en el dispositivo hasta el final del lote:
+        # una sola copia D2H (y una sincronización) en lugar de una por frase
+        device_wavs = []
+        for i, duration in enumerate(durations):
+            mel = generated[i:i + 1, ref_frames:duration, :].permute(0, 2, 1)
+            if getattr(f5tts, 'mel_spec_type', 'vocos') == 'bigvgan':
+                wav = f5tts.vocoder(mel)
+            else:
+                wav = f5tts.vocoder.decode(mel)
+            if ref_rms < 0.1:
+                wav = wav * ref_rms / 0.1
+            device_wavs.append(wav.reshape(-1))
+
+        flat = torch.cat(device_wavs).cpu().numpy()
+
+    # Vistas del buffer del host, una por frase
+    split_points = np.cumsum([wav.shape[0] for wav in device_wavs])[:-1]
+    return np.split(flat, split_points)
+
+
+# Saneado y división de texto para el motor (_sanitize_engine_text, _split_text_for_engine)
+_RE_ELLIPSIS = re.compile(r'\.{3,}')
+_ENGINE_REPLACEMENTS = (
+    (r"\bke\b", "que"),
+    (r"\bk\b", "que"),
+    (r"\beyos\b", "ellos"),
+    (r"\bexijen\b", "exigen"),
+    (r"\bnibel\b", "nivel"),
+    (r"\bbida\b", "vida"),
+    (r"\bboomer\b", "persona mayor"),
+)
+# Todas las correcciones en una sola alternancia: una pasada sobre el texto
+_RE_ENGINE_REPLACEMENTS = re.compile(
+    '|'.join(f'(?P<g{i}>{pattern})' for i, (pattern, _) in enumerate(_ENGINE_REPLACEMENTS)),
+    re.IGNORECASE
+)
+_ENGINE_REPLACEMENT_MAP = {f'g{i}': repl for i, (_, repl) in enumerate(_ENGINE_REPLACEMENTS)}
+_RE_INVERTED_START = re.compile(r'^[¡¿]+')
+_RE_LEAD_DASH = re.compile(r'^[\-–—]\s*')
+_RE_END_PUNCT = re.compile(r'[:,;]+\s*$')
+_RE_REPEAT_PUNCT = re.compile(r'([.!?])\1{1,}')
+_RE_END_COMMA = re.compile(r',\s*$')
+_RE_DANGLING_END = re.compile(r'(\b(que|a|de|para|por|con|sin|sobre|hasta|entre|según|tras))\.$', re.IGNORECASE)
+_RE_FINAL_DOT = re.compile(r'\.$')
+_RE_QUOTES = re.compile(r'["“”]')
+_RE_INNER_DASH = re.compile(r'\s[\-–—]\s')
+_ENGINE_CONNECTORS = frozenset(("y", "pero", "porque", "aunque", "entonces", "o"))
+_RE_WORD = re.compile(r'\b\w+\b')
+# Signos repetidos (??, !!) y puntuación pesada (; : — –) en una sola pasada del regex
+_RE_RISKY_MARKS = re.compile(r'\?\?|!!|[;:\u2014\u2013]')
+_REPEATED_MARKS = frozenset(('??', '!!'))
+_ENGINE_BAD_TOKENS = frozenset(("que", "a", "de", "para", "por", "con", "sin", "sobre", "hasta", "entre", "según", "tras"))
+
+
+# Valores permitidos de NFE tras los ajustes prosódicos (pocas trayectorias ODE
+# distintas: el DiT compilado reutiliza sus CUDA graphs entre frases)
+_NFE_BUCKETS = (24, 32, 48, 64)
+
+
+def snap_sampling_params(nfe_steps: int, sway_sampling_coef: float, speed: float):
+    """Ajusta nfe al bucket más cercano, sway a una rejilla de 0.1 y speed a 0.05"""
+    nfe_steps = min(_NFE_BUCKETS, key=lambda b: abs(b - nfe_steps))
+    return nfe_steps, round(round(sway_sampling_coef / 0.1) * 0.1, 2), round(round(speed / 0.05) * 0.05, 2)
+
+
+@lru_cache(maxsize=8)
+def _linear_fade_ramps(n: int, dtype=np.float64):
+    """Rampas lineales (fade_out, fade_in) de n muestras, de solo lectura y compartidas"""
+    fade_out = np.linspace(1.0, 0.0, n, dtype=dtype)
+    fade_in = np.linspace(0.0, 1.0, n, dtype=dtype)
+    fade_out.setflags(write=False)
+    fade_in.setflags(write=False)
+    return fade_out, fade_in
+
+
+@lru_cache(maxsize=4096)
+def _risk_scan_text(s: str) -> Optional[str]:
+    """
+    Heurística para detectar textos que disparan bucles/errores en el motor.
+    Una sola pasada: devuelve los motivos ('pregunta larga', 'signos repetidos',
+    'puntuación pesada', 'vacío') o None si el texto no es arriesgado.
+    """
+    s_clean = s.strip()
+    if len(s_clean) == 0:
+        return 'vacío'
+    reasons = []
+    # Preguntas largas o con múltiples cláusulas sin coma
+    if s_clean.endswith('?') and len(s_clean) > 90:
+        reasons.append('pregunta larga')
+    # Signos repetidos y puntuación pesada: un único recorrido en C
+    marks = set(_RE_RISKY_MARKS.findall(s_clean))
+    # Exceso de signos seguidos
+    if not marks.isdisjoint(_REPEATED_MARKS):
+        reasons.append('signos repetidos')
+    # Mucha puntuación o símbolos especiales
+    if len(s_clean) > 80 and not marks <= _REPEATED_MARKS:
+        reasons.append('puntuación pesada')
+    return ', '.join(reasons) or None
+
+
+def _longest_nonsilent_interval(y: np.ndarray, top_db: float = 30.0,
+                                frame_length: int = 2048, hop_length: int = 512):
+    """
+    (inicio, fin) en muestras del tramo no silencioso más largo de y, o None.
+    Misma puerta que librosa.effects.split (RMS por frame centrado frente a
+    top_db bajo el máximo) pero con una ventana deslizante de NumPy, sin librosa.
+    """
+    if len(y) == 0:
+        return None
+    padded = np.pad(np.asarray(y, dtype=np.float32), frame_length // 2)
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)[::hop_length]
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_length)
+    peak = rms.max()
+    if peak <= 0:
+        return None
+    active = rms > peak * 10 ** (-top_db / 20)
+
+    # Tramos de frames activos: flancos de subida/bajada en un solo diff
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], active.view(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    longest = int(np.argmax(ends - starts))
+    return int(starts[longest]) * hop_length, min(len(y), int(ends[longest]) * hop_length)
+
+
+def compile_f5_transformer(f5tts):
+    """
+    Compila el DiT con torch.compile(mode='reduce-overhead'): los pasos del ODE
+    se reproducen como CUDA graphs en lugar de lanzar cada kernel por separado.
+    Se compila el módulo en sitio (nn.Module.compile) para que los envoltorios
+    de autocast de forward sigan aplicándose. Solo con F5_COMPILE=1: cada
+    duración distinta es una forma nueva y exige recompilar.
+    """
+    try:
+        transformer = f5tts.ema_model.transformer
+        if getattr(transformer, '_compiled', False):
+            return
+        transformer.compile(mode='reduce-overhead', dynamic=False)
+        transformer._compiled = True
+        print("⚡ DiT compilado (torch.compile, CUDA graphs)")
+    except Exception as e:
+        print(f"⚠️ No se pudo compilar el DiT: {e}")
+
+
+def cast_f5_transformer_bf16(f5tts):
+    """
+    Pasa los pesos FP32 del DiT a BF16 en sitio: mitad de VRAM y de tráfico de
+    memoria por paso del ODE. El extractor mel y el vocoder siguen en FP32 (F5
+    convierte el mel a FP32 antes de decodificar). Si F5 ya cargó el modelo en media precisión no
+    se toca. Marca _autocast_dtype para que no se apilen envoltorios de autocast.
+    """
+    try:
+        if not torch.cuda.is_bf16_supported():
+            return
+        transformer = f5tts.ema_model.transformer
+        if next(transformer.parameters()).dtype != torch.float32:
+            return
+        transformer.to(dtype=torch.bfloat16)
+        transformer._autocast_dtype = torch.bfloat16
+        print("⚡ Pesos del DiT en BF16")
+    except Exception as e:
+        print(f"⚠️ No se pudieron pasar los pesos a BF16: {e}")
+
+
+@lru_cache(maxsize=4096)
+def _sanitize_engine_text(text: str, aggressive: bool = False) -> str:
+    """
+    Sanea el texto para el motor F5-TTS evitando puntuaciones que pueden provocar errores internos.
+    - Elimina signos invertidos iniciales ('¿', '¡') pero preserva '?'/'!' finales.
+    - Sustituye comas/';'/' :' finales por punto.
+    - Colapsa múltiples signos.
+    - En modo agresivo, elimina comillas y guiones y fuerza punto final.
+    """
+    s = (text or "").strip()
+
+    # Normalizar ellipsis y variantes (… o ... -> .)
+    s = s.replace('\u2026', '...')
+    s = _RE_ELLIPSIS.sub('.', s)
+
+    # Correcciones típicas que desestabilizan el motor (solo para engine)
+    s = _RE_ENGINE_REPLACEMENTS.sub(lambda m: _ENGINE_REPLACEMENT_MAP[m.lastgroup], s)
+
+    # Eliminar signos invertidos de apertura; mantener '?/!' finales para entonación
+    s = _RE_INVERTED_START.sub('', s)
+
+    # Quitar guion/raya inicial con espacios
+    s = _RE_LEAD_DASH.sub('', s)
+
+    # Reemplazar puntuación final problemática por punto
+    s = _RE_END_PUNCT.sub('.', s)
+
+    # Colapsar repeticiones de signos
+    s = _RE_REPEAT_PUNCT.sub(r'\1', s)
+
+    # Evitar frases que terminen en coma
+    s = _RE_END_COMMA.sub('.', s)
+
+    # Completar cláusulas que terminan en preposición o 'que'
+    if _RE_DANGLING_END.search(s):
+        s = _RE_FINAL_DOT.sub(' hacerlo.', s)
+
+    if aggressive:
+        # Retirar comillas, dobles y tipográficas
+        s = _RE_QUOTES.sub('', s)
+        # Retirar guiones/rayas en medio sueltos
+        s = _RE_INNER_DASH.sub(' ', s)
+        # Forzar punto final si no hay puntuación
+        if not s.endswith(('.', '!', '?')):
+            s = s.rstrip() + '.'
+
+    # Asegurar que no quede vacío
+    if not s.strip():
+        s = '...'
+
+    return s.strip()
+
+
+class CrossfadeWavStream:
+    """
+    Escribe a disco la concatenación con crossfade de apply_crossfade_and_concatenate
+    a medida que llegan los segmentos, sin acumular el audio completo en memoria.
+
+    Solo retiene las últimas muestras del crossfade (pueden mezclarse con el
+    siguiente segmento); el resto se vuelca al WAV en cuanto se conoce.
+    """
+
+    def __init__(self, generator, path, total_segments: int, crossfade_ms: int = 150):
+        self.generator = generator
+        self.path = Path(path)
+        self.sample_rate = generator.sample_rate
+        self.total_segments = total_segments
+        self.crossfade_samples = int(crossfade_ms / 1000 * self.sample_rate)
+
+        # Rampas de fade (compartidas entre streams)
+        self.fade_out, self.fade_in = _linear_fade_ramps(self.crossfade_samples, np.float32)
+
+        # Silencio reutilizable para las pausas entre párrafos (máx. 1 s, ver
+        # _calcular_pausa_entre_segmentos); np.concatenate copia del slice
+        self._silence_pool = np.zeros(int(2.0 * self.sample_rate), dtype=np.float32)
+
+        self.count = 0       # segmentos recibidos
+        self.written = 0     # muestras ya volcadas a disco
+        self.tail = np.zeros(0, dtype=np.float32)
+        self._file = None    # se abre con el primer segmento
+
+    def write(self, segment):
+        """Añade un segmento aplicando pausa entre párrafos y crossfade"""
+        segment = np.asarray(segment, dtype=np.float32)
+        cf = self.crossfade_samples
+
+        if self.count == 0:
+            self._file = sf.SoundFile(str(self.path), 'w', samplerate=self.sample_rate, channels=1)
+            self.tail = segment
+        else:
+            pausa_extra = self.generator._calcular_pausa_entre_segmentos(self.count, self.total_segments)
+            if pausa_extra > 0:
+                silence_samples = int(pausa_extra * self.sample_rate)
+                if silence_samples <= len(self._silence_pool):
+                    silencio = self._silence_pool[:silence_samples]
+                else:
+                    silencio = np.zeros(silence_samples, dtype=np.float32)
+                self.tail = np.concatenate([self.tail, silencio])
+
+            if self.written + len(self.tail) >= cf and len(segment) >= cf:
+                overlap = self.tail[-cf:] * self.fade_out + segment[:cf] * self.fade_in
+                self.tail = np.concatenate([self.tail[:-cf], overlap, segment[cf:]])
+            else:
+                self.tail = np.concatenate([self.tail, segment])
+
+        self.count += 1
+
+        # Volcar todo salvo la cola que aún puede entrar en un crossfade
+        flush = len(self.tail) - cf
+        if flush > 0:
+            self._file.write(self.tail[:flush])
+            self.written += flush
+            self.tail = self.tail[flush:]
+
+    def close(self):
+        """Vuelca la cola pendiente y cierra el WAV"""
+        if self._file is None:
+            return
+        if len(self.tail):
+            self._file.write(self.tail)
+            self.written += len(self.tail)
+            self.tail = np.zeros(0, dtype=np.float32)
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
 class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
     """
     Generador mejorado con capacidades prosódicas avanzadas.
@@ -126,7 +534,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
         # Asegurar que reference_file esté configurado
         if self.reference_file is None:
-            self.reference_file = Path(reference_file)
+            self.reference_file = reference_file if isinstance(reference_file, Path) else Path(reference_file)
             print(f"📎 Archivo de referencia configurado: {self.reference_file}")
 
         # Añadir sistema de prosodia
@@ -160,97 +568,192 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
         self.enable_prosody_hints = True
         self.enable_postprocessing = False  # Por defecto solo Fase 1
 
+        # Vaciar la caché del asignador CUDA tras cada frase solo si se pide
+        # (F5_EMPTY_CACHE=1): recorre todo el heap y no libera memoria útil
+        self.empty_cache_per_phrase = os.environ.get('F5_EMPTY_CACHE') == '1'
+
+        # Hints ya calculados por (documento, frase, párrafo, total, texto): los
+        # reintentos, regeneraciones y relanzamientos de la sesión no los recalculan
+        self._hint_cache = ProsodyHintCache()
+        self._hint_doc_key = text_fingerprint(texto_usuario)
+
+        # Última generación en forma de arrays paralelos (índice de frase, audio):
+        # la concatenación y la Fase 2 usan la lista de audios sin desempaquetar tuplas
+        self._audio_idx = array('i')
+        self._audio_list = []
+
+        # Inferencia por lotes (generate_phrases_batched): frases por pasada del CFM,
+        # agrupadas por parámetros de muestreo y longitud de texto (F5_BATCH_SIZE=1 desactiva)
+        self.batch_size = max(1, int(os.environ.get('F5_BATCH_SIZE', '4')))
+        self._batch_length_bins = np.array([40, 80, 120, 160, 240])
+        self._ref_cond = None  # (audio 24 kHz en el dispositivo, texto de referencia, rms)
+        self._cpu_f5tts = None  # Modelo en CPU para los reintentos extremos (se carga al primer uso)
+
+        # Parámetros de muestreo ajustados por hints redondeados a buckets
+        # (snap_sampling_params). Por defecto solo con el DiT compilado (F5_COMPILE=1);
+        # F5_PARAM_BUCKETS=1/0 lo fuerza
+        self.bucket_sampling_params = os.environ.get(
+            'F5_PARAM_BUCKETS', os.environ.get('F5_COMPILE', '0')) == '1'
+
+        # Compilar el kernel de crossfade ahora y no en la primera concatenación
+        warm_up_crossfade()
+
         print(f"✅ Sistema híbrido listo: Generación original + Prosodia")
 
+    @property
+    def reference_file(self):
+        return self._reference_file
+
+    @reference_file.setter
+    def reference_file(self, value):
+        # Las GUIs reasignan la referencia: la cadena se recalcula solo entonces
+        self._reference_file = value
+        self._reference_file_str = str(value) if value is not None else ''
+
     def ensure_model_loaded(self):
         """Asegurar que el modelo F5TTS esté cargado con optimización de memoria"""
         if self.f5tts is None:
             print("🔄 Cargando modelo F5-TTS...")
 
-            # Optimización agresiva de memoria CUDA
-            if self.device == "cuda":
+            # Optimización agresiva de memoria CUDA (si otro generador ya cargó el
+            # modelo en GPU se reutiliza: su VRAM ya no cuenta como libre)
+            if self.device == "cuda" and not has_shared_f5tts("F5-TTS", "cuda", self.model_path):
                 try:
-                    # Limpiar toda la caché de GPU
-                    torch.cuda.empty_cache()
-                    torch.cuda.synchronize()
-                    torch.cuda.ipc_collect()
-
-                    # Obtener información de memoria
-                    total_memory = torch.cuda.get_device_properties(0).total_memory
-                    allocated_memory = torch.cuda.memory_allocated(0)
-                    cached_memory = torch.cuda.memory_reserved(0)
-
-                    print(f"🎮 GPU Memory: {total_memory/1024**3:.1f}GB total, {allocated_memory/1024**3:.1f}GB allocated, {cached_memory/1024**3:.1f}GB cached")
-
-                    # Si hay poca memoria libre, forzar a CPU
-                    free_memory = total_memory - max(allocated_memory, cached_memory)
-                    if free_memory < 2 * 1024**3:  # Menos de 2GB libre
+                    # Limpieza completa de la caché de GPU solo si se pide
+                    # (FORCE_CUDA_CLEAN=1): sincroniza y recorre el asignador
+                    if os.environ.get('FORCE_CUDA_CLEAN') == '1':
+                        with torch.cuda.device(0):
+                            torch.cuda.empty_cache()
+                            torch.cuda.synchronize()
+                            torch.cuda.ipc_collect()
+
+                    # Memoria libre/total directamente del driver
+                    free_memory, total_memory = torch.cuda.mem_get_info(0)
+
+                    print(f"🎮 GPU Memory: {total_memory/1024**3:.1f}GB total, {free_memory/1024**3:.1f}GB libre")
+
+                    # Si hay poca memoria libre, forzar a CPU (con pesos BF16
+                    # el modelo ocupa ~800MB en lugar de ~1.6GB; sin soporte BF16,
+                    # antes de Ampere, cast_f5_transformer_bf16 deja los pesos en FP32)
+                    bf16_weights = (os.environ.get('F5_BF16', '1') == '1'
+                                    and torch.cuda.is_bf16_supported())
+                    min_free = 1 if bf16_weights else 2
+                    if free_memory < min_free * 1024**3:
                         print(f"⚠️ Poca memoria GPU libre ({free_memory/1024**3:.1f}GB), cambiando a CPU...")
                         self.device = "cpu"
                 except Exception as e:
                     print(f"⚠️ Error verificando memoria GPU: {e}, usando CPU...")
                     self.device = "cpu"
 
+            cuda_oom = False
             try:
+                compile_dit = self.device == "cuda" and os.environ.get('F5_COMPILE') == '1'
+
                 if self.device == "cuda":
-                    # Configurar para usar menos memoria
-                    torch.backends.cudnn.benchmark = False
+                    # Configurar para usar menos memoria (con el DiT compilado,
+                    # dejar que cuDNN elija kernels por forma)
+                    torch.backends.cudnn.benchmark = compile_dit
                     torch.backends.cuda.matmul.allow_tf32 = True
 
-                    # Configurar torch.load para usar weights_only=False de forma segura
-                    import importlib
-                    importlib.import_module('torch.serialization')
-                    original_load = torch.load
-
-                    def safe_load_cuda(f, map_location=None, **kwargs):
-                        if 'weights_only' not in kwargs:
-                            kwargs['weights_only'] = False
-                        if map_location is None:
-                            map_location = "cuda:0"
-                        return original_load(f, map_location=map_location, **kwargs)
-
-                    torch.load = safe_load_cuda
-
-                self.f5tts = F5TTS(
-                    model_type="F5-TTS",
-                    device=self.device,
-                    ckpt_file=self.model_path
-                )
+                self.f5tts = self._load_f5tts()
 
                 if self.device == "cuda":
-                    torch.load = original_load  # Restaurar función original
+                    self._prepare_cuda_model()
 
                 print(f"✅ Modelo F5-TTS cargado exitosamente en {self.device.upper()}")
 
             except torch.cuda.OutOfMemoryError as oom_error:
                 print(f"⚠️ Error de memoria GPU: {oom_error}")
-                print("🔄 Limpiando memoria y reintentando con CPU...")
-
-                # Limpiar todo
-                if hasattr(self, 'f5tts') and self.f5tts is not None:
-                    del self.f5tts
-                torch.cuda.empty_cache()
-                torch.cuda.synchronize()
-
-                # Cambiar a CPU
-                self.device = "cpu"
-                self.f5tts = F5TTS(
-                    model_type="F5-TTS",
-                    device=self.device,
-                    ckpt_file=self.model_path
-                )
-                print("✅ Modelo cargado en CPU (será más lento pero funcional)")
+
+                # Soltar referencias al modelo a medio cargar
+                self.f5tts = None
+                release_shared_f5tts("F5-TTS", self.device, self.model_path)
+                cuda_oom = True
 
             except Exception as e:
                 print(f"❌ Error cargando F5-TTS: {e}")
                 raise
 
+            # Reintentar fuera del except: el traceback retiene los frames de la
+            # carga fallida (y sus tensores) mientras el bloque sigue activo
+            if cuda_oom:
+                gc.collect()
+                if not self._retry_cuda_load_with_gc_threshold():
+                    print("🔄 Limpiando memoria y reintentando con CPU...")
+                    torch.cuda.empty_cache()
+
+                    # Cambiar a CPU
+                    self.device = "cpu"
+                    self.f5tts = get_shared_f5tts("F5-TTS", self.device, self.model_path)
+                    print("✅ Modelo cargado en CPU (será más lento pero funcional)")
+
+            # Preprocesar la referencia (recorte + ASR) una vez para todas las frases
+            self._engine_reference()
+
+    def _load_f5tts(self):
+        """get_shared_f5tts con torch.load forzado a weights_only=False y cuda:0 en CUDA"""
+        if self.device != "cuda":
+            return get_shared_f5tts("F5-TTS", self.device, self.model_path)
+
+        # Configurar torch.load para usar weights_only=False de forma segura
+        importlib.import_module('torch.serialization')
+        original_load = torch.load
+
+        def safe_load_cuda(f, map_location=None, **kwargs):
+            if 'weights_only' not in kwargs:
+                kwargs['weights_only'] = False
+            if map_location is None:
+                map_location = "cuda:0"
+            return original_load(f, map_location=map_location, **kwargs)
+
+        torch.load = safe_load_cuda
+        try:
+            return get_shared_f5tts("F5-TTS", self.device, self.model_path)
+        finally:
+            # Restaurar función original (también tras un OOM, para
+            # no dejar el envoltorio y su cierre vivos)
+            torch.load = original_load
+
+    def _retry_cuda_load_with_gc_threshold(self) -> bool:
+        """
+        Tras un OOM al cargar: en lugar de vaciar toda la caché CUDA, baja el
+        garbage_collection_threshold del asignador a 0.6 (recicla bloques en
+        caché al 60% de uso) y reintenta una vez en GPU. False si sigue sin caber.
+        """
+        try:
+            torch.cuda.memory._set_allocator_settings('garbage_collection_threshold:0.6')
+            print("🔧 Asignador CUDA: garbage_collection_threshold=0.6, reintentando en GPU...")
+            self.f5tts = self._load_f5tts()
+        except (torch.cuda.OutOfMemoryError, RuntimeError, AttributeError) as e:
+            print(f"⚠️ Reintento en GPU fallido: {e}")
+            self.f5tts = None
+            release_shared_f5tts("F5-TTS", self.device, self.model_path)
+
+        if self.f5tts is None:
+            gc.collect()  # ya fuera del except, sin el traceback reteniendo tensores
+            return False
+
+        self._prepare_cuda_model()
+        print("✅ Modelo F5-TTS cargado en GPU tras ajustar el asignador")
+        return True
+
+    def _prepare_cuda_model(self):
+        """
+        Pasos tras cargar en GPU, comunes a la carga normal y al reintento tras OOM:
+        pesos del DiT en BF16 (F5_BF16, por defecto) y compilación (F5_COMPILE=1)
+        """
+        if os.environ.get('F5_BF16', '1') == '1':
+            cast_f5_transformer_bf16(self.f5tts)
+        if os.environ.get('F5_COMPILE') == '1':
+            compile_f5_transformer(self.f5tts)
+
     def parse_text_and_prepare(self):
         """
         Método para preparar el texto (compatible con tests)
         En tu sistema original las frases ya están listas
         """
         # Las frases ya están procesadas en self.frases por el constructor original
+        self._critical_mask = self._compute_critical_mask(self.frases)
         return len(self.frases)
 
     def generate_single_phrase_with_prosody(self, text, phrase_idx, total_phrases, paragraph_id=None, log_callback=None):
@@ -264,9 +767,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
         # Generar hints prosódicos si está habilitado
         if self.enable_prosody_hints:
-            hints = self.prosody_hint_gen.prepare_text_for_generation(
-                text, phrase_idx, total_phrases, paragraph_id
-            )
+            hints = self._get_prosody_hints(text, phrase_idx, total_phrases, paragraph_id)
 
             if hints['apply_modifications']:
                 self.prosody_stats['hints_applied'] += 1
@@ -293,6 +794,11 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                 if hints.get('speed'):
                     self.speed = (hints['speed'] / 145.0) * 0.95  # Mantener tu factor base
 
+                if self.bucket_sampling_params:
+                    self.nfe_steps, self.sway_sampling_coef, self.speed = snap_sampling_params(
+                        self.nfe_steps, self.sway_sampling_coef, self.speed
+                    )
+
                 msg = f"🎯 Frase {phrase_idx + 1}: Aplicando hints prosódicos"
                 if paragraph_id is not None:
                     msg += f" (Párrafo {paragraph_id + 1})"
@@ -305,15 +811,15 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                 try:
                     engine_text = self._prepare_text_for_engine(text_to_generate)
                     # PROACTIVO: evitar bucles internos del motor con preguntas largas
-                    if self._is_risky_text_for_engine(engine_text):
+                    reason = self._risk_scan(engine_text)
+                    if reason:
                         if log_callback:
-                            reason = self._risky_reason(engine_text)
                             preview = engine_text[:120]
                             log_callback(f"⚠️ Texto arriesgado para motor: {reason} | len={len(engine_text)} | '{preview}...'")
                         audio = self._engine_generate_in_parts(engine_text, phrase_idx, log_callback)
                     else:
                         try:
-                            audio = self.generate_single_phrase_with_validation(engine_text, phrase_idx)
+                            audio = self._infer_optimized(engine_text, phrase_idx)
                         except BaseException as e_primary:
                             # Si el motor quiere terminar (SystemExit), intentamos fallbacks antes de respetarlo
                             if log_callback:
@@ -321,7 +827,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                             # Reintento con saneado agresivo
                             safe_text = self._prepare_text_for_engine(engine_text, aggressive=True)
                             try:
-                                audio = self.generate_single_phrase_with_validation(safe_text, phrase_idx)
+                                audio = self._infer_optimized(safe_text, phrase_idx)
                             except BaseException as e_secondary:
                                 # Fallback: dividir en partes y concatenar
                                 if log_callback:
@@ -334,8 +840,8 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                     self.cfg_strength = original_cfg
                     self.speed = original_speed
 
-                    # Limpiar memoria después de la generación si usa CUDA
-                    if self.device == "cuda":
+                    # Limpiar memoria después de la generación (solo depuración)
+                    if self.empty_cache_per_phrase and self.device == "cuda":
                         torch.cuda.empty_cache()
 
                 return audio
@@ -343,21 +849,21 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                 # Posición no crítica, usar generación normal
                 engine_text = self._prepare_text_for_engine(text)
                 # PROACTIVO: evitar bucles con preguntas largas
-                if self._is_risky_text_for_engine(engine_text):
+                reason = self._risk_scan(engine_text)
+                if reason:
                     if log_callback:
-                        reason = self._risky_reason(engine_text)
                         preview = engine_text[:120]
                         log_callback(f"⚠️ Texto arriesgado para motor: {reason} | len={len(engine_text)} | '{preview}...'")
                     return self._engine_generate_in_parts(engine_text, phrase_idx, log_callback)
                 try:
-                    return self.generate_single_phrase_with_validation(engine_text, phrase_idx)
+                    return self._infer_optimized(engine_text, phrase_idx)
                 except BaseException as e_primary:
                     # Reintento con texto aún más neutro si el motor falla
                     safe_text = self._prepare_text_for_engine(engine_text, aggressive=True)
                     if log_callback:
                         log_callback(f"🔁 Reintentando con texto saneado: '{safe_text[:60]}...' ({e_primary})")
                     try:
-                        return self.generate_single_phrase_with_validation(safe_text, phrase_idx)
+                        return self._infer_optimized(safe_text, phrase_idx)
                     except BaseException as e_secondary:
                         # Fallback: dividir en partes y concatenar
                         if log_callback:
@@ -365,12 +871,222 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                         return self._engine_generate_in_parts(engine_text, phrase_idx, log_callback)
         else:
             # Sin prosodia, usar tu función original tal como es
-            return self.generate_single_phrase_with_validation(text, phrase_idx)
+            return self._infer_optimized(text, phrase_idx)
+
+    def _prefetch_phrase(self, text, phrase_idx, total_phrases, paragraph_id=None):
+        """
+        Calcula de antemano (en segundo plano) los hints, el texto saneado y la
+        heurística de riesgo de una frase; generate_single_phrase_with_prosody
+        los encuentra luego en _hint_cache y en las cachés lru del módulo.
+        """
+        try:
+            if not self.enable_prosody_hints:
+                return
+            hints = self._get_prosody_hints(text, phrase_idx, total_phrases, paragraph_id)
+            engine_text = self._prepare_text_for_engine(hints['text'] if hints['apply_modifications'] else text)
+            self._risk_scan(engine_text)
+        except Exception as e:
+            # La ruta normal volverá a calcularlo y mostrará el error si persiste
+            print(f"⚠️ Preparación anticipada de la frase {phrase_idx + 1} falló: {e}")
+
+    def _get_prosody_hints(self, text, phrase_idx, total_phrases, paragraph_id=None):
+        """Hints prosódicos de una frase, calculados una sola vez por (frase, párrafo, total, texto)"""
+        key = (self._hint_doc_key, phrase_idx, paragraph_id, total_phrases, text)
+        hints = self._hint_cache.get(key)
+        if hints is None:
+            hints = self.prosody_hint_gen.prepare_text_for_generation(
+                text, phrase_idx, total_phrases, paragraph_id
+            )
+            self._hint_cache.put(key, hints)
+        return hints
+
+    def generate_phrases_batched(self, texts, phrase_indices, total_phrases, paragraph_ids=None,
+                                 log_callback=None, should_continue=None):
+        """
+        Genera varias frases en pasadas por lotes del CFM de F5.
+
+        Cada frase recibe los mismos hints y ajustes que en generate_single_phrase_with_prosody
+        (incluido el ajuste de frases cortas de generate_single_phrase_with_validation). Las
+        frases se agrupan por (nfe, sway, cfg) y por tramo de longitud de texto, de modo que
+        cada lote comparte parámetros de muestreo y apenas lleva relleno. Las frases
+        arriesgadas para el motor, las más largas que el max_chars con el que F5TTS.infer
+        trocea (la pasada por lotes no trocea), las que no pasan la validación
+        anti-truncamiento y las de un lote que falla pasan por la ruta individual con sus
+        reintentos. Sin transcripción de la referencia todo va por la ruta individual.
+        Si should_continue() devuelve False se deja de generar (el resto queda en None).
+        El progreso se notifica a log_callback tras cada lote y cada frase individual.
+
+        Returns:
+            list: Audio de cada frase (None si falló también por la ruta individual)
+        """
+        self.ensure_model_loaded()
+        if paragraph_ids is None:
+            paragraph_ids = [None] * len(texts)
+        phrase_indices = list(phrase_indices)
+
+        results = [None] * len(texts)
+        done = 0       # frases ya generadas (para el progreso)
+        single = []    # posiciones que van por la ruta individual
+        groups = {}    # (nfe, sway, cfg, tramo de longitud) -> [(posición, texto, speed, aplica hints)]
+
+        # Sin texto de referencia la estimación de duración se dispara: ruta individual
+        use_batches = self.batch_size > 1
+        if use_batches:
+            try:
+                use_batches = bool(self._batch_reference_conditioning()[1].strip())
+            except Exception as e:
+                if log_callback:
+                    log_callback(f"⚠️ Referencia no disponible para lotes ({e}); generando individualmente")
+                use_batches = False
+
+        for pos, (text, phrase_idx, paragraph_id) in enumerate(zip(texts, phrase_indices, paragraph_ids)):
+            if not use_batches:
+                single.append(pos)
+                continue
+
+            nfe, sway, cfg, speed = self.nfe_steps, self.sway_sampling_coef, self.cfg_strength, self.speed
+            text_to_generate = text
+            modified = False
+            if self.enable_prosody_hints:
+                hints = self._get_prosody_hints(text, phrase_idx, total_phrases, paragraph_id)
+                if hints['apply_modifications']:
+                    modified = True
+                    text_to_generate = hints['text']
+                    extra = hints.get('extra_params', {})
+                    nfe += extra.get('nfe_adjustment', 0)
+                    sway += extra.get('sway_adjustment', 0)
+                    cfg += extra.get('cfg_adjustment', 0)
+                    if hints.get('speed'):
+                        speed = (hints['speed'] / 145.0) * 0.95
+                    if self.bucket_sampling_params:
+                        nfe, sway, speed = snap_sampling_params(nfe, sway, speed)
+                text_to_generate = self._prepare_text_for_engine(text_to_generate)
+                if self._is_risky_text_for_engine(text_to_generate):
+                    single.append(pos)
+                    continue
+
+            gen_text = self._clean_text_simple(text_to_generate)
+            if len(_RE_WORD.findall(gen_text)) < 7 or len(gen_text) < 35:
+                # Mismos parámetros estables que la ruta individual para frases cortas
+                nfe, sway, speed = 28, -0.3, 0.95
+
+            # F5TTS.infer trocearía esta frase: que lo haga la ruta individual
+            if len(gen_text.encode('utf-8')) > self._batch_max_chars(speed):
+                single.append(pos)
+                continue
+
+            bucket = int(np.digitize(len(gen_text), self._batch_length_bins))
+            groups.setdefault((nfe, sway, cfg, bucket), []).append((pos, gen_text, speed, modified))
+
+        for (nfe, sway, cfg, _), items in groups.items():
+            items.sort(key=lambda item: len(item[1]))
+            for b in range(0, len(items), self.batch_size):
+                if should_continue is not None and not should_continue():
+                    return results
+                batch = items[b:b + self.batch_size]
+                if len(batch) == 1:
+                    single.append(batch[0][0])
+                    continue
+                if log_callback:
+                    first = phrase_indices[batch[0][0]] + 1
+                    log_callback(f"📦 Lote de {len(batch)} frases (desde la {first}, nfe={nfe})")
+                try:
+                    wavs = self._infer_engine_batch([item[1] for item in batch], [item[2] for item in batch], nfe, sway, cfg)
+                except Exception as e:
+                    if log_callback:
+                        log_callback(f"⚠️ Lote de {len(batch)} frases falló ({e}); generando individualmente")
+                    single.extend(item[0] for item in batch)
+                    continue
+
+                for (pos, gen_text, _, modified), wav in zip(batch, wavs):
+                    is_valid, _ = self.validate_audio_anti_truncation(wav, gen_text)
+                    if not is_valid:
+                        single.append(pos)
+                        continue
+                    peak = np.max(np.abs(wav))
+                    if peak > 0:
+                        wav = wav / peak * 0.9
+                    sf.write(self.output_dir / f"frase_{phrase_indices[pos] + 1:02d}.wav", wav, self.sample_rate)
+                    results[pos] = wav
+                    done += 1
+                    if modified:
+                        self.prosody_stats['hints_applied'] += 1
+
+                if log_callback:
+                    log_callback(f"✅ Progreso: {done}/{len(texts)} frases generadas")
+
+        for pos in sorted(single):
+            if should_continue is not None and not should_continue():
+                break
+            if log_callback:
+                log_callback(f"Procesando frase {phrase_indices[pos] + 1}/{total_phrases} "
+                             f"(individual; {done}/{len(texts)} generadas)")
+            try:
+                results[pos] = self.generate_single_phrase_with_prosody(
+                    texts[pos], phrase_indices[pos], total_phrases, paragraph_ids[pos], log_callback
+                )
+                if results[pos] is not None:
+                    done += 1
+            except Exception as e:
+                error_msg = f"❌ Error en frase {phrase_indices[pos] + 1}: {e}"
+                if log_callback:
+                    log_callback(error_msg)
+                print(f"    {error_msg}")
+
+        if self.empty_cache_per_phrase and self.device == "cuda":
+            torch.cuda.empty_cache()
+
+        return results
+
+    def _batch_reference_conditioning(self):
+        """
+        Audio de referencia preprocesado (recorte, transcripción, RMS, 24 kHz) en el
+        dispositivo para las pasadas por lotes. Se calcula una sola vez por generador.
+        """
+        if self._ref_cond is None:
+            ref_file, ref_text = self._engine_reference()
+            self._ref_cond = load_reference_conditioning(self.f5tts, ref_file, ref_text)
+        return self._ref_cond
+
+    def _batch_max_chars(self, speed: float) -> int:
+        """Bytes de texto que F5 genera de una pasada (ver f5_batch_max_chars)"""
+        return f5_batch_max_chars(self.f5tts, self._batch_reference_conditioning(), speed)
+
+    def _infer_engine_batch(self, gen_texts, speeds, nfe_step, sway_sampling_coef, cfg_strength):
+        """Una pasada del CFM de F5 para varias frases (ver infer_f5_batch)"""
+        if self.device == "cuda" and os.environ.get('F5_AUTOCAST', '1') == '1':
+            self._enable_fp16_transformer()
+
+        return infer_f5_batch(self.f5tts, self._batch_reference_conditioning(),
+                              gen_texts, speeds, nfe_step, sway_sampling_coef, cfg_strength)
+
+    @staticmethod
+    def _compute_critical_mask(frases) -> np.ndarray:
+        """
+        Máscara booleana de posiciones críticas de todas las frases a la vez
+        (mismos criterios que is_critical_position)
+        """
+        n = len(frases)
+        mask = np.zeros(n, dtype=bool)
+        mask[:2] = True                 # Establecer tono
+        mask[max(n - 2, 0):] = True     # Cadencia final
+        mask[10::10] = True             # Posibles límites de párrafo
+        mask |= np.fromiter(
+            ('?' in t or '!' in t or (len(t) > 150 and t.strip().endswith('.')) for t in frases),
+            dtype=bool, count=n
+        )
+        return mask
 
     def is_critical_position(self, phrase_idx: int, total_phrases: int, text: str) -> bool:
         """
         Determina si es una posición crítica que necesita hints prosódicos
         """
+        # Lectura directa de la máscara precalculada para self.frases
+        mask = getattr(self, '_critical_mask', None)
+        if (mask is not None and len(mask) == total_phrases and 0 <= phrase_idx < total_phrases
+                and self.frases[phrase_idx] == text):
+            return bool(mask[phrase_idx])
+
         # Primeras 2 frases (establecer tono)
         if phrase_idx < 2:
             return True
@@ -397,68 +1113,44 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
         return False
 
-    def _prepare_text_for_engine(self, text: str, aggressive: bool = False) -> str:
+    def _infer_optimized(self, text: str, phrase_idx: int):
         """
-        Sanea el texto para el motor F5-TTS evitando puntuaciones que pueden provocar errores internos.
-        - Elimina signos invertidos iniciales ('¿', '¡') pero preserva '?'/'!' finales.
-        - Sustituye comas/';'/' :' finales por punto.
-        - Colapsa múltiples signos.
-        - En modo agresivo, elimina comillas y guiones y fuerza punto final.
+        generate_single_phrase_with_validation sin registro de autograd y, en CUDA,
+        con el DiT bajo autocast FP16 (la inferencia del DiT está limitada por ancho
+        de banda de memoria). Se desactiva con F5_AUTOCAST=0.
         """
-        import re
-
-        s = (text or "").strip()
-
-        # Normalizar ellipsis y variantes (… o ... -> .)
-        s = s.replace('\u2026', '...')
-        s = re.sub(r'\.{3,}', '.', s)
-
-        # Correcciones típicas que desestabilizan el motor (solo para engine)
-        replacements = {
-            r"\bke\b": "que",
-            r"\bk\b": "que",
-            r"\beyos\b": "ellos",
-            r"\bexijen\b": "exigen",
-            r"\bnibel\b": "nivel",
-            r"\bbida\b": "vida",
-            r"\bboomer\b": "persona mayor",
-        }
-        for pattern, repl in replacements.items():
-            s = re.sub(pattern, repl, s, flags=re.IGNORECASE)
-
-        # Eliminar signos invertidos de apertura; mantener '?/!' finales para entonación
-        s = re.sub(r'^[¡¿]+', '', s)
-
-        # Quitar guion/raya inicial con espacios
-        s = re.sub(r'^[\-–—]\s*', '', s)
-
-        # Reemplazar puntuación final problemática por punto
-        s = re.sub(r'[:,;]+\s*$', '.', s)
-
-        # Colapsar repeticiones de signos
-        s = re.sub(r'([.!?])\1{1,}', r'\1', s)
+        if self.device == "cuda" and os.environ.get('F5_AUTOCAST', '1') == '1':
+            self._enable_fp16_transformer()
+        with torch.inference_mode():
+            return self.generate_single_phrase_with_validation(text, phrase_idx)
 
-        # Evitar frases que terminen en coma
-        s = re.sub(r',\s*$', '.', s)
+    def _enable_fp16_transformer(self):
+        """Envuelve una sola vez el forward del DiT en autocast FP16 (ODE y vocoder en FP32)"""
+        try:
+            transformer = self.f5tts.ema_model.transformer
+            if getattr(transformer, '_autocast_dtype', None) is not None:
+                return  # Ya envuelto (también por el adaptador BF16 de main_app)
+            if next(transformer.parameters()).dtype != torch.float32:
+                return  # F5 ya cargó los pesos en media precisión
 
-        # Completar cláusulas que terminan en preposición o 'que'
-        if re.search(r'(\b(que|a|de|para|por|con|sin|sobre|hasta|entre|según|tras))\.$', s, re.IGNORECASE):
-            s = re.sub(r'\.$', ' hacerlo.', s)
+            forward = transformer.forward
 
-        if aggressive:
-            # Retirar comillas, dobles y tipográficas
-            s = re.sub(r'["“”]', '', s)
-            # Retirar guiones/rayas en medio sueltos
-            s = re.sub(r'\s[\-–—]\s', ' ', s)
-            # Forzar punto final si no hay puntuación
-            if not s.endswith(('.', '!', '?')):
-                s = s.rstrip() + '.'
+            def _forward_fp16(*args, **kwargs):
+                with torch.autocast(device_type='cuda', dtype=torch.float16):
+                    return forward(*args, **kwargs).float()
 
-        # Asegurar que no quede vacío
-        if not s.strip():
-            s = '...'
+            transformer.forward = _forward_fp16
+            transformer._autocast_dtype = torch.float16
+            print("⚡ DiT en FP16 (autocast CUDA)")
+        except Exception as e:
+            print(f"⚠️ No se pudo activar FP16: {e}")
 
-        return s.strip()
+    def _prepare_text_for_engine(self, text: str, aggressive: bool = False) -> str:
+        """
+        Sanea el texto para el motor F5-TTS (ver _sanitize_engine_text).
+        Memoizado: los reintentos y la generación por partes repiten las mismas cadenas.
+        """
+        return _sanitize_engine_text(text, aggressive)
 
     def _engine_generate_in_parts(self, text: str, phrase_idx: int, log_callback=None):
         """
@@ -468,7 +1160,8 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
         if log_callback:
             log_callback(f"✂️ División en {len(parts)} partes (chars/words): " + 
                          ", ".join([f"{len(p)}c/{len((p or '').split())}w" for p in parts]))
-        audio_segments = []
+        # Un hueco por parte: cada rama de fallback escribe en el suyo
+        results = [None] * len(parts)
         strict_err = False
         for i, p in enumerate(parts):
             try:
@@ -476,40 +1169,39 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                 p_prepared = self._prepare_text_for_engine(p)
                 if log_callback and p_prepared != p:
                     log_callback(f"   ↪️ Parte {i+1}: saneada '{p_prepared[:80]}...'")
-                seg = self.generate_single_phrase_with_validation(p_prepared, phrase_idx)
+                seg = self._infer_optimized(p_prepared, phrase_idx)
                 if seg is not None and len(seg) > 0:
-                    audio_segments.append(seg)
+                    results[i] = seg
                     continue
                 # Reintento agresivo por parte
                 p_safe = self._prepare_text_for_engine(p_prepared, aggressive=True)
                 if log_callback:
                     log_callback(f"   🔁 Parte {i+1}: agresivo '{p_safe[:80]}...'")
-                seg = self.generate_single_phrase_with_validation(p_safe, phrase_idx)
+                seg = self._infer_optimized(p_safe, phrase_idx)
                 if seg is not None and len(seg) > 0:
-                    audio_segments.append(seg)
+                    results[i] = seg
                     continue
                 # Reintentos con parámetros muy seguros
                 if log_callback:
                     log_callback(f"   🛡️ Parte {i+1}: intentando con parámetros seguros (preset A)")
                 seg = self._generate_with_safe_params(p_prepared, phrase_idx, log_callback, preset='safe1')
                 if seg is not None and len(seg) > 0:
-                    audio_segments.append(seg)
+                    results[i] = seg
                     continue
                 if log_callback:
                     log_callback(f"   🛡️ Parte {i+1}: intentando con parámetros extra conservadores (preset B)")
                 seg = self._generate_with_safe_params(p_prepared, phrase_idx, log_callback, preset='safe2')
                 if seg is not None and len(seg) > 0:
-                    audio_segments.append(seg)
+                    results[i] = seg
                     continue
                 # Completar cláusula si termina en preposición/'que' y reintentar
-                import re as _re
-                if _re.search(r'(\b(que|a|de|para|por|con|sin|sobre|hasta|entre|según|tras))\.$', p_prepared, _re.IGNORECASE):
-                    p_completed = _re.sub(r'\.$', ' hacerlo.', p_prepared)
+                if _RE_DANGLING_END.search(p_prepared):
+                    p_completed = _RE_FINAL_DOT.sub(' hacerlo.', p_prepared)
                     if log_callback:
                         log_callback(f"   🧩 Parte {i+1}: completando cláusula → '{p_completed[:80]}...'")
                     seg = self._generate_with_safe_params(p_completed, phrase_idx, log_callback, preset='safe2')
                     if seg is not None and len(seg) > 0:
-                        audio_segments.append(seg)
+                        results[i] = seg
                         continue
                 # Último recurso: intentar en CPU con preset conservador
                 if self.device == 'cuda':
@@ -518,7 +1210,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                             log_callback(f"   🧪 Parte {i+1}: intento en CPU con preset conservador")
                         seg = self._generate_on_cpu_with_safe_params(p_prepared, phrase_idx, log_callback)
                         if seg is not None and len(seg) > 0:
-                            audio_segments.append(seg)
+                            results[i] = seg
                             continue
                     except BaseException as e_cpu:
                         if isinstance(e_cpu, SystemExit) or 't must be strictly increasing or decreasing' in str(e_cpu):
@@ -533,7 +1225,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                         log_callback(f"   🧷 Parte {i+1}: generando con prefijo/sufijo neutro y recortando núcleo")
                     seg = self._generate_padded_and_trim(p_prepared, phrase_idx, log_callback)
                     if seg is not None and len(seg) > 0:
-                        audio_segments.append(seg)
+                        results[i] = seg
                         continue
                 except BaseException as e_pad:
                     if isinstance(e_pad, SystemExit) or 't must be strictly increasing or decreasing' in str(e_pad):
@@ -548,6 +1240,11 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                     log_callback(f"❌ Parte {i+1}/{len(parts)} falló: {e}")
                 continue
 
+        audio_segments = [seg for seg in results if seg is not None]
+        if log_callback and len(audio_segments) < len(parts):
+            failed = [str(i + 1) for i, seg in enumerate(results) if seg is None]
+            log_callback(f"⚠️ Partes sin audio: {', '.join(failed)}/{len(parts)}")
+
         # Si no conseguimos nada y solo era 1 parte, intentar micro-división por palabras
         if not audio_segments and len(parts) == 1:
             words = (parts[0] or '').split()
@@ -578,16 +1275,14 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             if log_callback:
                 log_callback("🛑 Todos los fallbacks han fallado. Guardando estado y deteniendo ejecución…")
             try:
-                import json
-                from pathlib import Path as _Path
                 resume_state = {
                     'context': 'prosody_enhanced_generator',
                     'phrase_idx': phrase_idx,
-                    'reference_file': str(self.reference_file) if hasattr(self, 'reference_file') else '',
+                    'reference_file': self._reference_file_str,
                     'session_dir': str(self.output_dir) if hasattr(self, 'output_dir') else '',
                     'device': self.device,
                 }
-                _Path('resume_state.json').write_text(json.dumps(resume_state, indent=2), encoding='utf-8')
+                Path('resume_state.json').write_text(json.dumps(resume_state, indent=2), encoding='utf-8')
             except Exception:
                 pass
             self._shutdown_gpu(log_callback)
@@ -603,135 +1298,101 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
     def _split_text_for_engine(self, text: str, max_words: int = 12) -> list:
         """
-        Divide el texto en 2-3 partes buscando comas o el centro.
-        Asegura puntuación final en la parte inicial y conserva '?'/'!' en la final.
+        Divide el texto en partes de hasta max_words palabras en una sola pasada.
+        Corta preferentemente tras una coma o antes de un conector, nunca deja una
+        parte terminada en preposición/'que' y evita una última parte de menos de
+        3 palabras. Las partes intermedias terminan en punto; la final conserva su
+        puntuación ('?'/'!').
         """
-        import re
         s = (text or '').strip()
+        words = s.split()
+        n = len(words)
         # Si está por debajo del umbral de palabras, devolver tal cual
-        if len(s.split()) <= max_words:
+        if n <= max_words:
             return [s]
 
-        def _avoid_bad_endings(left: str, right: str) -> tuple:
-            bad_tokens = {"que","a","de","para","por","con","sin","sobre","hasta","entre","según","tras"}
-            left_tokens = (left.rstrip('.,!?') or '').split()
-            if left_tokens:
-                last = left_tokens[-1].lower()
-                if last in bad_tokens and right:
-                    r_words = right.split()
-                    # mover una palabra (o dos si es muy corta) al left
-                    take = 2 if len(r_words) > 4 else 1
-                    moved = ' '.join(r_words[:take])
-                    right = ' '.join(r_words[take:])
-                    left = left.rstrip('.,!?') + ' ' + moved
-                    if not left.endswith(('.', '!', '?')):
-                        left += '.'
-            return left.strip(), right.strip()
-
-        # Intentar dividir por coma cercana al centro
-        commas = [m.start() for m in re.finditer(r',', s)]
-        target = len(s) // 2
-        if commas:
-            split_pos = min(commas, key=lambda x: abs(x - target))
-            left = s[:split_pos+1].strip()
-            right = s[split_pos+1:].strip()
-            # Asegurar puntuación
-            if not left.endswith(('.', '!', '?')):
-                left = left.rstrip(',') + '.'
-            left, right = _avoid_bad_endings(left, right)
-            # Evitar right demasiado corto
-            if len(right.split()) < 3:
-                return [s]
-            # Asegurar que cada parte no exceda max_words
-            final = []
-            for part in [left, right]:
-                if len(part.split()) > max_words:
-                    final.extend(self._split_text_for_engine(part, max_words))
-                else:
-                    final.append(part)
-            return final
-        # Intentar dividir por conectores
-        connector = re.search(r'\s(y|pero|porque|aunque|entonces|así que|o)\s', s)
-        if connector:
-            pos = connector.start(0) + 1
-            left = s[:pos].strip()
-            right = s[pos:].strip()
+        # Cortes preferidos: cut = i significa partir antes de la palabra i
+        preferred = [False] * (n + 1)
+        for i in range(1, n):
+            nxt = words[i].lower()
+            if (words[i - 1].endswith(',')
+                    or nxt in _ENGINE_CONNECTORS
+                    or (nxt == 'así' and i + 1 < n and words[i + 1].lower() == 'que')):
+                preferred[i] = True
+
+        def _bad_ending(cut: int) -> bool:
+            return words[cut - 1].rstrip('.,;:!?').lower() in _ENGINE_BAD_TOKENS
+
+        parts = []
+        start = 0
+        while n - start > max_words:
+            # La última parte debe conservar al menos 3 palabras
+            limit = min(start + max_words, n - 3)
+            lowest = start + 3 if limit - start >= 3 else start + 1
+            cut = 0
+            for c in range(limit, lowest - 1, -1):
+                if preferred[c] and not _bad_ending(c):
+                    cut = c
+                    break
+            if not cut:
+                cut = limit
+                while cut > start + 1 and _bad_ending(cut):
+                    cut -= 1
+            if cut <= start:
+                break
+
+            left = ' '.join(words[start:cut]).rstrip(',;:')
             if not left.endswith(('.', '!', '?')):
                 left += '.'
-            left, right = _avoid_bad_endings(left, right)
-            if len(right.split()) < 3:
-                return [s]
-            final = []
-            for part in [left, right]:
-                if len(part.split()) > max_words:
-                    final.extend(self._split_text_for_engine(part, max_words))
-                else:
-                    final.append(part)
-            return final
-        # Último recurso: dividir por espacio en el medio
-        words = s.split()
-        mid = len(words) // 2
-        left = ' '.join(words[:mid]).strip()
-        right = ' '.join(words[mid:]).strip()
-        if not left.endswith(('.', '!', '?')):
-            left += '.'
-        left, right = _avoid_bad_endings(left, right)
-        if len(right.split()) < 3:
-            return [s]
-        final = []
-        for part in [left, right]:
-            if len(part.split()) > max_words:
-                final.extend(self._split_text_for_engine(part, max_words))
-            else:
-                final.append(part)
-        return final
+            parts.append(left)
+            start = cut
+
+        parts.append(' '.join(words[start:]))
+        return parts
+
+    def _risk_scan(self, s: str) -> Optional[str]:
+        """
+        Motivos por los que el texto es arriesgado para el motor o None (ver _risk_scan_text).
+        Memoizado: cada frase se clasifica desde varias rutas y reintentos.
+        """
+        return _risk_scan_text(s or '')
 
     def _is_risky_text_for_engine(self, s: str) -> bool:
         """Heurística para detectar textos que disparan bucles/errores en el motor."""
-        s_clean = (s or '').strip()
-        if len(s_clean) == 0:
-            return True
-        # Preguntas largas o con múltiples cláusulas sin coma
-        if s_clean.endswith('?') and len(s_clean) > 90:
-            return True
-        # Exceso de signos seguidos
-        if '??' in s_clean or '!!' in s_clean:
-            return True
-        # Mucha puntuación o símbolos especiales
-        bad_chars = [';', ':', '—', '–']
-        if any(c in s_clean for c in bad_chars) and len(s_clean) > 80:
-            return True
-        return False
-
-    def _risky_reason(self, s: str) -> str:
-        s_clean = (s or '').strip()
-        if len(s_clean) == 0:
-            return 'vacío'
-        reasons = []
-        if s_clean.endswith('?') and len(s_clean) > 90:
-            reasons.append('pregunta larga')
-        if '??' in s_clean or '!!' in s_clean:
-            reasons.append('signos repetidos')
-        if any(c in s_clean for c in [';', ':', '—', '–']) and len(s_clean) > 80:
-            reasons.append('puntuación pesada')
-        return ', '.join(reasons) or 'heurística general'
+        return self._risk_scan(s) is not None
 
     def _shutdown_gpu(self, log_callback=None):
-        """Libera memoria GPU (sin reset para no afectar GPU primaria)."""
+        """
+        Libera memoria GPU (sin reset para no afectar GPU primaria).
+        empty_cache no puede liberar tensores vivos: primero se sueltan las
+        referencias al modelo (propia y compartida) y se recolectan los ciclos.
+        """
+        # Conservar los hints calculados antes de un posible SystemExit
+        self._hint_cache.save()
         try:
             if self.device == 'cuda':
                 if log_callback:
                     log_callback('🔻 Liberando memoria GPU (sin reset)…')
-                torch.cuda.empty_cache()
-                torch.cuda.synchronize()
-                torch.cuda.ipc_collect()
+                self.f5tts = None
+                self._ref_cond = None
+                release_shared_f5tts("F5-TTS", self.device, self.model_path)
+                gc.collect()
+                # Con expandable_segments los bloques libres se reutilizan sin
+                # fragmentar: solo se devuelve la caché si retiene más de 1 GB
+                with torch.cuda.device(0):
+                    if torch.cuda.memory_reserved() - torch.cuda.memory_allocated() > 1 << 30:
+                        torch.cuda.empty_cache()
         except Exception as e:
             if log_callback:
                 log_callback(f'⚠️ No se pudo liberar memoria GPU: {e}')
 
-    def generate_all_phrases_with_prosody(self, enable_postprocessing=False, log_callback=None):
+    def generate_all_phrases_with_prosody(self, enable_postprocessing=False, log_callback=None,
+                                          should_continue=None):
         """
         Versión mejorada de tu generate_all_phrases que añade arquitectura prosódica
+
+        should_continue: callable opcional; si devuelve False (p. ej. el usuario pulsó
+        detener) el bucle de frases se corta y se devuelve lo generado hasta entonces
         """
 
         if log_callback:
@@ -748,10 +1409,8 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
         print(f"📚 Estructura detectada: {len(paragraph_boundaries)} párrafos")
 
         # Contar posiciones críticas
-        critical_count = 0
-        for i, frase in enumerate(self.frases):
-            if self.is_critical_position(i, total_phrases, frase):
-                critical_count += 1
+        self._critical_mask = self._compute_critical_mask(self.frases)
+        critical_count = int(self._critical_mask.sum())
 
         self.prosody_stats['critical_positions'] = critical_count
 
@@ -762,56 +1421,96 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
         # FASE 1: Generación con hints prosódicos
         print(f"\n📝 FASE 1: Generación con hints prosódicos")
 
-        generated_audios = []
+        # Índices y audios de las frases generadas, en paralelo
+        phrase_indices = array('i')
+        audio_list = []
         start_time = time.time()
 
-        for i, frase in enumerate(self.frases):
-            if log_callback:
-                log_callback(f"Procesando frase {i+1}/{total_phrases}")
+        # Párrafo de cada frase (calculado una vez para todo el bucle)
+        paragraph_ids = [self.get_paragraph_id(i, paragraph_boundaries) for i in range(total_phrases)]
 
-            # Determinar párrafo actual
-            paragraph_id = self.get_paragraph_id(i, paragraph_boundaries)
+        # Con F5_BATCH_SIZE > 1 las frases se generan por lotes de antemano
+        batched_audios = None
+        if self.batch_size > 1:
+            batched_audios = self.generate_phrases_batched(
+                self.frases, range(total_phrases), total_phrases, paragraph_ids, log_callback,
+                should_continue
+            )
 
-            try:
-                # Usar versión con prosodia
-                audio = self.generate_single_phrase_with_prosody(
-                    frase, i, total_phrases, paragraph_id, log_callback
+        # Mientras la GPU genera la frase i, un hilo prepara la i+1 (hints,
+        # saneado y heurística de riesgo quedan en sus cachés)
+        with ThreadPoolExecutor(max_workers=1) as prefetch_pool:
+            prefetch = None
+            if batched_audios is None and total_phrases:
+                prefetch = prefetch_pool.submit(
+                    self._prefetch_phrase, self.frases[0], 0, total_phrases, paragraph_ids[0]
                 )
 
-                if audio is not None and len(audio) > 0:
-                    generated_audios.append((i, audio))
-                    if log_callback:
-                        log_callback(f"✅ Frase {i+1} generada exitosamente")
-                else:
+            for i, frase in enumerate(self.frases):
+                if should_continue is not None and not should_continue():
                     if log_callback:
-                        log_callback(f"❌ Frase {i+1} falló en generación")
+                        log_callback(f"⏹️ Generación detenida en la frase {i+1}/{total_phrases}")
+                    break
 
-            except Exception as e:
-                error_msg = f"❌ Error en frase {i+1}: {e}"
-                if log_callback:
-                    log_callback(error_msg)
-                print(f"    {error_msg}")
+                # Con lotes el progreso ya se notificó durante la generación
+                if log_callback and batched_audios is None:
+                    log_callback(f"Procesando frase {i+1}/{total_phrases}")
+
+                # Determinar párrafo actual
+                paragraph_id = paragraph_ids[i]
+
+                try:
+                    # Usar versión con prosodia
+                    if batched_audios is not None:
+                        audio = batched_audios[i]
+                    else:
+                        prefetch.result()
+                        if i + 1 < total_phrases:
+                            prefetch = prefetch_pool.submit(
+                                self._prefetch_phrase, self.frases[i + 1], i + 1, total_phrases, paragraph_ids[i + 1]
+                            )
+                        audio = self.generate_single_phrase_with_prosody(
+                            frase, i, total_phrases, paragraph_id, log_callback
+                        )
+
+                    if audio is not None and len(audio) > 0:
+                        phrase_indices.append(i)
+                        audio_list.append(audio)
+                        if log_callback:
+                            log_callback(f"✅ Frase {i+1} generada exitosamente")
+                    else:
+                        if log_callback:
+                            log_callback(f"❌ Frase {i+1} falló en generación")
+
+                except Exception as e:
+                    error_msg = f"❌ Error en frase {i+1}: {e}"
+                    if log_callback:
+                        log_callback(error_msg)
+                    print(f"    {error_msg}")
 
         generation_time = time.time() - start_time
 
         if log_callback:
-            log_callback(f"✅ Fase 1 completada: {len(generated_audios)} frases generadas")
+            log_callback(f"✅ Fase 1 completada: {len(audio_list)} frases generadas")
             log_callback(f"📊 Hints aplicados: {self.prosody_stats['hints_applied']}/{total_phrases}")
 
+        # Persistir los hints para relanzamientos de la sesión
+        self._hint_cache.save()
+
         print(f"\n✅ Fase 1 completada:")
-        print(f"   Frases generadas: {len(generated_audios)}/{total_phrases}")
+        print(f"   Frases generadas: {len(audio_list)}/{total_phrases}")
         print(f"   Hints prosódicos aplicados: {self.prosody_stats['hints_applied']}")
         print(f"   Tiempo de generación: {generation_time:.1f}s")
 
         # FASE 2: Post-procesamiento (opcional)
-        if enable_postprocessing and len(generated_audios) > 0:
+        if enable_postprocessing and len(audio_list) > 0:
             if log_callback:
                 log_callback("\n🔧 FASE 2: Post-procesamiento prosódico")
             print(f"\n🔧 FASE 2: Post-procesamiento prosódico")
 
-            # Extraer audios y textos
-            audio_segments = [audio for _, audio in generated_audios]
-            text_segments = [self.frases[idx] for idx, _ in generated_audios]
+            # Audios y textos (copia de la lista: audio_list recibe las correcciones)
+            audio_segments = list(audio_list)
+            text_segments = [self.frases[idx] for idx in phrase_indices]
 
             # Analizar prosodia
             if log_callback:
@@ -836,11 +1535,11 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
                     # Usar regenerador con tu modelo F5TTS
                     # Asegurar que el regenerador tenga acceso a la referencia de audio
-                    regenerator = SelectiveRegenerator(self.f5tts, max_fixes=5)
+                    regenerator = SelectiveRegenerator(self.f5tts, max_fixes=5, nfe_schedule=severity_nfe_schedule)
 
                     # Configurar regenerador con contexto de referencia
                     if hasattr(regenerator, 'set_reference_context'):
-                        regenerator.set_reference_context(str(self.reference_file), "")
+                        regenerator.set_reference_context(self._reference_file_str, "")
 
                     corrected_segments, fix_report = regenerator.fix_critical_problems(
                         problems, audio_segments, text_segments, severity_threshold=0.3
@@ -848,9 +1547,9 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
                     # Reemplazar segmentos originales por los corregidos
                     audio_segments = corrected_segments
-                    for i, corrected_audio in enumerate(corrected_segments):
-                        if i < len(generated_audios):
-                            generated_audios[i] = (generated_audios[i][0], corrected_audio)
+                    for i in fix_report['fixed_indices']:
+                        if i < len(audio_list):
+                            audio_list[i] = corrected_segments[i]
 
                     self.prosody_stats['problems_fixed'] = fix_report['successful']
 
@@ -858,7 +1557,11 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                         log_callback(f"✅ Problemas corregidos: {fix_report['successful']}/{fix_report['attempted']}")
                     print(f"   ✅ Corregidos: {fix_report['successful']}/{fix_report['attempted']}")
 
-        return generated_audios
+        self._audio_idx = phrase_indices
+        self._audio_list = audio_list
+
+        # Las GUIs esperan tuplas (índice, audio): se construyen solo aquí
+        return list(zip(phrase_indices, audio_list))
 
     def detect_paragraph_structure(self):
         """
@@ -877,15 +1580,16 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             if total > 6:
                 boundaries.extend([total // 3, 2 * total // 3])
 
-        return sorted(list(set(boundaries)))
+        return sorted(set(boundaries))
 
     def get_paragraph_id(self, phrase_idx: int, boundaries: list) -> int:
         """
         Determina el ID del párrafo para una frase dada
         """
-        for i in range(len(boundaries) - 1):
-            if boundaries[i] <= phrase_idx < boundaries[i + 1]:
-                return i
+        # Búsqueda binaria sobre los límites (ordenados por detect_paragraph_structure)
+        i = bisect.bisect_right(boundaries, phrase_idx) - 1
+        if 0 <= i < len(boundaries) - 1:
+            return i
         return min(2, len(boundaries) - 1)  # Máximo 3 párrafos
 
     def apply_crossfade_and_concatenate(self, audio_segments):
@@ -899,12 +1603,18 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             return np.array([])
 
         if len(audio_segments) == 1:
-            return audio_segments[0]
+            return np.asarray(audio_segments[0], dtype=np.float32)
 
         # Usar crossfade de 150ms por defecto
         crossfade_samples = int(0.15 * self.sample_rate)
 
-        result = audio_segments[0]
+        # Primera pasada: calcular dónde empieza cada segmento en la salida.
+        # Así se reserva el buffer una sola vez en lugar de re-concatenar todo
+        # el resultado acumulado por cada segmento (coste cuadrático).
+        starts = [0]
+        crossfaded = [False]
+        silences = [(0, 0)]  # (inicio, muestras) de silencio antes de cada segmento
+        cursor = len(audio_segments[0])
 
         for i in range(1, len(audio_segments)):
             current_segment = audio_segments[i]
@@ -912,37 +1622,47 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             # NUEVO: Detectar si necesitamos pausa entre párrafos
             pausa_extra = self._calcular_pausa_entre_segmentos(i, len(audio_segments))
 
-            # Añadir silencio si es necesario
-            if pausa_extra > 0:
-                silencio_samples = int(pausa_extra * self.sample_rate)
-                silencio = np.zeros(silencio_samples)
-                result = np.concatenate([result, silencio])
-
-            # Aplicar crossfade
-            if len(result) >= crossfade_samples and len(current_segment) >= crossfade_samples:
-                # Crear rampas de fade
-                fade_out = np.linspace(1.0, 0.0, crossfade_samples)
-                fade_in = np.linspace(0.0, 1.0, crossfade_samples)
-
-                # Aplicar fades
-                result_end = result[-crossfade_samples:] * fade_out
-                segment_start = current_segment[:crossfade_samples] * fade_in
-
-                # Mezclar la región de overlap
-                overlap = result_end + segment_start
-
-                # Concatenar
-                result = np.concatenate([
-                    result[:-crossfade_samples],
-                    overlap,
-                    current_segment[crossfade_samples:]
-                ])
-            else:
-                # Si los segmentos son muy cortos, concatenar directamente
-                result = np.concatenate([result, current_segment])
+            # Añadir silencio si es necesario (se pone a cero solo ese tramo)
+            pause_samples = int(pausa_extra * self.sample_rate) if pausa_extra > 0 else 0
+            silences.append((cursor, pause_samples))
+            cursor += pause_samples
+
+            # Crossfade solo si ambos lados tienen longitud suficiente;
+            # si los segmentos son muy cortos, concatenar directamente
+            use_crossfade = cursor >= crossfade_samples and len(current_segment) >= crossfade_samples
+            start = cursor - crossfade_samples if use_crossfade else cursor
+            starts.append(start)
+            crossfaded.append(use_crossfade)
+            cursor = start + len(current_segment)
+
+        # Segunda pasada: escribir cada segmento en su sitio. Los segmentos cubren
+        # toda la salida salvo las pausas, así que no hace falta inicializarla.
+        # Todo en float32: un segmento float64 no promociona la salida entera
+        # (la mezcla mueve la mitad de bytes)
+        result = np.empty(cursor, dtype=np.float32)
+
+        # Rampas de fade float32 (calculadas una vez por longitud)
+        fade_out, fade_in = _linear_fade_ramps(crossfade_samples, np.float32)
+
+        for segment, start, use_crossfade, (pause_start, pause_samples) in zip(
+                audio_segments, starts, crossfaded, silences):
+            if pause_samples:
+                result[pause_start:pause_start + pause_samples].fill(0.0)
+            # Mezclar la región de overlap con lo ya escrito (audio previo o silencio)
+            # y copiar el resto en la misma pasada: kernel numba de crossfade_into
+            # (numba llega con librosa); sin numba, escritura vectorizada con NumPy
+            crossfade_into(result, np.asarray(segment, dtype=np.float32), start,
+                           fade_out, fade_in, crossfade_samples if use_crossfade else 0)
 
         return result
 
+    def open_crossfade_stream(self, path, total_segments: int) -> CrossfadeWavStream:
+        """
+        Abre un WAV que se va escribiendo segmento a segmento con el mismo
+        crossfade y pausas que apply_crossfade_and_concatenate
+        """
+        return CrossfadeWavStream(self, path, total_segments)
+
     def _calcular_pausa_entre_segmentos(self, indice_segmento: int, total_segmentos: int) -> float:
         """
         Calcula pausa adicional entre segmentos según el contexto
@@ -967,16 +1687,21 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
 
         return 0.0  # Sin pausa extra
 
-    def apply_smart_concatenation(self, generated_audios):
+    def apply_smart_concatenation(self, generated_audios=None):
         """
         Aplica concatenación inteligente usando la lógica original del generador
         Método requerido para compatibilidad con GUI
+
+        Sin argumentos concatena la última generación (self._audio_list) sin copiarla
         """
-        if not generated_audios:
-            return np.array([])
+        if generated_audios is None:
+            audio_segments = self._audio_list
+        else:
+            # Extraer solo los audios de las tuplas (índice, audio)
+            audio_segments = [audio for _, audio in generated_audios]
 
-        # Extraer solo los audios de las tuplas (índice, audio)
-        audio_segments = [audio for _, audio in generated_audios]
+        if not audio_segments:
+            return np.array([])
 
         # Usar el método de crossfade
         return self.apply_crossfade_and_concatenate(audio_segments)
@@ -997,8 +1722,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             }
         }
 
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(report, f, indent=2, ensure_ascii=False)
+        dump_json(report, output_path)
 
     def _generate_with_safe_params(self, text: str, phrase_idx: int, log_callback=None, preset: str = 'safe1'):
         """Genera usando parámetros conservadores temporales, restaurando después."""
@@ -1018,7 +1742,7 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
                 self.cfg_strength = 1.2
                 self.speed = 1.0
             t = self._prepare_text_for_engine(text, aggressive=True)
-            return self.generate_single_phrase_with_validation(t, phrase_idx)
+            return self._infer_optimized(t, phrase_idx)
         except BaseException as e:
             if log_callback:
                 log_callback(f"   ⚠️ Falló preset {'A' if preset=='safe1' else 'B'}: {e}")
@@ -1038,17 +1762,19 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
         original_cfg = self.cfg_strength
         original_speed = self.speed
         try:
-            # Cambiar a CPU y recargar modelo
+            # Cambiar a CPU reutilizando el modelo CPU de reintentos anteriores
+            # (el modelo GPU se conserva y se restaura al terminar)
             self.device = 'cpu'
-            self.f5tts = None
-            self.ensure_model_loaded()
+            if self._cpu_f5tts is None:
+                self._cpu_f5tts = get_shared_f5tts("F5-TTS", 'cpu', self.model_path)
+            self.f5tts = self._cpu_f5tts
             # Parámetros extra conservadores
             self.nfe_steps = 24
             self.sway_sampling_coef = -0.1
             self.cfg_strength = 1.2
             self.speed = 1.0
             t = self._prepare_text_for_engine(text, aggressive=True)
-            return self.generate_single_phrase_with_validation(t, phrase_idx)
+            return self._infer_optimized(t, phrase_idx)
         finally:
             # Restaurar
             self.nfe_steps = original_nfe
@@ -1074,28 +1800,21 @@ class ProsodyEnhancedGenerator(EstructuraComplejaMejorada):
             return None
         # Recorte heurístico: buscar región central no silenciosa
         try:
-            import numpy as _np
-            import librosa as _lib
             sr = self.sample_rate
             # Ignorar primeros/últimos 0.4s para evitar prefijo/sufijo
             start_guard = int(0.4 * sr)
             end_guard = int(0.4 * sr)
-            y = audio.copy()
-            if len(y) <= start_guard + end_guard:
+            if len(audio) <= start_guard + end_guard:
                 return audio
-            y_mid = y[start_guard: len(y) - end_guard]
-            # Detectar intervalos no silenciosos
-            intervals = _lib.effects.split(y_mid, top_db=30)
-            if intervals is None or len(intervals) == 0:
+            y_mid = audio[start_guard: len(audio) - end_guard]
+            # Intervalo no silencioso más largo (núcleo probable)
+            interval = _longest_nonsilent_interval(y_mid, top_db=30)
+            if interval is None:
                 return y_mid
-            # Seleccionar el intervalo más largo (núcleo probable)
-            lengths = [(i[1] - i[0]) for i in intervals]
-            idx_max = int(_np.argmax(lengths))
-            seg = y_mid[intervals[idx_max][0]: intervals[idx_max][1]]
             # Pequeño margen de ataque/caída
             pad = int(0.02 * sr)
-            a = max(0, intervals[idx_max][0] - pad)
-            b = min(len(y_mid), intervals[idx_max][1] + pad)
+            a = max(0, interval[0] - pad)
+            b = min(len(y_mid), interval[1] + pad)
             return y_mid[a:b]
         except Exception:
             # Si el recorte falla, devolver parte central sin guardas
@@ -1117,11 +1836,19 @@ class ProsodyGUI:
         self.is_processing = False
         self.generator = None
 
+        # Escritura de WAVs finales en segundo plano: la siguiente referencia
+        # empieza a generar mientras se vuelca la anterior
+        self._io_pool = ThreadPoolExecutor(max_workers=1)
+
+        # Cola de mensajes de log (se vuelca al widget cada 100 ms desde el hilo de Tk)
+        self._log_queue = deque()
+
         # Archivos
         self.text_file = Path("texto.txt")
         self.check_reference_files()
 
         self.setup_ui()
+        self.root.after(100, self._drain_log_queue)
 
     def check_reference_files(self):
         """Busca automáticamente archivos .wav como tu sistema original"""
@@ -1136,10 +1863,8 @@ class ProsodyGUI:
 
         # Usar el primero encontrado o segment_2955.wav si existe
         self.reference_files = wav_files
-        if any(f.name == "segment_2955.wav" for f in wav_files):
-            self.primary_ref = Path("segment_2955.wav")
-        else:
-            self.primary_ref = wav_files[0]
+        by_name = {f.name: f for f in wav_files}
+        self.primary_ref = by_name.get("segment_2955.wav", wav_files[0])
 
         print(f"🎤 Referencias encontradas: {[f.name for f in wav_files]}")
         print(f"🎯 Referencia principal: {self.primary_ref.name}")
@@ -1232,12 +1957,19 @@ class ProsodyGUI:
         log_frame.rowconfigure(0, weight=1)
 
     def log(self, message):
-        """Añade mensaje al log"""
+        """Añade un mensaje al log (se muestra en el siguiente volcado)"""
         timestamp = datetime.now().strftime("%H:%M:%S")
-        full_message = f"[{timestamp}] {message}\n"
-        self.log_text.insert(tk.END, full_message)
-        self.log_text.see(tk.END)
-        self.root.update_idletasks()
+        self._log_queue.append(f"[{timestamp}] {message}\n")
+
+    def _drain_log_queue(self):
+        """Vuelca los mensajes pendientes en un único insert y se reprograma"""
+        if self._log_queue:
+            lines = []
+            while self._log_queue:
+                lines.append(self._log_queue.popleft())
+            self.log_text.insert(tk.END, ''.join(lines))
+            self.log_text.see(tk.END)
+        self.root.after(100, self._drain_log_queue)
 
     def start_generation(self):
         """Inicia la generación"""
@@ -1276,9 +2008,13 @@ class ProsodyGUI:
             mode_text = "completo con post-procesamiento" if enable_postprocessing else "rápido con hints"
             self.log(f"⚙️ Modo seleccionado: {mode_text}")
 
+            pending_writes = []  # (nombre, future) de los WAVs en escritura
+            stopped = False      # el usuario pulsó detener
+
             # Procesar cada referencia de audio (como tu sistema original)
             for ref_file in self.reference_files:
                 if not self.is_processing:
+                    stopped = True
                     break
 
                 self.log(f"\n🎤 Procesando con referencia: {ref_file.name}")
@@ -1294,25 +2030,46 @@ class ProsodyGUI:
                 # Generar con prosodia
                 generated_audios = self.generator.generate_all_phrases_with_prosody(
                     enable_postprocessing=enable_postprocessing,
-                    log_callback=self.log
+                    log_callback=self.log,
+                    should_continue=lambda: self.is_processing
                 )
 
+                # Detenida a mitad: lo generado queda en frase_NN.wav, pero no se
+                # concatena ni se guarda como resultado final de esta referencia
+                if not self.is_processing:
+                    stopped = True
+                    self.log(f"⏹️ Generación detenida: {ref_file.name} queda incompleta "
+                             f"({len(generated_audios)} frases en {self.generator.output_dir})")
+                    break
+
                 if generated_audios:
                     # Concatenar usando tu método original
                     self.log("🔗 Concatenando audio final...")
-                    final_audio = self.generator.apply_smart_concatenation(generated_audios)
+                    final_audio = self.generator.apply_smart_concatenation()
 
                     # Guardar resultado
                     output_name = f"estructura_compleja_prosody_nfe{self.generator.nfe_steps}.wav"
                     output_path = self.generator.output_dir / output_name
-                    sf.write(output_path, final_audio, self.generator.sample_rate)
+                    pending_writes.append((output_name, self._io_pool.submit(
+                        write_pcm16_wav, output_path, final_audio, self.generator.sample_rate)))
 
-                    self.log(f"✅ Audio final guardado: {output_name}")
+                    self.log(f"💾 Guardando audio final en segundo plano: {output_name}")
 
                     # Guardar reporte prosódico
                     report_path = self.generator.output_dir / "reporte_prosodia.json"
                     self.generator.save_prosody_report(report_path)
 
+            # Esperar a que terminen las escrituras (y propagar sus errores)
+            for output_name, future in pending_writes:
+                future.result()
+                self.log(f"✅ Audio final guardado: {output_name}")
+
+            if stopped:
+                self.log(f"\n⏹️ Generación detenida por el usuario")
+                self.log(f"📁 Resultados parciales en: {self.generator.session_dir}")
+                messagebox.showinfo("Detenido", f"Generación detenida.\nResultados parciales en: {self.generator.session_dir}")
+                return
+
             self.log(f"\n🎉 ¡Generación completada exitosamente!")
             self.log(f"📁 Resultados en: {self.generator.session_dir}")
 
@@ -1324,10 +2081,10 @@ class ProsodyGUI:
             messagebox.showerror("Error", error_msg)
 
         finally:
-            self.is_processing = False
             self.generate_button.config(state=tk.NORMAL)
             self.stop_button.config(state=tk.DISABLED)
-            self.status_label.config(text="Generación completada")
+            self.status_label.config(text="Generación completada" if self.is_processing else "Generación detenida")
+            self.is_processing = False
 
     def stop_generation(self):
         """Detiene la generación"""
@@ -1336,7 +2093,10 @@ class ProsodyGUI:
 
     def run(self):
         """Ejecuta la aplicación"""
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self._io_pool.shutdown(wait=True)
 
 
 def main():
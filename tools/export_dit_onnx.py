@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Exporta el DiT de F5-TTS y el vocoder Vocos a ONNX para el respaldo en CPU
+(ver modules/core/onnx_backend.py).
+
+Genera en el directorio de salida:
+    dit.onnx          Transformer con CFG fusionado (cond + incondicional)
+    dit.int8.onnx     Versión cuantizada dinámicamente (--precision int8)
+    vocos_spec.onnx   Vocos hasta magnitud/fase (la ISTFT se hace en NumPy)
+    vocab.txt         Mapa de caracteres del modelo
+
+Uso:
+    python tools/export_dit_onnx.py --output modules/models/onnx --precision int8
+"""
+
+import argparse
+from pathlib import Path
+
+import torch
+from torch import nn
+
+from f5_tts.api import F5TTS
+
+
+class DiTWithCFG(nn.Module):
+    """Una pasada del DiT devolviendo la velocidad ya guiada por CFG"""
+
+    def __init__(self, transformer):
+        super().__init__()
+        self.transformer = transformer
+
+    def forward(self, x, cond, text, time, cfg_strength):
+        pred = self.transformer(
+            x=x, cond=cond, text=text, time=time,
+            drop_audio_cond=False, drop_text=False
+        )
+        null_pred = self.transformer(
+            x=x, cond=cond, text=text, time=time,
+            drop_audio_cond=True, drop_text=True
+        )
+        return pred + (pred - null_pred) * cfg_strength
+
+
+class VocosSpectrum(nn.Module):
+    """Vocos sin la ISTFT final: devuelve magnitud y fase"""
+
+    def __init__(self, vocos):
+        super().__init__()
+        self.backbone = vocos.backbone
+        self.out = vocos.head.out
+
+    def forward(self, mel):
+        x = self.backbone(mel)
+        x = self.out(x).transpose(1, 2)
+        magnitude, phase = x.chunk(2, dim=1)
+        magnitude = torch.exp(magnitude).clip(max=1e2)
+        return magnitude, phase
+
+
+def export(output_dir: Path, model_type: str, precision: str, opset: int):
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"🎤 Cargando {model_type} en CPU...")
+    f5tts = F5TTS(model_type=model_type, device="cpu")
+    cfm = f5tts.ema_model.eval()
+
+    # Vocabulario en orden de índice
+    vocab = sorted(cfm.vocab_char_map.items(), key=lambda kv: kv[1])
+    with open(output_dir / "vocab.txt", "w", encoding="utf-8") as f:
+        for char, _ in vocab:
+            f.write(char + "\n")
+
+    # Entradas representativas (ejes dinámicos en frames y texto)
+    frames, n_mels = 512, cfm.num_channels
+    x = torch.randn(1, frames, n_mels)
+    cond = torch.zeros(1, frames, n_mels)
+    text = torch.zeros(1, frames, dtype=torch.long)
+    time = torch.tensor([0.5])
+    cfg = torch.tensor([2.0])
+
+    dit_path = output_dir / "dit.onnx"
+    print(f"📦 Exportando DiT -> {dit_path}")
+    with torch.inference_mode():
+        torch.onnx.export(
+            DiTWithCFG(cfm.transformer).eval(),
+            (x, cond, text, time, cfg),
+            str(dit_path),
+            input_names=["x", "cond", "text", "time", "cfg_strength"],
+            output_names=["velocity"],
+            dynamic_axes={
+                "x": {1: "frames"},
+                "cond": {1: "frames"},
+                "text": {1: "frames"},
+                "velocity": {1: "frames"},
+            },
+            opset_version=opset,
+        )
+
+    vocoder_path = output_dir / "vocos_spec.onnx"
+    print(f"📦 Exportando vocoder -> {vocoder_path}")
+    with torch.inference_mode():
+        torch.onnx.export(
+            VocosSpectrum(f5tts.vocoder).eval(),
+            (torch.randn(1, n_mels, frames),),
+            str(vocoder_path),
+            input_names=["mel"],
+            output_names=["magnitude", "phase"],
+            dynamic_axes={
+                "mel": {2: "frames"},
+                "magnitude": {2: "frames"},
+                "phase": {2: "frames"},
+            },
+            opset_version=opset,
+        )
+
+    if precision == "int8":
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        int8_path = output_dir / "dit.int8.onnx"
+        print(f"🗜️ Cuantizando DiT a int8 -> {int8_path}")
+        quantize_dynamic(str(dit_path), str(int8_path), weight_type=QuantType.QInt8)
+
+    print("✅ Exportación completada")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar F5-TTS a ONNX para CPU")
+    parser.add_argument("--output", default=str(Path(__file__).resolve().parent.parent / "modules" / "models" / "onnx"))
+    parser.add_argument("--model-type", default="F5-TTS")
+    parser.add_argument("--precision", choices=["fp32", "int8"], default="fp32")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    export(Path(args.output), args.model_type, args.precision, args.opset)
+
+
+if __name__ == "__main__":
+    main()